@@ -0,0 +1,335 @@
+"""Mediciones de rendimiento de la encuesta contra el servidor local.
+
+Ejecuta McDVoiceSurvey.run_survey de principio a fin sin pausas deliberadas
+y registra, por manejador y por tipo de página, el tiempo, el número de
+comandos WebDriver y los bytes intercambiados con el geckodriver, además
+del tiempo de arranque del navegador. Los resultados se guardan en JSON
+para poder comparar dos commits:
+
+    python benchmark.py run --runs 3 --output bench_antes.json
+    python benchmark.py run --runs 3 --output bench_despues.json
+    python benchmark.py compare bench_antes.json bench_despues.json --threshold 0.10
+
+El subcomando modes compara los modos de arranque de Firefox y backends
+compara el navegador con el transporte HTTP y con el driver en memoria de
+fake_driver.py (tiempo de arranque, duración y memoria residente máxima de
+este proceso y sus hijos: geckodriver y Firefox). El backend fake mide solo
+la lógica de decisión y los comandos que envía, sin navegador:
+
+    python benchmark.py modes --modes ventana headless ligero --runs 3
+    python benchmark.py backends --browser ligero --runs 3
+    python benchmark.py run --backend fake --runs 20 --output bench_fake.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from browser import BROWSER_MODES, PAGE_LOAD_STRATEGIES, TRACKING_HOSTS
+from fake_driver import FakeDriver
+from http_backend import HttpSurvey
+from instrumentation import Instrumentation
+from local_server import SurveyServer
+from mc2 import BROWSER_MODE, INSTRUMENTED_METHODS, McDVoiceSurvey, classify_page
+
+# Métricas que se comparan entre dos resultados (mayor es peor)
+COMPARED_METRICS = ["wall_s", "commands", "bytes"]
+RSS_INTERVAL = 0.2  # Segundos entre muestras de memoria residente
+
+
+def _tree_rss_kb(root):
+    """Memoria residente (kB) de un proceso y todos sus descendientes; None fuera de Linux"""
+    if not os.path.isdir("/proc"):
+        return None
+    children, rss = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[int(entry)] = int(line.split()[1])
+                        break
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, pending = 0, [root]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class PeakRss:
+    """Muestrea en segundo plano la memoria residente de un árbol de procesos y guarda el máximo"""
+
+    def __init__(self, pid, interval=RSS_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            rss = _tree_rss_kb(self.pid)
+            if rss:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+
+def run_once(url, verbose=False, browser=BROWSER_MODE, page_load="normal", blocked_hosts=(), backend="selenium",
+             seed=None):
+    """Ejecuta una encuesta completa contra url y devuelve sus métricas"""
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output, PeakRss(os.getpid()) as memory:
+        start = time.perf_counter()
+        if backend == "http":
+            survey = HttpSurvey(url=url, pacing="sin_pausas", quiet=True, trace=None, seed=seed, ledger=None,
+                                record=None, layout_cache=None)
+        elif backend == "fake":
+            # Mismo camino de Selenium que el navegador, sobre páginas en memoria
+            survey = McDVoiceSurvey(url=url, pacing="sin_pausas", quiet=True, trace=None, driver=FakeDriver(),
+                                    seed=seed, ledger=None, record=None, layout_cache=None)
+        else:
+            survey = McDVoiceSurvey(url=url, pacing="sin_pausas", quiet=True, trace=None, browser=browser,
+                                    page_load=page_load, blocked_hosts=list(blocked_hosts), seed=seed, ledger=None,
+                                    record=None, layout_cache=None)
+        startup = time.perf_counter() - start
+
+        survey.instrumentation = Instrumentation().attach(survey, INSTRUMENTED_METHODS, classify_page)
+        start = time.perf_counter()
+        survey.run_survey()
+        elapsed = time.perf_counter() - start
+        if backend == "fake":
+            survey.driver.quit()
+
+    result = survey.instrumentation.summary()
+    result["backend"] = backend
+    result["seed"] = survey.seed
+    result["browser"] = browser
+    result["page_load"] = page_load
+    result["startup_s"] = round(startup, 4)
+    result["run_s"] = round(elapsed, 4)
+    result["peak_rss_mb"] = memory.peak_mb
+    result["completed"] = bool(survey.validation_code)
+    return result
+
+
+def summarize(runs):
+    """Mediana de cada métrica entre ejecuciones, por manejador y por tipo de página"""
+    def median_of(getter):
+        values = [v for v in (getter(run) for run in runs) if v is not None]
+        return round(statistics.median(values), 4) if values else None
+
+    summary = {
+        "startup_s": median_of(lambda r: r["startup_s"]),
+        "run_s": median_of(lambda r: r["run_s"]),
+        "peak_rss_mb": median_of(lambda r: r.get("peak_rss_mb")),
+        "completed": sum(1 for r in runs if r["completed"]),
+        "total": {m: median_of(lambda r, m=m: r["total"][m]) for m in COMPARED_METRICS},
+    }
+    for group in ("per_handler", "per_page_type"):
+        names = sorted({name for run in runs for name in run[group]})
+        summary[group] = {
+            name: {m: median_of(lambda r, n=name, m=m: r[group].get(n, {}).get(m)) for m in COMPARED_METRICS}
+            for name in names
+        }
+    return summary
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_many(url, runs, verbose, browser, page_load="normal", blocked_hosts=(), backend="selenium", seed=None):
+    results = []
+    for i in range(runs):
+        # Con semilla, todas las ejecuciones responden exactamente lo mismo
+        result = run_once(url, verbose=verbose, browser=browser, page_load=page_load, blocked_hosts=blocked_hosts,
+                          backend=backend, seed=seed)
+        results.append(result)
+        name = browser if backend == "selenium" else backend
+        print(f"[{name}] Ejecución {i + 1}/{runs}: {result['run_s']:.2f} s, "
+              f"{result['total']['commands']} comandos, arranque {result['startup_s']:.2f} s, "
+              f"memoria máx. {result['peak_rss_mb']} MB")
+    return results
+
+
+def _save(path, data):
+    data = dict({"commit": _commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}, **data)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {path}")
+
+
+def command_run(args):
+    server = None
+    url = args.url
+    if not url:
+        server = SurveyServer()
+        url = server.start()
+    try:
+        blocked = TRACKING_HOSTS if args.block_tracking else []
+        runs = _run_many(url, args.runs, args.verbose, args.browser, args.page_load, blocked, args.backend, args.seed)
+    finally:
+        if server:
+            server.stop()
+    _save(args.output, {"url": url, "seed": args.seed, "backend": args.backend, "browser": args.browser, "page_load": args.page_load,
+                        "block_tracking": args.block_tracking, "summary": summarize(runs), "runs": runs})
+
+
+def command_modes(args):
+    server = None
+    url = args.url
+    if not url:
+        server = SurveyServer()
+        url = server.start()
+    try:
+        modes = {mode: summarize(_run_many(url, args.runs, args.verbose, mode, seed=args.seed)) for mode in args.modes}
+    finally:
+        if server:
+            server.stop()
+
+    _print_table(modes)
+    _save(args.output, {"url": url, "modes": modes})
+
+
+def command_backends(args):
+    server = None
+    url = args.url
+    if not url:
+        server = SurveyServer()
+        url = server.start()
+    try:
+        backends = {
+            f"selenium ({args.browser})": summarize(_run_many(url, args.runs, args.verbose, args.browser,
+                                                              seed=args.seed)),
+            "http": summarize(_run_many(url, args.runs, args.verbose, args.browser, backend="http", seed=args.seed)),
+            "fake": summarize(_run_many(url, args.runs, args.verbose, args.browser, backend="fake", seed=args.seed)),
+        }
+    finally:
+        if server:
+            server.stop()
+    _print_table(backends)
+    _save(args.output, {"url": url, "backends": backends})
+
+
+def _print_table(summaries):
+    print(f"\n{'configuración':<24}{'arranque (s)':>14}{'encuesta (s)':>14}{'memoria máx. (MB)':>20}{'completas':>11}")
+    for name, summary in summaries.items():
+        print(f"{name:<24}{summary['startup_s']!s:>14}{summary['run_s']!s:>14}{summary['peak_rss_mb']!s:>20}"
+              f"{summary['completed']!s:>11}")
+
+
+def compare(old, new, threshold):
+    """Lista las métricas de new que empeoran más de threshold respecto a old"""
+    regressions = []
+
+    def check(name, before, after):
+        for metric in COMPARED_METRICS:
+            a, b = before.get(metric), after.get(metric)
+            if a is None or b is None:
+                continue
+            if b > a * (1 + threshold) and b - a > 1e-3:
+                regressions.append((name, metric, a, b))
+
+    for extra in ("startup_s", "run_s"):
+        a, b = old.get(extra), new.get(extra)
+        if a is not None and b is not None and b > a * (1 + threshold):
+            regressions.append((extra, "wall_s", a, b))
+    check("total", old["total"], new["total"])
+    for group in ("per_handler", "per_page_type"):
+        for name, after in new[group].items():
+            if name in old[group]:
+                check(f"{group}:{name}", old[group][name], after)
+    return regressions
+
+
+def command_compare(args):
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)["summary"]
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)["summary"]
+    regressions = compare(old, new, args.threshold)
+    for name, metric, before, after in regressions:
+        print(f"REGRESIÓN {name} {metric}: {before} -> {after}")
+    if not regressions:
+        print(f"Sin regresiones por encima del {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento del bot de McDVoice")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Ejecuta la encuesta y guarda las métricas")
+    run.add_argument("--runs", type=int, default=3)
+    run.add_argument("--url", help="Encuesta a medir (por defecto se inicia local_server)")
+    run.add_argument("--output", default="bench_results.json")
+    run.add_argument("--verbose", action="store_true", help="Mostrar la salida del bot")
+    run.add_argument("--seed", type=int, help="Semilla de las respuestas (misma semilla, mismas respuestas)")
+    run.add_argument("--browser", default=BROWSER_MODE, choices=list(BROWSER_MODES), help="Modo de arranque de Firefox")
+    run.add_argument("--backend", default="selenium", choices=["selenium", "http", "fake"], help="Transporte a medir")
+    run.add_argument("--page-load", default="normal", choices=PAGE_LOAD_STRATEGIES, help="Estrategia de carga de páginas")
+    run.add_argument("--block-tracking", action="store_true", help="Bloquear analítica y gestores de etiquetas")
+    run.set_defaults(func=command_run)
+
+    modes = commands.add_parser("modes", help="Compara arranque y memoria de los modos de Firefox")
+    modes.add_argument("--modes", nargs="+", default=list(BROWSER_MODES), choices=list(BROWSER_MODES))
+    modes.add_argument("--runs", type=int, default=3)
+    modes.add_argument("--url", help="Encuesta a medir (por defecto se inicia local_server)")
+    modes.add_argument("--output", default="bench_modes.json")
+    modes.add_argument("--verbose", action="store_true", help="Mostrar la salida del bot")
+    modes.add_argument("--seed", type=int, help="Semilla de las respuestas")
+    modes.set_defaults(func=command_modes)
+
+    backends = commands.add_parser("backends", help="Compara el navegador con el transporte HTTP y el driver en memoria")
+    backends.add_argument("--browser", default=BROWSER_MODE, choices=list(BROWSER_MODES),
+                          help="Modo de Firefox para el backend selenium")
+    backends.add_argument("--runs", type=int, default=3)
+    backends.add_argument("--url", help="Encuesta a medir (por defecto se inicia local_server)")
+    backends.add_argument("--output", default="bench_backends.json")
+    backends.add_argument("--verbose", action="store_true", help="Mostrar la salida del bot")
+    backends.add_argument("--seed", type=int, help="Semilla de las respuestas")
+    backends.set_defaults(func=command_backends)
+
+    cmp = commands.add_parser("compare", help="Compara dos resultados y marca regresiones")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)")
+    cmp.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
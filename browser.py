@@ -0,0 +1,200 @@
+"""Modos de arranque de Firefox.
+
+"ventana" es el navegador de siempre: maximizado y con el perfil por
+defecto. Los demás modos arrancan sin ventana y, en los modos ligeros, con
+un perfil mínimo: sin extensiones ni telemetría, sin actualizaciones de
+navegación segura ni restauración de sesión, con un tope de procesos de
+contenido y sin caché en disco. Para elegir con datos:
+
+    python benchmark.py modes --modes ventana headless ligero ligero_sin_medios
+
+Además, cualquier modo puede usar la estrategia de carga "eager" (el driver
+vuelve en cuanto el DOM está analizado; wait_for_page espera los elementos
+que el bot necesita) y una lista de hosts y tipos de recurso bloqueados. Los
+hosts se bloquean con un script PAC que envía sus pedidos a un proxy
+inexistente, así que nunca se descargan; los tipos de recurso se bloquean
+con preferencias de Firefox.
+
+Los plazos de carga de página y de scripts viajan en las capacidades de la
+sesión; el de cada comando a geckodriver se fija en Selenium con
+set_command_timeout antes de crear el driver.
+"""
+import json
+from urllib.parse import quote
+
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+# Modos de arranque disponibles:
+#   headless: sin ventana
+#   window: tamaño fijo de ventana (ancho, alto); None = maximizada
+#   lean: aplica LEAN_PREFERENCES (perfil mínimo)
+#   content_processes: tope de procesos de contenido (None = el de Firefox)
+#   disk_cache: caché en disco activada
+#   media: carga de imágenes y fuentes de la página (False = bloquear "image" y "font")
+BROWSER_MODES = {
+    # Navegador con ventana, como siempre
+    "ventana": {"headless": False, "window": None, "lean": False, "content_processes": None,
+                "disk_cache": True, "media": True},
+    # Mismo perfil, sin ventana y con un tamaño pequeño fijo
+    "headless": {"headless": True, "window": (1024, 768), "lean": False, "content_processes": None,
+                 "disk_cache": True, "media": True},
+    # Sin ventana y con perfil mínimo
+    "ligero": {"headless": True, "window": (1024, 768), "lean": True, "content_processes": 1,
+               "disk_cache": False, "media": True},
+    # Perfil mínimo sin imágenes ni fuentes descargables
+    "ligero_sin_medios": {"headless": True, "window": (1024, 768), "lean": True, "content_processes": 1,
+                          "disk_cache": False, "media": False},
+}
+
+# Preferencias que el bot ha usado siempre
+BASE_PREFERENCES = {
+    "dom.webnotifications.enabled": False,
+    "intl.accept_languages": "es-US",
+    "dom.webdriver.enabled": False,
+    "useAutomationExtension": False,
+    # Headers para parecer más humano
+    "general.useragent.override": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0",
+}
+
+# Perfil mínimo: nada que arranque en segundo plano ni que se descargue al iniciar
+LEAN_PREFERENCES = {
+    # Extensiones y actualizaciones
+    "extensions.update.enabled": False,
+    "extensions.systemAddon.update.enabled": False,
+    "extensions.getAddons.cache.enabled": False,
+    "extensions.pocket.enabled": False,
+    "app.update.auto": False,
+    "browser.search.update": False,
+    # Telemetría y estudios
+    "toolkit.telemetry.enabled": False,
+    "toolkit.telemetry.unified": False,
+    "toolkit.telemetry.archive.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "app.shield.optoutstudies.enabled": False,
+    "app.normandy.enabled": False,
+    # Navegación segura (listas que se descargan al arrancar)
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "browser.safebrowsing.downloads.enabled": False,
+    "browser.safebrowsing.blockedURIs.enabled": False,
+    # Restauración de sesión y página de inicio
+    "browser.sessionstore.resume_from_crash": False,
+    "browser.sessionstore.max_tabs_undo": 0,
+    "browser.startup.page": 0,
+    "browser.startup.homepage": "about:blank",
+    "browser.newtabpage.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+    # Conexiones especulativas
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+}
+
+NO_DISK_CACHE_PREFERENCES = {
+    "browser.cache.disk.enable": False,
+    "browser.cache.memory.enable": True,
+}
+
+# Preferencias que impiden cargar cada tipo de recurso
+RESOURCE_PREFERENCES = {
+    "image": {"permissions.default.image": 2},
+    "font": {"gfx.downloadable_fonts.enabled": False, "browser.display.use_document_fonts": 0},
+    "media": {"media.autoplay.default": 5, "media.preload.default": 0, "media.preload.auto": 0},
+}
+
+PAGE_LOAD_STRATEGIES = ["normal", "eager"]
+
+# Analítica y gestores de etiquetas que ningún manejador usa (dominio y subdominios)
+TRACKING_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "bat.bing.com",
+    "hotjar.com",
+    "nr-data.net",
+    "newrelic.com",
+    "demdex.net",
+    "omtrdc.net",
+]
+
+# Proxy sin servidor (puerto discard): los pedidos enviados aquí fallan al instante
+BLACKHOLE_PROXY = "PROXY 127.0.0.1:9"
+
+PAC_TEMPLATE = """function FindProxyForURL(url, host) {
+    var blocked = %s;
+    for (var i = 0; i < blocked.length; i++) {
+        if (host === blocked[i] || dnsDomainIs(host, "." + blocked[i])) return "%s";
+    }
+    return "DIRECT";
+}"""
+
+
+def blocklist_preferences(hosts):
+    """Preferencias que descartan los pedidos a los hosts indicados mediante un script PAC"""
+    if not hosts:
+        return {}
+    pac = PAC_TEMPLATE % (json.dumps(sorted(set(hosts))), BLACKHOLE_PROXY)
+    return {
+        "network.proxy.type": 2,
+        "network.proxy.autoconfig_url": "data:application/x-ns-proxy-autoconfig," + quote(pac),
+        "network.proxy.failover_direct": False,  # Si el proxy falla, no reintentar directo
+    }
+
+
+def set_command_timeout(seconds):
+    """Plazo (s) de cada comando HTTP a geckodriver; vale para las sesiones que se crean después (0 = sin límite)"""
+    if seconds:
+        RemoteConnection.set_timeout(seconds)
+    else:
+        RemoteConnection.reset_timeout()
+
+
+def firefox_options(mode="ventana", page_load="normal", blocked_hosts=(), blocked_resources=(),
+                    page_load_timeout=0, script_timeout=0):
+    """Opciones de Firefox para un modo de BROWSER_MODES, estrategia de carga, lista de bloqueo y plazos (s)"""
+    if mode not in BROWSER_MODES:
+        raise ValueError(f"Modo de navegador desconocido: {mode}")
+    if page_load not in PAGE_LOAD_STRATEGIES:
+        raise ValueError(f"Estrategia de carga desconocida: {page_load}")
+    unknown = [kind for kind in blocked_resources if kind not in RESOURCE_PREFERENCES]
+    if unknown:
+        raise ValueError(f"Tipos de recurso desconocidos: {', '.join(unknown)}")
+    settings = BROWSER_MODES[mode]
+    options = Options()
+    options.page_load_strategy = page_load
+    # Sin plazo se deja el valor por defecto de geckodriver
+    timeouts = {name: int(seconds * 1000) for name, seconds in (("pageLoad", page_load_timeout),
+                                                               ("script", script_timeout)) if seconds}
+    if timeouts:
+        options.timeouts = timeouts
+    if settings["headless"]:
+        options.add_argument("-headless")
+    if settings["window"]:
+        width, height = settings["window"]
+        options.add_argument(f"--width={width}")
+        options.add_argument(f"--height={height}")
+    else:
+        options.add_argument("--start-maximized")
+
+    preferences = dict(BASE_PREFERENCES)
+    if settings["lean"]:
+        preferences.update(LEAN_PREFERENCES)
+    if settings["content_processes"]:
+        preferences["dom.ipc.processCount"] = settings["content_processes"]
+        preferences["fission.autostart"] = False  # Fission abre un proceso por sitio
+    if not settings["disk_cache"]:
+        preferences.update(NO_DISK_CACHE_PREFERENCES)
+    resources = list(blocked_resources)
+    if not settings["media"]:
+        resources += ["image", "font"]
+    for kind in resources:
+        preferences.update(RESOURCE_PREFERENCES[kind])
+    preferences.update(blocklist_preferences(blocked_hosts))
+    for name, value in preferences.items():
+        options.set_preference(name, value)
+    return options
@@ -0,0 +1,56 @@
+"""Comentarios para las preguntas abiertas.
+
+Cada archivo de comentarios es una lista de cadenas entre comillas separadas
+por comas (como respuestas.txt). Se lee una sola vez, se vuelve a leer solo
+si cambia su fecha de modificación y se muestrea con una "bolsa barajada":
+ningún comentario se repite hasta agotar todos los de su categoría.
+"""
+import ast
+import os
+import random
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_comments(text):
+    """Convierte el contenido de un archivo de comentarios en una lista de cadenas limpias"""
+    try:
+        comments = ast.literal_eval("[" + text + "]")
+    except (SyntaxError, ValueError):
+        # Archivo que no es una lista válida: una línea por comentario, sin comillas ni comas finales
+        comments = [line.strip().rstrip(",").strip().strip('"').strip() for line in text.splitlines()]
+    return [c.strip() for c in comments if isinstance(c, str) and c.strip()]
+
+
+class CommentCorpus:
+    def __init__(self, files, rng=random):
+        # files: {categoría: ruta}; las rutas relativas se resuelven junto a este módulo
+        self.files = {category: os.path.join(BASE_DIR, path) for category, path in files.items()}
+        self.rng = rng
+        self._comments = {}
+        self._mtimes = {}
+        self._bags = {}
+
+    def comments(self, category):
+        """Comentarios de una categoría, releyendo el archivo solo si cambió"""
+        if category not in self.files:
+            raise KeyError(f"Categoría de comentarios desconocida: {category}")
+        path = self.files[category]
+        mtime = os.stat(path).st_mtime_ns
+        if self._mtimes.get(category) != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                self._comments[category] = parse_comments(f.read())
+            self._mtimes[category] = mtime
+            self._bags[category] = []
+        return self._comments[category]
+
+    def sample(self, category):
+        """Devuelve un comentario sin repetir hasta agotar la categoría"""
+        comments = self.comments(category)
+        if not comments:
+            raise ValueError(f"No hay comentarios en la categoría {category}")
+        bag = self._bags[category]
+        if not bag:
+            bag.extend(comments)
+            self.rng.shuffle(bag)
+        return bag.pop()
@@ -0,0 +1,319 @@
+"""Navegador caliente: un proceso de larga duración que mantiene Firefox abierto.
+
+Cada ejecución de mc2.py arranca geckodriver y Firefox desde cero y los
+cierra al terminar. El demonio mantiene una sola sesión abierta, la limpia
+entre ejecuciones (cookies y almacenamiento de cada sitio visitado) y la
+vuelve a arrancar si el navegador se cae o no arranca; en ese caso el
+cliente recibe el error en lugar de una conexión cortada. Un cliente mínimo le envía una ejecución y recibe el
+resultado:
+
+    python daemon.py serve --browser ligero --port 8765
+    python daemon.py run --url http://127.0.0.1:8000 --pacing sin_pausas
+    python daemon.py status
+    python daemon.py stop
+
+Las ejecuciones se atienden de una en una: hay un solo navegador.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from browser import (BROWSER_MODES, PAGE_LOAD_STRATEGIES, RESOURCE_PREFERENCES, TRACKING_HOSTS, firefox_options,
+                     set_command_timeout)
+from mc2 import (BLOCKED_HOSTS, BLOCKED_RESOURCES, BROWSER_MODE, COMMAND_TIMEOUT, PACING_PROFILE, PAGE_DEADLINE,
+                 PAGE_LOAD_STRATEGY, PAGE_LOAD_TIMEOUT, RUN_DEADLINE, SCRIPT_TIMEOUT, TEXT_ENTRY_MODE, URL,
+                 McDVoiceSurvey)
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# Vacía el almacenamiento del origen actual antes de salir de la página
+CLEAR_STORAGE_SCRIPT = r"""
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+# Página pequeña de un origen donde limpiarlo (WebDriver solo borra cookies del documento actual)
+CLEAR_PATH = "/robots.txt"
+
+
+def url_origin(url):
+    """scheme://host[:puerto] de una URL http(s); None para about:, data: y similares"""
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class WarmBrowser:
+    """Una sesión de Firefox reutilizable que se limpia entre usos y se reinicia si se cae"""
+
+    def __init__(self, mode=BROWSER_MODE, page_load=PAGE_LOAD_STRATEGY, blocked_hosts=(), blocked_resources=()):
+        self.options = firefox_options(mode, page_load, blocked_hosts, blocked_resources,
+                                       PAGE_LOAD_TIMEOUT, SCRIPT_TIMEOUT)
+        self.mode = mode
+        self.page_load = page_load
+        self.driver = None
+        self.starts = 0
+        self.startup_s = None
+
+    def alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+    def start(self):
+        start = time.perf_counter()
+        set_command_timeout(COMMAND_TIMEOUT)
+        self.driver = webdriver.Firefox(options=self.options)
+        self.startup_s = round(time.perf_counter() - start, 4)
+        self.starts += 1
+        return self.driver
+
+    def acquire(self):
+        """Devuelve una sesión viva, arrancando una nueva si la anterior se cayó"""
+        if not self.alive():
+            self.quit()
+            self.start()
+        return self.driver
+
+    def reset(self, urls=()):
+        """Borra cookies y almacenamiento de la página actual y de cada origen de urls, y deja el navegador en
+        blanco. La encuesta redirige entre dominios y WebDriver solo limpia el documento actual, así que se
+        abre una página pequeña de cada otro origen y se limpia allí"""
+        try:
+            current = url_origin(self.driver.current_url)
+            if current:
+                self.clear_current()
+            for origin in sorted({url_origin(url) for url in urls} - {current, None}):
+                self.driver.get(origin + CLEAR_PATH)
+                self.clear_current()
+            self.driver.get("about:blank")
+        except WebDriverException:
+            self.quit()  # Se reinicia en el próximo acquire
+
+    def clear_current(self):
+        self.driver.execute_script(CLEAR_STORAGE_SCRIPT)
+        self.driver.delete_all_cookies()
+
+    def discard(self):
+        """Olvida una sesión cuyos procesos ya se mataron (plazo agotado); el próximo acquire arranca otra"""
+        self.driver = None
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = None
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    server_version = "McDVoiceDaemon/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        self.reply(self.server.status())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400, "JSON inválido")
+            return
+        if self.path == "/run":
+            self.reply(self.server.run(request))
+        elif self.path == "/stop":
+            self.reply({"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self.send_error(404)
+
+    def reply(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SurveyDaemon(HTTPServer):
+    """Servidor local que atiende ejecuciones de la encuesta con un navegador ya abierto"""
+
+    def __init__(self, browser, host=DAEMON_HOST, port=DAEMON_PORT, quiet=False):
+        super().__init__((host, port), DaemonRequestHandler)
+        self.browser = browser
+        self.quiet = quiet
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def status(self):
+        return {"alive": self.browser.alive(), "mode": self.browser.mode, "runs": self.runs,
+                "browser_starts": self.browser.starts, "startup_s": self.browser.startup_s}
+
+    def run(self, request):
+        """Ejecuta una encuesta completa en la sesión caliente y devuelve el resultado y la salida"""
+        with self._lock:
+            log = io.StringIO()
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(log):
+                    survey = self.run_survey(request)
+            except ValueError as e:
+                return {"completed": False, "error": str(e), "output": log.getvalue()}
+            except WebDriverException as e:
+                # Firefox no arrancó o la sesión se cayó fuera de la encuesta: el próximo acquire arranca otra
+                self.browser.quit()
+                return {"completed": False, "error": f"Navegador no disponible: {e.msg or e}",
+                        "output": log.getvalue()}
+            self.runs += 1
+            if not self.quiet:
+                outcome = ("plazo agotado" if survey.timed_out
+                           else "completada" if survey.validation_code else "sin completar")
+                print(f"Ejecución {self.runs}: {outcome} "
+                      f"en {time.perf_counter() - start:.1f} s")
+            return {
+                "completed": bool(survey.validation_code),
+                "validation_code": survey.validation_code,
+                "completion_text": survey.survey_completion_text,
+                "seed": survey.seed,
+                "timed_out": survey.timed_out,
+                "timeout": survey.timeout_report,
+                "run_s": round(time.perf_counter() - start, 4),
+                "output": log.getvalue(),
+            }
+
+    def run_survey(self, request):
+        driver = self.browser.acquire()
+        survey = McDVoiceSurvey(url=request.get("url") or URL,
+                                pacing=request.get("pacing") or PACING_PROFILE,
+                                quiet=True,
+                                text_mode=request.get("text_mode") or TEXT_ENTRY_MODE,
+                                trace=request.get("trace"),
+                                page_load=self.browser.page_load,
+                                driver=driver,
+                                seed=request.get("seed"),
+                                page_deadline=request.get("page_deadline", PAGE_DEADLINE),
+                                run_deadline=request.get("run_deadline", RUN_DEADLINE))
+        survey.run_survey()
+        if survey.timed_out:
+            # El vigilante mató el navegador colgado: la próxima ejecución arranca uno nuevo
+            self.browser.discard()
+        else:
+            self.browser.reset(survey.visited_urls | {survey.url})
+        return survey
+
+    def serve(self):
+        address = f"http://{self.server_address[0]}:{self.server_address[1]}"
+        try:
+            self.browser.acquire()
+            print(f"Navegador listo en {self.browser.startup_s:.1f} s; atendiendo en {address}")
+        except WebDriverException as e:
+            # Se vuelve a intentar en la primera ejecución, que recibe el error si tampoco arranca
+            self.browser.quit()
+            print(f"No se pudo arrancar el navegador ({e.msg or e}); atendiendo en {address}")
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            self.browser.quit()
+
+
+def _call(args, path, payload=None):
+    url = f"http://{args.host}:{args.port}{path}"
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    request = Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urlopen(request) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except URLError as e:
+        sys.exit(f"No se pudo contactar al demonio en {url}: {e.reason}")
+
+
+def command_serve(args):
+    hosts = args.block_host + (TRACKING_HOSTS if args.block_tracking else [])
+    browser = WarmBrowser(args.browser, args.page_load, hosts, args.block_resource)
+    SurveyDaemon(browser, args.host, args.port, quiet=args.quiet).serve()
+
+
+def command_run(args):
+    result = _call(args, "/run", {"url": args.url, "pacing": args.pacing, "text_mode": args.text_mode,
+                                  "trace": args.trace, "seed": args.seed, "page_deadline": args.page_deadline,
+                                  "run_deadline": args.run_deadline})
+    print(result["output"], end="")
+    if result.get("error"):
+        print(f"Error: {result['error']}")
+    if result.get("timed_out"):
+        return 2
+    return 0 if result["completed"] else 1
+
+
+def command_status(args):
+    print(json.dumps(_call(args, "/status"), indent=2, ensure_ascii=False))
+
+
+def command_stop(args):
+    _call(args, "/stop", {})
+    print("Demonio detenido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Navegador caliente para el bot de McDVoice")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Arranca el navegador y atiende ejecuciones")
+    serve.add_argument("--browser", default=BROWSER_MODE, choices=list(BROWSER_MODES))
+    serve.add_argument("--page-load", default=PAGE_LOAD_STRATEGY, choices=PAGE_LOAD_STRATEGIES)
+    serve.add_argument("--block-tracking", action="store_true", help="Bloquear analítica y gestores de etiquetas")
+    serve.add_argument("--block-host", action="append", default=list(BLOCKED_HOSTS), metavar="HOST")
+    serve.add_argument("--block-resource", action="append", default=list(BLOCKED_RESOURCES),
+                       choices=list(RESOURCE_PREFERENCES))
+    serve.add_argument("--quiet", action="store_true", help="No mostrar cada ejecución ni cada petición")
+    serve.set_defaults(func=command_serve)
+
+    run = commands.add_parser("run", help="Envía una ejecución al demonio y muestra su salida")
+    run.add_argument("--url", default=URL)
+    run.add_argument("--pacing", default=PACING_PROFILE)
+    run.add_argument("--text-mode", default=TEXT_ENTRY_MODE, choices=["js", "bulk", "chunked"])
+    run.add_argument("--trace", help="Archivo JSONL de instrumentación (lo escribe el demonio)")
+    run.add_argument("--seed", type=int, help="Semilla de las respuestas")
+    run.add_argument("--page-deadline", type=float, default=PAGE_DEADLINE, help="Segundos máximos por página")
+    run.add_argument("--run-deadline", type=float, default=RUN_DEADLINE, help="Segundos máximos de la ejecución")
+    run.set_defaults(func=command_run)
+
+    commands.add_parser("status", help="Estado del navegador caliente").set_defaults(func=command_status)
+    commands.add_parser("stop", help="Detiene el demonio y cierra el navegador").set_defaults(func=command_stop)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Plazos por página y por ejecución, vigilados desde un hilo aparte.
+
+Un comando a geckodriver que no responde bloquea el hilo principal sin
+límite: ninguna espera de Selenium lo interrumpe. Watchdog corre en otro
+hilo; si la página actual o la ejecución completa superan su plazo, arma un
+diagnóstico (dónde estaba detenido el hilo principal) y llama a la función
+de aborto, que mata el árbol de procesos del navegador para que la llamada
+bloqueada falle enseguida.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+WATCHDOG_POLL = 1.0  # Segundos entre comprobaciones de los plazos
+
+
+def process_tree(root):
+    """PIDs de un proceso y sus descendientes, hijos antes que padres (solo el raíz fuera de Linux)"""
+    if not os.path.isdir("/proc"):
+        return [root]
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree[::-1]
+
+
+def kill_process_tree(root):
+    """Mata un proceso y todos sus descendientes (geckodriver y los procesos de Firefox)"""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(root)], capture_output=True)
+        return
+    for pid in process_tree(root):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+class Watchdog:
+    """Vigila el plazo de la página actual y el de la ejecución; 0 desactiva cada uno"""
+
+    def __init__(self, page_deadline, run_deadline, on_expire, poll=WATCHDOG_POLL):
+        self.page_deadline = page_deadline
+        self.run_deadline = run_deadline
+        self.on_expire = on_expire
+        self.poll = poll
+        self.expired = None  # "page" o "run" cuando se agota un plazo
+        self.report = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="watchdog", daemon=True)
+
+    def start(self):
+        """Empieza a vigilar el hilo que llama (el que ejecuta la encuesta)"""
+        self.run_start = self.page_start = time.monotonic()
+        self._watched = threading.get_ident()
+        self._thread.start()
+        return self
+
+    def start_page(self):
+        """Reinicia el plazo de la página al llegar a una nueva"""
+        self.page_start = time.monotonic()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll):
+            now = time.monotonic()
+            if self.run_deadline and now - self.run_start > self.run_deadline:
+                self.expired = "run"
+            elif self.page_deadline and now - self.page_start > self.page_deadline:
+                self.expired = "page"
+            else:
+                continue
+            self.report = self.diagnostics(now)
+            self.on_expire(self.report)
+            return
+
+    def diagnostics(self, now):
+        """Qué plazo se agotó, cuánto se llevaba y dónde estaba detenido el hilo vigilado"""
+        frame = sys._current_frames().get(self._watched)
+        return {
+            "reason": self.expired,
+            "deadline_s": self.run_deadline if self.expired == "run" else self.page_deadline,
+            "run_s": round(now - self.run_start, 1),
+            "page_s": round(now - self.page_start, 1),
+            "stack": [line.rstrip() for line in traceback.format_stack(frame)] if frame else [],
+        }
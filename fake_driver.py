@@ -0,0 +1,558 @@
+"""WebDriver falso en memoria sobre html_page: los manejadores sin navegador.
+
+FakeDriver implementa el subconjunto de la API de WebDriver y WebElement que
+usa el bot sobre una html_page.HtmlPage: execute_script con los scripts de
+page_scripts.py, execute_async_script con WAIT_SCRIPT, find_element(s) por
+id, CSS, nombre, etiqueta, clase y las XPath en uso, is_displayed,
+get_attribute, .text, click, send_keys y lo que necesita
+selenium.webdriver.support.ui.Select. A diferencia de http_backend, aquí
+McDVoiceSurvey se usa tal cual, con su camino de Selenium: solo cambia el
+driver.
+
+Cada comando pasa por command_executor.execute con su nombre de WebDriver:
+se cuentan en FakeDriver.commands y la instrumentación los mide igual que
+con geckodriver. No se ejecuta el JavaScript de la página (salvo los
+onclick que ocultan un elemento, como el del diálogo de sesión), así que
+una espera se cumple o no en el acto.
+
+    driver = FakeDriver.from_html(html)   # una página suelta (fixture)
+    driver = FakeDriver(); driver.get(url)  # navegando con HttpSession (p. ej. local_server)
+
+tests/test_handlers.py pasa cada manejador de WIDGET_HANDLERS por este
+driver con varias semillas y limita los comandos por página. El subcomando
+fuzz hace la misma comprobación sobre fixtures/ con tantas semillas como se
+pidan, para buscar fallos raros fuera de las pruebas:
+
+    python fake_driver.py fuzz --seeds 1000
+    python fake_driver.py fuzz --seeds 200 --max-commands 6
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+from selenium.common.exceptions import (InvalidSelectorException, JavascriptException, NoAlertPresentException,
+                                        NoSuchElementException, StaleElementReferenceException)
+from selenium.webdriver.common.by import By
+
+from html_page import HtmlPage, select
+from http_backend import HttpSession
+from local_server import FIXTURES_DIR, load_pages, render_page
+from mc2 import McDVoiceSurvey
+from page_scripts import APPLY_PLAN_SCRIPT, FIND_SCRIPT, LAYOUT_SCRIPT, SNAPSHOT_SCRIPT, STATE_SCRIPT, WAIT_SCRIPT
+
+CLICK_SCRIPT = "arguments[0].click();"  # McDVoiceSurvey.safe_click
+PING_SCRIPT = "return 1;"  # daemon.WarmBrowser.alive
+# onclick que oculta el propio elemento o un ancestro (p. ej. "Extend Session" del diálogo de sesión)
+HIDE_HANDLER = re.compile(r"this((?:\.parentNode)*)\.style\.display\s*=\s*['\"]none['\"]")
+
+# ---------------------------------------------------------------------------
+# XPath: solo las formas que usa el bot y Select
+#   //p[contains(@class, 'ValCode')]   //h2//p[contains(text(), 'Thank you')]
+#   //input[@type='submit' and contains(@value, 'Next')]   .//option[normalize-space(.) = "x"]
+
+_XPATH_STEP = re.compile(r"(//|/)(\*|[\w-]+)((?:\[(?:[^\]'\"]|'[^']*'|\"[^\"]*\")*\])*)")
+_XPATH_PREDICATE = re.compile(r"\[((?:[^\]'\"]|'[^']*'|\"[^\"]*\")*)\]")
+_XPATH_TERM = re.compile(
+    r"(?P<fn>contains|starts-with)\(\s*(?P<farg>@[\w-]+|text\(\)|\.)\s*,\s*(?P<fval>'[^']*'|\"[^\"]*\")\s*\)"
+    r"|(?P<arg>normalize-space\(\s*(?:\.|text\(\))?\s*\)|@[\w-]+|text\(\)|\.)(?:\s*=\s*(?P<val>'[^']*'|\"[^\"]*\"))?"
+)
+
+
+def _xpath_value(node, arg):
+    if arg.startswith("@"):
+        return node.get(arg[1:])
+    if arg.startswith("normalize-space"):
+        inner = arg[arg.index("(") + 1:-1].strip()
+        return " ".join((_xpath_value(node, inner) if inner else node.raw_text()).split())
+    if arg == "text()":
+        # Como en XPath 1.0: el primer nodo de texto hijo
+        return next((child for child in node.children if isinstance(child, str)), "")
+    return node.raw_text()
+
+
+def _xpath_holds(node, predicate):
+    for term in re.split(r"\s+and\s+", predicate.strip()):
+        match = _XPATH_TERM.fullmatch(term.strip())
+        if not match:
+            raise InvalidSelectorException(f"XPath no soportada por FakeDriver: [{predicate}]")
+        if match.group("fn"):
+            value, expected = _xpath_value(node, match.group("farg")), match.group("fval")[1:-1]
+            if value is None or not (expected in value if match.group("fn") == "contains"
+                                     else value.startswith(expected)):
+                return False
+        else:
+            value = _xpath_value(node, match.group("arg"))
+            if match.group("val") is not None:
+                if value != match.group("val")[1:-1]:
+                    return False
+            elif not value:
+                return False
+    return True
+
+
+def xpath(scope, expression):
+    """Nodos que selecciona una XPath del subconjunto soportado, en orden de documento"""
+    relative = expression.startswith(".")
+    path = expression[1:] if relative else expression
+    if not relative:
+        while scope.parent is not None:
+            scope = scope.parent
+    current, pos = [scope], 0
+    while pos < len(path):
+        step = _XPATH_STEP.match(path, pos)
+        if not step:
+            raise InvalidSelectorException(f"XPath no soportada por FakeDriver: {expression}")
+        pos = step.end()
+        axis, test, predicates = step.groups()
+        found, seen = [], set()
+        for context in current:
+            candidates = context.iter() if axis == "//" else (c for c in context.children if not isinstance(c, str))
+            for node in candidates:
+                if id(node) in seen or (test != "*" and node.tag != test):
+                    continue
+                if all(_xpath_holds(node, p) for p in _XPATH_PREDICATE.findall(predicates)):
+                    seen.add(id(node))
+                    found.append(node)
+        current = found
+    return current
+
+
+# ---------------------------------------------------------------------------
+# Driver y elementos
+
+
+class FakeExecutor:
+    """Despacha los comandos WebDriver al FakeDriver; la instrumentación envuelve su execute"""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def execute(self, command, params):
+        self.driver.commands[command] += 1
+        return {"value": self.driver.dispatch(command, params)}
+
+
+class FakeElement:
+    """Un nodo de la página actual con la interfaz de WebElement"""
+
+    def __init__(self, parent, page, node):
+        self.parent = parent
+        self.page = page
+        self.node = node
+
+    def __eq__(self, other):
+        return isinstance(other, FakeElement) and other.node is self.node
+
+    def __hash__(self):
+        return id(self.node)
+
+    def __repr__(self):
+        return f"<FakeElement {self.node.tag}#{self.node.id}>"
+
+    @property
+    def id(self):
+        return str(id(self.node))
+
+    def _execute(self, command, **params):
+        return self.parent.command_executor.execute(command, dict(params, id=self))["value"]
+
+    @property
+    def tag_name(self):
+        return self._execute("getElementTagName")
+
+    @property
+    def text(self):
+        return self._execute("getElementText")
+
+    def get_attribute(self, name):
+        return self._execute("getElementAttribute", name=name)
+
+    def get_dom_attribute(self, name):
+        return self._execute("getElementDomAttribute", name=name)
+
+    def get_property(self, name):
+        return self._execute("getElementProperty", name=name)
+
+    def is_displayed(self):
+        return self._execute("isElementDisplayed")
+
+    def is_enabled(self):
+        return self._execute("isElementEnabled")
+
+    def is_selected(self):
+        return self._execute("isElementSelected")
+
+    def click(self):
+        self._execute("clickElement")
+
+    def clear(self):
+        self._execute("clearElement")
+
+    def send_keys(self, *value):
+        self._execute("sendKeysToElement", text="".join(str(v) for v in value))
+
+    def find_element(self, by=By.ID, value=None):
+        return self._execute("findChildElement", using=by, value=value)
+
+    def find_elements(self, by=By.ID, value=None):
+        return self._execute("findChildElements", using=by, value=value)
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    @property
+    def alert(self):
+        self._driver.command_executor.execute("w3cGetAlertText", {})
+        raise NoAlertPresentException("FakeDriver no muestra diálogos")
+
+
+class FakeDriver:
+    """Driver en memoria: una HtmlPage como documento y, para navegar, una HttpSession"""
+
+    def __init__(self, session=None):
+        self.session = session
+        self.page = HtmlPage("<html><body></body></html>", "about:blank")
+        self.html = ""
+        self.last_request = None
+        self.submissions = []  # (método, URL, campos) de cada formulario enviado
+        self.commands = Counter()
+        self.command_executor = FakeExecutor(self)
+        self.switch_to = _SwitchTo(self)
+
+    @classmethod
+    def from_html(cls, html, url=""):
+        """Driver con una página suelta ya cargada; sus envíos se anotan en submissions sin navegar"""
+        driver = cls()
+        driver.load_html(html, url)
+        return driver
+
+    def load_html(self, html, url=""):
+        self.page = HtmlPage(html, url)
+        self.html = html
+
+    def _execute(self, command, **params):
+        return self.command_executor.execute(command, params)["value"]
+
+    # API de WebDriver
+
+    def get(self, url):
+        self._execute("get", url=url)
+
+    def refresh(self):
+        self._execute("refresh")
+
+    @property
+    def current_url(self):
+        return self._execute("getCurrentUrl")
+
+    @property
+    def page_source(self):
+        return self._execute("getPageSource")
+
+    def execute_script(self, script, *args):
+        return self._execute("w3cExecuteScript", script=script, args=list(args))
+
+    def execute_async_script(self, script, *args):
+        return self._execute("w3cExecuteScriptAsync", script=script, args=list(args))
+
+    def find_element(self, by=By.ID, value=None):
+        return self._execute("findElement", using=by, value=value)
+
+    def find_elements(self, by=By.ID, value=None):
+        return self._execute("findElements", using=by, value=value)
+
+    def delete_all_cookies(self):
+        self._execute("deleteAllCookies")
+
+    def quit(self):
+        self._execute("quit")
+
+    # Comandos
+
+    def dispatch(self, command, params):
+        element = params.get("id")
+        if isinstance(element, FakeElement):
+            self._check(element)
+        if command in ("get", "refresh"):
+            self._navigate(("GET", params["url"], None) if command == "get" else self.last_request)
+            return None
+        if command == "getCurrentUrl":
+            return self.page.url
+        if command == "getPageSource":
+            return self.html
+        if command == "w3cExecuteScript":
+            return self._script(params["script"], params["args"])
+        if command == "w3cExecuteScriptAsync":
+            if params["script"] != WAIT_SCRIPT:
+                raise JavascriptException("FakeDriver solo ejecuta WAIT_SCRIPT de forma asíncrona")
+            return self._wait(*params["args"][:1])
+        if command in ("findElement", "findChildElement"):
+            nodes = self._nodes(params["using"], params["value"], element.node if element else None)
+            if not nodes:
+                raise NoSuchElementException(f"No se encontró {params['using']}={params['value']}")
+            return self._element(nodes[0])
+        if command in ("findElements", "findChildElements"):
+            return [self._element(node) for node in
+                    self._nodes(params["using"], params["value"], element.node if element else None)]
+        if command == "deleteAllCookies":
+            if self.session:
+                self.session.cookies.clear()
+            return None
+        if command == "quit":
+            if self.session:
+                self.session.close()
+            return None
+        if command == "w3cGetAlertText":
+            return None
+        return self._element_command(command, element.node, params)
+
+    def _element_command(self, command, node, params):
+        if command == "getElementTagName":
+            return node.tag
+        if command == "getElementText":
+            return node.text() if self.page.visible(node) else ""
+        if command in ("getElementAttribute", "getElementProperty"):
+            return self._property(node, params["name"])
+        if command == "getElementDomAttribute":
+            return node.get(params["name"])
+        if command == "isElementDisplayed":
+            return self.page.visible(node)
+        if command == "isElementEnabled":
+            return "disabled" not in node.attrs
+        if command == "isElementSelected":
+            return node.selected if node.tag == "option" else node.checked
+        if command == "clickElement":
+            self._click(node)
+            return None
+        if command == "clearElement":
+            self.page.set_value(node, "")
+            return None
+        if command == "sendKeysToElement":
+            self.page.set_value(node, node.field_value() + params["text"])
+            return None
+        raise JavascriptException(f"Comando no soportado por FakeDriver: {command}")
+
+    def _check(self, element):
+        if element.page is not self.page:
+            raise StaleElementReferenceException("El elemento pertenece a una página anterior")
+
+    def _element(self, node):
+        return FakeElement(self, self.page, node)
+
+    def _property(self, node, name):
+        """Como get_attribute de Selenium: propiedades del formulario primero, luego atributos"""
+        if name == "value":
+            return node.option_value() if node.tag == "option" else node.field_value()
+        if name in ("checked", "selected"):
+            state = node.selected if node.tag == "option" else node.checked
+            return "true" if state else None
+        if name == "index" and node.tag == "option":
+            parent = node.closest("select")
+            options = [n for n in parent.iter() if n.tag == "option"] if parent else [node]
+            return str(options.index(node))
+        return node.get(name)
+
+    def _nodes(self, by, value, scope=None):
+        scope = scope or self.page.root
+        if by == By.ID:
+            return [node for node in scope.iter() if node.id == value]
+        if by == By.CSS_SELECTOR:
+            return select(scope, value)
+        if by == By.XPATH:
+            return xpath(scope, value)
+        if by == By.NAME:
+            return [node for node in scope.iter() if node.get("name") == value]
+        if by == By.TAG_NAME:
+            return [node for node in scope.iter() if node.tag == value.lower()]
+        if by == By.CLASS_NAME:
+            return [node for node in scope.iter() if value in node.classes]
+        raise InvalidSelectorException(f"Estrategia de búsqueda no soportada por FakeDriver: {by}")
+
+    def _locate(self, locators, usable, shown=False):
+        """Como FIND_SCRIPT: el primer nodo (visible y habilitado si usable, solo visible si shown) de varios
+        localizadores"""
+        for by, value in locators:
+            for node in self._nodes(by, value):
+                if shown and not self.page.visible(node):
+                    continue
+                if not usable or (self.page.visible(node) and "disabled" not in node.attrs):
+                    return self._element(node)
+        return None
+
+    def _script(self, script, args):
+        for arg in args:
+            if isinstance(arg, FakeElement):
+                self._check(arg)
+        if script == SNAPSHOT_SCRIPT:
+            return self.page.snapshot(args[0] if args else None)
+        if script == LAYOUT_SCRIPT:
+            return self.page.layout()
+        if script == APPLY_PLAN_SCRIPT:
+            return self.page.apply(args[0])
+        if script == STATE_SCRIPT:
+            return self.page.state(args[0])
+        if script == FIND_SCRIPT:
+            return self._locate(args[0], usable=True)
+        if script.strip() == CLICK_SCRIPT:
+            self._click(args[0].node)
+            return None
+        if script.strip() == PING_SCRIPT:
+            return 1
+        raise JavascriptException(f"Script no soportado por FakeDriver: {script.strip()[:60]}")
+
+    def _wait(self, conditions):
+        """WAIT_SCRIPT sin esperar: la página no cambia sola, así que las condiciones se cumplen ya o nunca"""
+        found = None
+        for kind, target in conditions:
+            if kind == "ready":
+                holds = True
+            elif kind == "detached":
+                self._check(target)  # Un elemento de la página anterior falla como en geckodriver
+                holds = False
+            elif kind in ("present", "visible", "shown"):
+                holds = self._locate(target, usable=kind == "visible", shown=kind == "shown")
+            elif kind == "hidden":
+                holds = not any(self.page.visible(node) for by, value in target for node in self._nodes(by, value))
+            else:
+                raise JavascriptException(f"Condición de espera desconocida: {kind}")
+            if not holds:
+                return False
+            if found is None and holds is not True:
+                found = holds
+        return found or True
+
+    # Efectos en la página
+
+    def _click(self, node):
+        if "disabled" in node.attrs:
+            return
+        handler = HIDE_HANDLER.search(node.get("onclick", ""))
+        if handler:
+            target = node
+            for _ in range(handler.group(1).count("parentNode")):
+                target = target.parent
+            self.page.dismissed.add(target)
+        kind = node.get("type", "").lower()
+        if (node.tag == "input" and kind in ("submit", "image")) or (node.tag == "button" and kind in ("", "submit")):
+            self._submit(node)
+        elif node.tag == "option":
+            parent = node.closest("select")
+            if parent is not None:
+                self.page.set_value(parent, node.option_value())
+        else:
+            control = self.page.control(node) if node.tag == "label" else node
+            if control is not None:
+                self.page.click(control)
+
+    def _submit(self, button):
+        submission = self.page.form_submission(button)
+        if submission is None:
+            return
+        self.submissions.append(submission)
+        # Una página suelta (from_html) no tiene adónde navegar: el envío solo queda anotado
+        if self.last_request is not None:
+            self._navigate(submission)
+
+    def _navigate(self, request):
+        if request is None:
+            self.load_html(self.html, self.page.url)
+            return
+        if self.session is None:
+            self.session = HttpSession()
+        method, url, fields = request
+        _, final_url, html = self.session.request(method, url, fields)
+        self.last_request = request
+        self.load_html(html, final_url)
+
+
+# ---------------------------------------------------------------------------
+# Pruebas aleatorias de los manejadores
+
+
+def answer_fixture(html, seed, **survey_options):
+    """Responde y envía una página suelta con McDVoiceSurvey sobre un FakeDriver; devuelve (encuesta, driver)"""
+    driver = FakeDriver.from_html(html)
+    survey = McDVoiceSurvey(pacing="sin_pausas", quiet=True, trace=None, driver=driver, seed=seed, ledger=None,
+                            record=None, layout_cache=None, page_deadline=0, run_deadline=0, **survey_options)
+    survey.new_page()
+    survey.answer_page()
+    survey.submit_page()
+    return survey, driver
+
+
+def missing_answers(required, submission):
+    """Campos obligatorios sin valor en un envío, con la misma regla que local_server"""
+    fields = submission[2] if submission else []
+    return [name for name in required if not "".join(value for key, value in fields if key == name).strip()]
+
+
+def page_problems(survey, driver, required, max_commands=0):
+    """Problemas de una página respondida con answer_fixture: respuestas obligatorias faltantes, errores de los
+    manejadores y más comandos WebDriver que max_commands (0 = sin límite)"""
+    problems = []
+    missing = missing_answers(required, driver.submissions[-1] if driver.submissions else None)
+    if missing:
+        problems.append(f"sin respuesta: {', '.join(missing)}")
+    if survey.error_count:
+        problems.append(f"{survey.error_count} errores")
+    total = sum(driver.commands.values())
+    if max_commands and total > max_commands:
+        problems.append(f"{total} comandos")
+    return problems
+
+
+def command_fuzz(args):
+    pages = load_pages(args.fixtures)
+    seeds = random.Random(args.seed).sample(range(2**32), args.seeds)
+    failures = 0
+    print(f"{'página':<20}{'semillas':>10}{'fallos':>8}{'comandos (máx.)':>17}{'ms por página':>15}")
+    # La primera página es la del ticket y la última la final: no tienen manejadores de preguntas
+    for index in range(1, len(pages) - 1):
+        html = render_page(pages, index)
+        page_failures, commands, elapsed = 0, [], []
+        for seed in seeds:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                survey, driver = answer_fixture(html, seed)
+            elapsed.append(time.perf_counter() - start)
+            commands.append(sum(driver.commands.values()))
+            problems = page_problems(survey, driver, pages[index]["required"], args.max_commands)
+            if problems:
+                page_failures += 1
+                if page_failures <= args.show:
+                    print(f"  {pages[index]['name']} semilla {seed}: {'; '.join(problems)}")
+                    if args.verbose:
+                        print(output.getvalue())
+        failures += page_failures
+        print(f"{pages[index]['name']:<20}{len(seeds):>10}{page_failures:>8}{max(commands):>17}"
+              f"{statistics.median(elapsed) * 1000:>15.2f}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebDriver falso en memoria para el bot de McDVoice")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fuzz = commands.add_parser("fuzz", help="Responde cada fixture con muchas semillas y verifica los envíos")
+    fuzz.add_argument("--fixtures", default=FIXTURES_DIR, help="Directorio de páginas grabadas")
+    fuzz.add_argument("--seeds", type=int, default=200, help="Semillas por página")
+    fuzz.add_argument("--seed", type=int, default=0, help="Semilla que elige las semillas (para repetir una prueba)")
+    fuzz.add_argument("--max-commands", type=int, default=0, help="Comandos WebDriver máximos por página (0 = sin límite)")
+    fuzz.add_argument("--show", type=int, default=5, help="Fallos que se muestran por página")
+    fuzz.add_argument("--verbose", action="store_true", help="Mostrar la salida del bot en cada fallo")
+    fuzz.set_defaults(func=command_fuzz)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
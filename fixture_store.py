@@ -0,0 +1,155 @@
+"""Almacén de páginas grabadas, sin duplicados, indexado por estructura.
+
+En modo de grabación (mc2.py --record DIR) el bot guarda cada página de
+preguntas después de responderla: el HTML comprimido y las respuestas que
+aplicó. Las páginas se identifican por una huella de su estructura (ids de
+las filas FNSR, clases, columna N/A y número de opciones de las tablas,
+clases, id y número de opciones de los fieldsets, ids de selects y
+textareas y campos "Otro" visibles), no por su contenido, así que mil
+ejecuciones sobre las mismas páginas guardan una sola copia de cada una.
+Cuando aparece una estructura nunca vista se avisa: es donde los
+manejadores suelen fallar sin decir nada.
+
+    DIR/indice.json             huella -> primera y última vez, veces vista, tipo...
+    DIR/paginas/<huella>.html.gz  HTML de la primera vez que se vio
+    DIR/decisiones.jsonl        una línea por página grabada con las respuestas aplicadas
+
+    python fixture_store.py layouts --store grabaciones
+    python fixture_store.py export <huella> --store grabaciones --output pagina.html
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+RECORD_DIR = os.environ.get("MCDVOICE_RECORD")  # Directorio del almacén (None = sin grabar)
+
+
+def layout_structure(snapshot):
+    """Estructura de una página a partir de su snapshot: lo mismo que devuelve LAYOUT_SCRIPT. Las tablas
+    llevan si tienen N/A y cuántas opciones, y los fieldsets su id y cuántas opciones"""
+    return {
+        "rows": [row["id"] for table in snapshot["tables"] for row in table["rows"]],
+        "tables": [f"{table['classes']}|{'na' if table['has_na'] else ''}|{len(table['options'])}"
+                   for table in snapshot["tables"]],
+        "fieldsets": [f"{fieldset['classes']}|{fieldset['id']}|{len(fieldset['options']) + len(fieldset['choices'])}"
+                      for fieldset in snapshot["fieldsets"]],
+        "selects": [select["id"] for select in snapshot["selects"]],
+        "textareas": [textarea["id"] for textarea in snapshot["textareas"]],
+        "other_inputs": sum(1 for fieldset in snapshot["fieldsets"] if fieldset["other_input"]),
+    }
+
+
+def structure_fingerprint(structure):
+    """Huella estable de una estructura (no depende del orden de los widgets ni de los textos)"""
+    canonical = {key: sorted(value) if isinstance(value, list) else value for key, value in structure.items()}
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def layout_fingerprint(snapshot):
+    """Huella de la estructura de una página a partir de su snapshot"""
+    return structure_fingerprint(layout_structure(snapshot))
+
+
+class FixtureStore:
+    def __init__(self, path=RECORD_DIR):
+        self.path = path
+        self.pages_dir = os.path.join(path, "paginas")
+        self.index_path = os.path.join(path, "indice.json")
+        self.decisions_path = os.path.join(path, "decisiones.jsonl")
+        os.makedirs(self.pages_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self):
+        # Se escribe aparte y se reemplaza: un corte a mitad de escritura no deja el índice dañado
+        temporary = self.index_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, ensure_ascii=False)
+        os.replace(temporary, self.index_path)
+
+    def page_path(self, fingerprint):
+        return os.path.join(self.pages_dir, fingerprint + ".html.gz")
+
+    def record(self, snapshot, html, page_type, decisions, context=None):
+        """Guarda una página respondida; devuelve (huella, si es una estructura nueva)"""
+        fingerprint = layout_fingerprint(snapshot)
+        now = datetime.now().astimezone().isoformat(timespec="seconds")
+        entry = self.index.get(fingerprint)
+        new = entry is None
+        if new:
+            with gzip.open(self.page_path(fingerprint), "wt", encoding="utf-8") as f:
+                f.write(html)
+            entry = self.index[fingerprint] = {"type": page_type, "url": snapshot.get("url"), "first_seen": now,
+                                               "count": 0,
+                                               "unknown_widgets": (context or {}).get("unknown_widgets", 0)}
+        entry["last_seen"] = now
+        entry["count"] += 1
+        self._save_index()
+
+        record = dict(context or {}, time=now, fingerprint=fingerprint, type=page_type, new=new,
+                      decisions=decisions)
+        with open(self.decisions_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return fingerprint, new
+
+    def load(self, fingerprint):
+        """HTML guardado de una estructura"""
+        with gzip.open(self.page_path(fingerprint), "rt", encoding="utf-8") as f:
+            return f.read()
+
+
+def command_layouts(args):
+    store = FixtureStore(args.store)
+    if not store.index:
+        print(f"No hay páginas grabadas en {args.store}")
+        return 1
+    print(f"{'huella':<18}{'veces':>7}{'sin manejador':>15}  {'primera vez':<27}{'tipo'}")
+    for fingerprint, entry in sorted(store.index.items(), key=lambda item: item[1]["first_seen"]):
+        print(f"{fingerprint:<18}{entry['count']:>7}{entry.get('unknown_widgets', 0):>15}  {entry['first_seen']:<27}"
+              f"{entry['type']}")
+    return 0
+
+
+def command_export(args):
+    store = FixtureStore(args.store)
+    if args.fingerprint not in store.index:
+        print(f"Huella desconocida: {args.fingerprint}")
+        return 1
+    html = store.load(args.fingerprint)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Página guardada en {args.output}")
+    else:
+        print(html)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén de páginas grabadas de McDVoice")
+    parser.add_argument("--store", default=RECORD_DIR or "grabaciones", help="Directorio del almacén")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("layouts", help="Estructuras de página vistas y cuántas veces").set_defaults(
+        func=command_layouts)
+
+    export = commands.add_parser("export", help="Escribe el HTML grabado de una estructura")
+    export.add_argument("fingerprint", help="Huella de la estructura (ver layouts)")
+    export.add_argument("--output", help="Archivo de salida (por defecto, la consola)")
+    export.set_defaults(func=command_export)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
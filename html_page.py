@@ -0,0 +1,618 @@
+"""Modelo de una página de la encuesta a partir de su HTML, sin navegador.
+
+Construye un árbol mínimo con html.parser, resuelve un subconjunto de
+selectores CSS (etiqueta, #id, .clase, [atributo], [atributo=, *=, ^=, $=,
+~= valor], descendiente y '>'), y reproduce en Python lo que hacen
+SNAPSHOT_SCRIPT, APPLY_PLAN_SCRIPT y STATE_SCRIPT de page_scripts.py: el
+snapshot tiene la misma forma y las mismas referencias, así que los
+manejadores de mc2.py no distinguen entre esta página y el navegador.
+
+La visibilidad solo considera lo que está en el propio HTML (atributo
+hidden, estilos en línea display/visibility, inputs ocultos); el sitio no
+oculta preguntas con hojas de estilo en las páginas que se envían.
+"""
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                 "source", "track", "wbr"}
+# Elementos que se cierran solos al abrir otro igual (HTML sin etiqueta de cierre)
+SELF_CLOSING_SIBLINGS = {"option", "li", "tr", "td", "th", "p"}
+INVISIBLE_TAGS = {"head", "script", "style", "template", "title", "noscript"}
+
+
+class Node:
+    """Elemento del árbol: etiqueta, atributos, hijos (nodos o texto) y estado del formulario"""
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+        # Estado del formulario, inicializado desde el HTML como lo haría el navegador
+        self.value = attrs.get("value", "") if tag != "textarea" else None
+        self.checked = "checked" in attrs
+        self.selected = "selected" in attrs
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+    @property
+    def id(self):
+        return self.attrs.get("id", "")
+
+    @property
+    def classes(self):
+        return self.attrs.get("class", "").split()
+
+    def iter(self):
+        """Descendientes en orden de documento"""
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.iter()
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def closest(self, tag):
+        return next((node for node in self.ancestors() if node.tag == tag), None)
+
+    def raw_text(self):
+        parts = []
+        for child in self.children:
+            parts.append(child.raw_text() if isinstance(child, Node) else child)
+        return "".join(parts)
+
+    def text(self):
+        """Texto visible con espacios colapsados (como innerText)"""
+        if self.tag == "textarea":
+            return self.field_value()
+        return " ".join(self.raw_text().split())
+
+    def field_value(self):
+        """Valor actual de un input, textarea o select"""
+        if self.tag == "textarea":
+            return self.raw_text() if self.value is None else self.value
+        if self.tag == "select":
+            options = [node for node in self.iter() if node.tag == "option"]
+            chosen = next((opt for opt in options if opt.selected), options[0] if options else None)
+            return chosen.option_value() if chosen else ""
+        return self.value
+
+    def option_value(self):
+        return self.attrs["value"] if "value" in self.attrs else self.text()
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {})
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: (value if value is not None else "") for name, value in attrs}
+        if tag in SELF_CLOSING_SIBLINGS and self.stack[-1].tag == tag:
+            self.stack.pop()
+        node = Node(tag, attrs, self.stack[-1])
+        self.stack[-1].children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+# ---------------------------------------------------------------------------
+# Selectores CSS
+
+_IDENT = r"(?:\\[0-9a-fA-F]{1,6}\s?|\\.|[\w\-\u00a0-\uffff])+"
+_TOKEN = re.compile(
+    r"\s*(?P<comb>>)\s*"
+    r"|(?P<space>\s+)"
+    r"|(?P<tag>\*|[a-zA-Z][\w-]*)"
+    r"|#(?P<id>" + _IDENT + ")"
+    r"|\.(?P<cls>" + _IDENT + ")"
+    r"|\[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[*^$~|]?=)\s*(?:\"(?P<dq>[^\"]*)\"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+)))?\s*\]"
+)
+
+
+def _unescape(ident):
+    def replace(match):
+        escaped = match.group(0)[1:]
+        if re.fullmatch(r"[0-9a-fA-F]{1,6}\s?", escaped):
+            return chr(int(escaped.strip(), 16))
+        return escaped
+    return re.sub(r"\\(?:[0-9a-fA-F]{1,6}\s?|.)", replace, ident)
+
+
+def css_escape(ident):
+    """Equivalente a CSS.escape para identificadores"""
+    out = []
+    for i, ch in enumerate(ident):
+        if ch.isdigit() and (i == 0 or (i == 1 and ident[0] == "-")):
+            out.append("\\%x " % ord(ch))
+        elif ch.isalnum() or ch in "-_" or ord(ch) >= 0x80:
+            out.append(ch)
+        else:
+            out.append("\\" + ch)
+    return "".join(out)
+
+
+def _split_groups(selector):
+    groups, depth, quote, current = [], 0, None, []
+    for ch in selector:
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "\"'":
+            quote = ch
+        elif ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            groups.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    groups.append("".join(current))
+    return [group.strip() for group in groups if group.strip()]
+
+
+def _parse_complex(selector):
+    """Convierte un selector sin comas en [(combinador, compuesto)] de izquierda a derecha"""
+    parts, compound, combinator, pos = [], [], None, 0
+    while pos < len(selector):
+        match = _TOKEN.match(selector, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Selector no soportado: {selector}")
+        pos = match.end()
+        if match.group("comb") or match.group("space"):
+            if compound:
+                parts.append((combinator, compound))
+                compound, combinator = [], " "
+            if match.group("comb"):
+                combinator = ">"
+        elif match.group("tag"):
+            compound.append(("tag", match.group("tag").lower()))
+        elif match.group("id"):
+            compound.append(("id", _unescape(match.group("id"))))
+        elif match.group("cls"):
+            compound.append(("class", _unescape(match.group("cls"))))
+        else:
+            values = (match.group("dq"), match.group("sq"), match.group("bare"))
+            value = next((_unescape(v) for v in values if v is not None), None)
+            compound.append(("attr", match.group("attr").lower(), match.group("op"), value))
+    if compound:
+        parts.append((combinator, compound))
+    return parts
+
+
+def _matches_compound(node, compound):
+    for test in compound:
+        kind = test[0]
+        if kind == "tag":
+            if test[1] != "*" and node.tag != test[1]:
+                return False
+        elif kind == "id":
+            if node.id != test[1]:
+                return False
+        elif kind == "class":
+            if test[1] not in node.classes:
+                return False
+        else:
+            _, name, op, value = test
+            if name not in node.attrs:
+                return False
+            actual = node.attrs[name]
+            if op == "=" and actual != value:
+                return False
+            if op == "*=" and (not value or value not in actual):
+                return False
+            if op == "^=" and (not value or not actual.startswith(value)):
+                return False
+            if op == "$=" and (not value or not actual.endswith(value)):
+                return False
+            if op == "~=" and value not in actual.split():
+                return False
+            if op == "|=" and actual != value and not actual.startswith(value + "-"):
+                return False
+    return True
+
+
+def _matches(node, parts, index=None):
+    index = len(parts) - 1 if index is None else index
+    combinator, compound = parts[index]
+    if not _matches_compound(node, compound):
+        return False
+    if index == 0:
+        return True
+    if combinator == ">":
+        return node.parent is not None and node.parent.tag != "#document" and _matches(node.parent, parts, index - 1)
+    return any(_matches(ancestor, parts, index - 1) for ancestor in node.ancestors() if ancestor.tag != "#document")
+
+
+_SELECTOR_CACHE = {}
+
+
+def compile_selector(selector):
+    if selector not in _SELECTOR_CACHE:
+        _SELECTOR_CACHE[selector] = [_parse_complex(group) for group in _split_groups(selector)]
+    return _SELECTOR_CACHE[selector]
+
+
+def matches(node, selector):
+    return any(_matches(node, parts) for parts in compile_selector(selector))
+
+
+def select(scope, selector):
+    """Descendientes de scope que cumplen el selector, en orden de documento"""
+    groups = compile_selector(selector)
+    return [node for node in scope.iter() if any(_matches(node, parts) for parts in groups)]
+
+
+def select_one(scope, selector):
+    groups = compile_selector(selector)
+    return next((node for node in scope.iter() if any(_matches(node, parts) for parts in groups)), None)
+
+
+# ---------------------------------------------------------------------------
+# Página
+
+def _style_hides(node):
+    style = node.get("style", "").replace(" ", "").lower()
+    return "display:none" in style or "visibility:hidden" in style
+
+
+class HtmlPage:
+    """Una página de la encuesta cargada sin navegador"""
+
+    def __init__(self, html, url=""):
+        builder = _TreeBuilder()
+        builder.feed(html)
+        builder.close()
+        self.url = url
+        self.root = builder.root
+        self._seq = 0
+        self._label_targets = None  # Cuántas etiquetas apuntan a cada id (el árbol no cambia tras el análisis)
+        self.dismissed = set()  # Nodos ocultos por una acción de la página (p. ej. extender sesión)
+
+    # Consultas
+
+    def select(self, selector, scope=None):
+        return select(scope or self.root, selector)
+
+    def select_one(self, selector, scope=None):
+        return select_one(scope or self.root, selector)
+
+    def by_id(self, element_id):
+        return next((node for node in self.root.iter() if node.id == element_id), None)
+
+    def visible(self, node):
+        if node is None:
+            return False
+        if node.tag == "input" and node.get("type", "").lower() == "hidden":
+            return False
+        for current in [node] + list(node.ancestors()):
+            if current in self.dismissed or current.tag in INVISIBLE_TAGS:
+                return False
+            if "hidden" in current.attrs or _style_hides(current):
+                return False
+        if "opacity:0" in node.get("style", "").replace(" ", ""):
+            return False
+        return True
+
+    def ref(self, node):
+        """Referencia CSS estable del nodo, con el mismo formato que SNAPSHOT_SCRIPT"""
+        if node is None:
+            return None
+        if node.id:
+            return "#" + css_escape(node.id)
+        if node.tag == "label" and node.get("for"):
+            if self._label_targets is None:
+                self._label_targets = Counter(label.get("for") for label in self.root.iter() if label.tag == "label")
+            if self._label_targets[node.get("for")] == 1:
+                return f'label[for="{css_escape(node.get("for"))}"]'
+        if "data-mcdv" not in node.attrs:
+            self._seq += 1
+            node.attrs["data-mcdv"] = f"r{self._seq}"
+        return f'[data-mcdv="{node.attrs["data-mcdv"]}"]'
+
+    def label_for(self, node, scope=None):
+        if node is None or not node.id:
+            return None
+        return next((label for label in (scope or self.root).iter()
+                     if label.tag == "label" and label.get("for") == node.id), None)
+
+    def labels(self, node):
+        """Etiquetas asociadas a un control (label[for] o label contenedora)"""
+        found = [label for label in self.root.iter() if label.tag == "label" and node.id and label.get("for") == node.id]
+        enclosing = node.closest("label")
+        if enclosing is not None and enclosing not in found:
+            found.append(enclosing)
+        return found
+
+    def control(self, label):
+        """Control asociado a una etiqueta"""
+        if label.get("for"):
+            return self.by_id(label.get("for"))
+        return next((node for node in label.iter() if node.tag in ("input", "select", "textarea")), None)
+
+    def header(self, node):
+        ids = node.get("aria-labelledby", "").split()
+        if not ids:
+            return ""
+        header = self.by_id(ids[0])
+        return header.text() if header else ""
+
+    @staticmethod
+    def text(node):
+        return node.text() if node is not None else ""
+
+    # Snapshot (misma forma que SNAPSHOT_SCRIPT)
+
+    def _option(self, node, scope):
+        label = self.label_for(node, scope)
+        return {
+            "ref": self.ref(node),
+            "id": node.id,
+            "name": node.get("name", ""),
+            "value": node.value,
+            "type": node.get("type", "text").lower(),
+            "checked": node.checked,
+            "label_ref": self.ref(label),
+            "label": self.text(label),
+            "header": self.header(node),
+        }
+
+    def _radios(self, scope, label_scope, selector='input[type="radio"]'):
+        return [self._option(node, label_scope) for node in self.select(selector, scope) if self.visible(node)]
+
+    def flagged(self, node, selector):
+        """Si el nodo está dentro de una marca de error del sitio o contiene alguna"""
+        if node is None or not selector:
+            return False
+        return (any(matches(current, selector) for current in [node] + list(node.ancestors()))
+                or self.select_one(selector, node) is not None)
+
+    def snapshot(self, flagged_selector=None):
+        tables = []
+        for table in self.select("table"):
+            if not self.visible(table) or not self.select_one('input[type="radio"]', table):
+                continue
+            rows = []
+            for row in self.select('tbody tr[id*="FNSR"]', table):
+                if not self.visible(row):
+                    continue
+                rows.append({
+                    "ref": self.ref(row),
+                    "id": row.id,
+                    "text": self.text(self.select_one('th[class="LeftColumn"]', row)),
+                    "options": self._radios(row, row),
+                    "flagged": self.flagged(row, flagged_selector),
+                })
+            tables.append({
+                "ref": self.ref(table),
+                "id": table.id,
+                "classes": table.get("class", ""),
+                "caption": self.text(self.select_one("caption h2", table)),
+                "text": self.text(self.select_one('th[class="LeftColumn"]', table)),
+                "has_na": self.select_one('th[id*="HighlySatisfiedNeitherDESC9"]', table) is not None,
+                "rows": rows,
+                "options": self._radios(table, table),
+                "flagged": self.flagged(table, flagged_selector),
+            })
+
+        fieldsets = []
+        for fieldset in self.select("fieldset"):
+            if not self.visible(fieldset):
+                continue
+            choices = []
+            for div in self.select('div[class*="cataOption"]', fieldset):
+                checkbox = self.select_one('input[type="checkbox"]', div)
+                label = self.select_one("label", div)
+                choices.append({
+                    "ref": self.ref(checkbox),
+                    "id": checkbox.id if checkbox else "",
+                    "name": checkbox.get("name", "") if checkbox else "",
+                    "value": checkbox.value if checkbox else "",
+                    "type": "checkbox",
+                    "checked": checkbox.checked if checkbox else False,
+                    "label_ref": self.ref(label),
+                    "label": self.text(label),
+                    "header": "",
+                })
+            other_label = next((label for label in self.select("label", fieldset) if "Other" in label.raw_text()), None)
+            other_input = self.select_one('input[type="text"]', fieldset)
+            usable = self.visible(other_input) and "disabled" not in other_input.attrs
+            fieldsets.append({
+                "ref": self.ref(fieldset),
+                "id": fieldset.id,
+                "classes": fieldset.get("class", ""),
+                "legend": self.text(self.select_one("legend", fieldset)),
+                "in_table": fieldset.closest("table") is not None,
+                "options": self._radios(fieldset, self.root, 'input[type="radio"][name]'),
+                "choices": choices,
+                "other_visible": self.visible(other_label),
+                "other_input": self.ref(other_input) if usable else None,
+                "flagged": self.flagged(fieldset, flagged_selector),
+            })
+
+        selects = []
+        for node in self.select("select"):
+            if "hidden" in node.get("class", "") or node.get("aria-hidden") == "true" or not self.visible(node):
+                continue
+            selects.append({
+                "ref": self.ref(node),
+                "id": node.id,
+                "label": self.text(self.label_for(node)),
+                "options": [{"value": opt.get("value", ""), "text": opt.text()} for opt in self.select("option", node)],
+                "flagged": self.flagged(node, flagged_selector),
+            })
+
+        textareas = []
+        for node in self.select("textarea"):
+            if "disabled" in node.attrs or "hidden" in node.get("class", "") or not self.visible(node):
+                continue
+            textareas.append({"ref": self.ref(node), "id": node.id, "flagged": self.flagged(node, flagged_selector)})
+
+        return {"url": self.url, "tables": tables, "fieldsets": fieldsets, "selects": selects,
+                "textareas": textareas}
+
+    def layout(self):
+        """Estructura de la página (como LAYOUT_SCRIPT)"""
+        layout = {"rows": [], "tables": [], "fieldsets": [], "selects": [], "textareas": [], "other_inputs": 0}
+        for table in self.select("table"):
+            if not self.visible(table) or not self.select_one('input[type="radio"]', table):
+                continue
+            has_na = self.select_one('th[id*="HighlySatisfiedNeitherDESC9"]', table) is not None
+            options = sum(1 for node in self.select('input[type="radio"]', table) if self.visible(node))
+            layout["tables"].append(f"{table.get('class', '')}|{'na' if has_na else ''}|{options}")
+            layout["rows"] += [row.id for row in self.select('tbody tr[id*="FNSR"]', table) if self.visible(row)]
+        for fieldset in self.select("fieldset"):
+            if not self.visible(fieldset):
+                continue
+            options = sum(1 for node in self.select('input[type="radio"][name]', fieldset) if self.visible(node))
+            options += len(self.select('div[class*="cataOption"]', fieldset))
+            layout["fieldsets"].append(f"{fieldset.get('class', '')}|{fieldset.id}|{options}")
+            other = self.select_one('input[type="text"]', fieldset)
+            if self.visible(other) and "disabled" not in other.attrs:
+                layout["other_inputs"] += 1
+        for node in self.select("select"):
+            if "hidden" in node.get("class", "") or node.get("aria-hidden") == "true" or not self.visible(node):
+                continue
+            layout["selects"].append(node.id)
+        for node in self.select("textarea"):
+            if "disabled" in node.attrs or "hidden" in node.get("class", "") or not self.visible(node):
+                continue
+            layout["textareas"].append(node.id)
+        return layout
+
+    # Estado (como STATE_SCRIPT)
+
+    def state(self, probes):
+        for state, selector in probes:
+            if any(self.visible(node) for node in self.select(selector)):
+                return state
+        return "unknown"
+
+    # Acciones (como APPLY_PLAN_SCRIPT)
+
+    def _describe(self, el, control):
+        label = el if el.tag == "label" else (self.labels(control)[0] if control and self.labels(control) else None)
+        return {
+            "ok": True,
+            "error": "",
+            "value": control.field_value() if control is not None else "",
+            "label": self.text(label),
+            "header": self.header(control) if control is not None else "",
+            "text": self.text(label),
+        }
+
+    def click(self, control):
+        """Efecto de un clic sobre un control del formulario"""
+        kind = control.get("type", "").lower()
+        if control.tag != "input" or "disabled" in control.attrs:
+            return
+        if kind == "checkbox":
+            control.checked = not control.checked
+        elif kind == "radio":
+            form = control.closest("form") or self.root
+            for other in form.iter():
+                if other.tag == "input" and other.get("type", "").lower() == "radio" and other.get("name") == control.get("name"):
+                    other.checked = False
+            control.checked = True
+
+    def set_value(self, node, value):
+        if node.tag == "select":
+            options = self.select("option", node)
+            chosen = next((opt for opt in options if opt.option_value() == value), None)
+            if chosen is None:
+                return False
+            for opt in options:
+                opt.selected = opt is chosen
+            return True
+        node.value = value
+        return True
+
+    def apply(self, actions):
+        results = []
+        for item in actions:
+            try:
+                el = self.select_one(item["ref"])
+            except ValueError as e:
+                results.append({"ok": False, "error": str(e)})
+                continue
+            if el is None:
+                results.append({"ok": False, "error": "elemento no encontrado"})
+                continue
+            if item["action"] == "select":
+                if not self.set_value(el, item["value"]):
+                    results.append({"ok": False, "error": "valor no disponible"})
+                    continue
+                result = self._describe(el, None)
+                result["value"] = el.field_value()
+                chosen = next((opt for opt in self.select("option", el) if opt.selected), None)
+                result["text"] = chosen.text() if chosen else ""
+                results.append(result)
+                continue
+            if item["action"] == "text":
+                self.set_value(el, item["value"])
+                typed = self._describe(el, el)
+                typed["text"] = el.field_value()
+                results.append(typed)
+                continue
+            control = self.control(el) if el.tag == "label" else el
+            # 'check' solo marca la casilla si aún no lo está; 'click' siempre hace clic
+            if control is not None and (item["action"] != "check" or not control.checked):
+                self.click(control)
+            results.append(self._describe(el, control))
+        return results
+
+    # Envío del formulario
+
+    def form_submission(self, button):
+        """Método, URL de destino y campos que enviaría el navegador al pulsar button"""
+        form = button.closest("form")
+        if form is None:
+            return None
+        fields = []
+        for node in form.iter():
+            name = node.get("name")
+            if not name or "disabled" in node.attrs:
+                continue
+            if node.tag == "input":
+                kind = node.get("type", "text").lower()
+                if kind in ("radio", "checkbox"):
+                    if node.checked:
+                        fields.append((name, node.value if "value" in node.attrs else "on"))
+                elif kind in ("submit", "image", "button", "reset"):
+                    if node is button:
+                        fields.append((name, node.value))
+                elif kind != "file":
+                    fields.append((name, node.value))
+            elif node.tag == "select":
+                fields.append((name, node.field_value()))
+            elif node.tag == "textarea":
+                fields.append((name, node.field_value()))
+            elif node.tag == "button" and node is button:
+                fields.append((name, node.get("value", "")))
+        method = form.get("method", "get").lower()
+        action = urljoin(self.url, form.get("action") or self.url)
+        return method, action, fields
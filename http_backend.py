@@ -0,0 +1,240 @@
+"""Transporte HTTP para la encuesta: mismos manejadores, sin navegador.
+
+HttpSurvey hereda de McDVoiceSurvey toda la lógica de decisión (clasificar
+la página, elegir respuestas, ritmo) y reemplaza solo los métodos de
+transporte (mc2.TRANSPORT_METHODS): las páginas se descargan con una sesión
+HTTP que reutiliza conexiones y guarda cookies, se modelan con
+html_page.HtmlPage y las respuestas se envían como el POST del formulario.
+
+    python mc2.py --backend http --url http://127.0.0.1:8000 --pacing sin_pausas
+
+Limitaciones: no se ejecuta el JavaScript de la página, así que las
+preguntas condicionales aparecen cuando el sitio las devuelve tras el
+envío, y la sesión por expirar solo se extiende si su diálogo trae un
+enlace (o formaction) que pedir; si no, el aviso se cierra en la copia
+local y se informa que la sesión no se extendió.
+"""
+import http.client
+import socket
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from html_page import HtmlPage
+from fixture_store import RECORD_DIR
+from layout_cache import LAYOUT_CACHE_FILE
+from ledger import LEDGER_FILE
+from mc2 import (BROWSER_MODE, FLAGGED_SELECTOR, NAVIGATION_DELAY, PACING_PROFILE, PAGE_DEADLINE, PAGE_TIMEOUT,
+                 QUIET_CONSOLE, RUN_DEADLINE, SEED, STATE_PROBES, TEXT_ENTRY_MODE, TRACE_FILE, URL, McDVoiceSurvey)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0"
+MAX_REDIRECTS = 5
+
+
+class HttpSession:
+    """Conexiones persistentes por host y cookies por dominio, sobre http.client"""
+
+    def __init__(self, timeout=PAGE_TIMEOUT, user_agent=USER_AGENT):
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cookies = {}  # {host: {nombre: valor}}
+        self.aborted = False
+        self._connections = {}
+
+    def _connection(self, scheme, netloc):
+        key = (scheme, netloc)
+        if key not in self._connections:
+            factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            self._connections[key] = factory(netloc, timeout=self.timeout)
+        return self._connections[key]
+
+    def _cookie_header(self, host):
+        jar = {}
+        for domain, cookies in self.cookies.items():
+            if host == domain or host.endswith("." + domain):
+                jar.update(cookies)
+        return "; ".join(f"{name}={value}" for name, value in jar.items())
+
+    def _store_cookies(self, host, response):
+        for header in response.headers.get_all("Set-Cookie") or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                domain = (morsel["domain"] or host).lstrip(".")
+                self.cookies.setdefault(domain, {})[name] = morsel.value
+
+    def send(self, method, url, fields=None):
+        """Una petición sin seguir redirecciones: devuelve (estado, cabeceras, cuerpo en bytes)"""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        body = None
+        headers = {"User-Agent": self.user_agent, "Accept": "text/html,application/xhtml+xml",
+                   "Accept-Language": "es-US"}
+        if fields is not None and method == "GET":
+            path += "?" + urlencode(fields)
+        elif parts.query:
+            path += "?" + parts.query
+        if fields is not None and method != "GET":
+            body = urlencode(fields).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        cookie = self._cookie_header(parts.hostname or "")
+        if cookie:
+            headers["Cookie"] = cookie
+
+        for attempt in range(2):
+            if self.aborted:
+                raise ConnectionAbortedError("Sesión HTTP abortada")
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # El servidor cerró la conexión persistente: se reintenta una vez con otra
+                connection.close()
+                self._connections.pop((parts.scheme, parts.netloc), None)
+                if attempt:
+                    raise
+        self._store_cookies(parts.hostname or "", response)
+        return response.status, response.headers, data
+
+    def request(self, method, url, fields=None):
+        """Petición siguiendo redirecciones: devuelve (estado, URL final, HTML)"""
+        method = method.upper()
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, data = self.send(method, url, fields)
+            if status in (301, 302, 303, 307, 308) and headers.get("Location"):
+                url = urljoin(url, headers["Location"])
+                if status not in (307, 308):
+                    method, fields = "GET", None
+                continue
+            charset = headers.get_content_charset() or "utf-8"
+            return status, url, data.decode(charset, errors="replace")
+        raise http.client.HTTPException(f"Demasiadas redirecciones desde {url}")
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def abort(self):
+        """Corta las conexiones desde otro hilo: una lectura bloqueada falla enseguida y no se abren otras"""
+        self.aborted = True
+        for connection in list(self._connections.values()):
+            if connection.sock is not None:
+                try:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class HttpSurvey(McDVoiceSurvey, transport=True):
+    """McDVoiceSurvey con transporte HTTP: formularios enviados sin navegador"""
+
+    def __init__(self, url=URL, pacing=PACING_PROFILE, quiet=QUIET_CONSOLE, text_mode=TEXT_ENTRY_MODE,
+                 trace=TRACE_FILE, session=None, seed=SEED, page_deadline=PAGE_DEADLINE, run_deadline=RUN_DEADLINE,
+                 ledger=LEDGER_FILE, record=RECORD_DIR, layout_cache=LAYOUT_CACHE_FILE):
+        self.session = session or HttpSession()
+        self.page = None
+        self.html = ""
+        self.last_request = None
+        super().__init__(url=url, pacing=pacing, quiet=quiet, text_mode=text_mode, trace=trace, seed=seed,
+                         page_deadline=page_deadline, run_deadline=run_deadline, ledger=ledger, record=record,
+                         layout_cache=layout_cache)
+
+    def _init_browser(self, mode=BROWSER_MODE, blocked_hosts=(), blocked_resources=()):
+        return None  # Sin navegador
+
+    def close_transport(self):
+        self.session.close()
+
+    def abort_transport(self):
+        self.session.abort()
+
+    def load(self, method, url, fields=None):
+        """Descarga una página y la convierte en la página actual"""
+        self.last_request = (method, url, fields)
+        status, final_url, html = self.session.request(method, url, fields)
+        if status >= 400:
+            print(f"El sitio respondió {status} para {final_url}")
+        self.page = HtmlPage(html, final_url)
+        self.html = html
+        self.new_page()
+        if NAVIGATION_DELAY > 0:
+            self.timed_delay(NAVIGATION_DELAY)
+        self.pacer.start_page()
+        return status < 400
+
+    def open_survey(self):
+        return self.load("GET", self.url)
+
+    def fetch_snapshot(self):
+        return self.page.snapshot(FLAGGED_SELECTOR)
+
+    def fetch_layout(self):
+        return self.page.layout()
+
+    def execute_plan(self, actions):
+        return self.page.apply(actions)
+
+    def type_text(self, ref, text, chunked=False):
+        field = self.page.select_one(ref)
+        if field is None or not self.page.visible(field) or "disabled" in field.attrs:
+            return False
+        self.page.set_value(field, text)
+        return True
+
+    def click_next(self, message=None):
+        buttons = (self.page.select("input[type='submit'][value*='Next']")
+                   + self.page.select("#NextButton"))
+        button = next((b for b in buttons if self.page.visible(b) and "disabled" not in b.attrs), None)
+        submission = self.page.form_submission(button) if button is not None else None
+        if submission is None:
+            return False
+        if message:
+            print(message)
+        method, action, fields = submission
+        self.load(method, action, fields)
+        return True
+
+    def reload_page(self):
+        # Como Recargar en el navegador: se repite la petición que produjo la página (incluido el POST)
+        return self.load(*self.last_request)
+
+    def detect_state(self, probes=STATE_PROBES):
+        return self.page.state(probes) if self.page else "unknown"
+
+    def wait_for_state(self, probes=STATE_PROBES):
+        # Sin JavaScript la página no cambia sola: o ya se reconoce o no se reconocerá
+        return self.detect_state(probes) != "unknown"
+
+    def handle_session_timeout(self):
+        dialog = next((node for node in self.page.select("div[class*='sessionTimeoutDialog']")
+                       if self.page.visible(node)), None)
+        if dialog is None:
+            return False
+        # Sin JavaScript solo se puede pedir la extensión si el diálogo la expone como enlace o formaction
+        target = next((node.get("href") or node.get("formaction")
+                       for node in self.page.select("a[href], button[formaction], input[formaction]", dialog)
+                       if not (node.get("href") or node.get("formaction")).startswith(("#", "javascript:"))), None)
+        self.page.dismissed.add(dialog)
+        self._snapshot = None
+        if target is None:
+            print("Sin navegador no se puede extender la sesión: se cierra el aviso solo en la copia local")
+            return False
+        status, _, _ = self.session.request("GET", urljoin(self.page.url, target))
+        if status >= 400:
+            print(f"El sitio respondió {status} al extender la sesión")
+            return False
+        print("Sesión extendida")
+        return True
+
+    def page_source(self):
+        return self.html
+
+    def read_results(self):
+        code = self.page.select_one("p[class*='ValCode']")
+        header = self.page.select_one("p[class='FinishHeader']")
+        if header is None:
+            header = next((p for p in self.page.select("h2 p") if "Thank you" in p.text()), None)
+        return (code.text() if code else None, header.text() if header else None)
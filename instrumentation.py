@@ -0,0 +1,254 @@
+"""Instrumentación de McDVoiceSurvey: tiempos, comandos WebDriver y errores.
+
+Se activa envolviendo el ejecutor de comandos del driver (o, con el
+transporte HTTP, las peticiones de la sesión) y los métodos que
+interesa medir de una instancia concreta; si no se activa, el bot no paga
+ningún costo adicional. Cada comando se atribuye al método medido más
+interno en curso y a la página actual. Al cerrar cada página se escribe un
+registro JSONL y, al final, un registro de resumen.
+"""
+import functools
+import json
+import time
+import traceback
+from collections import Counter
+
+# Categoría de cada comando WebDriver (nombres de selenium.webdriver.remote.command)
+COMMAND_CATEGORIES = {
+    "findElement": "find",
+    "findElements": "find",
+    "findChildElement": "find",
+    "findChildElements": "find",
+    "getElementAttribute": "attribute",
+    "getElementProperty": "attribute",
+    "getElementText": "attribute",
+    "getElementTagName": "attribute",
+    "isElementEnabled": "attribute",
+    "isElementSelected": "attribute",
+    "isElementDisplayed": "attribute",
+    "getElementDomAttribute": "attribute",
+    "getElementRect": "attribute",
+    "getElementValueOfCssProperty": "attribute",
+    "clickElement": "click",
+    "sendKeysToElement": "input",
+    "clearElement": "input",
+    "w3cExecuteScript": "script",
+    "w3cExecuteScriptAsync": "script",
+    "get": "navigation",
+    "getCurrentUrl": "navigation",
+    "refresh": "navigation",
+    # Peticiones del transporte HTTP (http_backend)
+    "httpGet": "navigation",
+    "httpPost": "navigation",
+}
+
+
+def _metrics():
+    return {"wall_s": 0.0, "sleep_s": 0.0, "calls": 0, "commands": 0, "bytes": 0,
+            "by_category": Counter(), "by_command": Counter()}
+
+
+def _plain(metrics):
+    result = dict(metrics)
+    for key in ("wall_s", "sleep_s"):
+        result[key] = round(metrics[key], 4)
+    result["active_s"] = round(metrics["wall_s"] - metrics["sleep_s"], 4)
+    result["by_category"] = dict(metrics["by_category"])
+    result["by_command"] = dict(metrics["by_command"])
+    return result
+
+
+def count_questions(page):
+    """Número de preguntas de una página clasificada (cada fila de tabla cuenta como una)"""
+    total = 0
+    for kind, widgets in page.items():
+        if kind == "unknown":
+            continue
+        for widget in widgets:
+            total += len(widget.get("rows") or []) or 1
+    return total
+
+
+class Instrumentation:
+    def __init__(self, path=None):
+        # path: archivo JSONL donde se escriben los registros (None = solo en memoria)
+        self.path = path
+        self.total = _metrics()
+        self.sections = {}
+        self.page_types = {}
+        self.pages = []
+        self.errors = []
+        self.timeout = None  # Diagnóstico del vigilante si la ejecución se abortó por plazo
+        self._stack = []
+        self._page = None
+        self._survey = None
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def attach(self, survey, methods, classify):
+        """Instrumenta una instancia: su driver, los métodos indicados y los cambios de página"""
+        self._survey = survey
+        self._classify = classify
+        self._started = time.perf_counter()
+        if survey.driver is not None:
+            self._wrap_executor(survey.driver.command_executor)
+        elif getattr(survey, "session", None) is not None:
+            self._wrap_session(survey.session)
+        for name in methods:
+            self._wrap(name)
+        self._wrap_page_hooks()
+        return self
+
+    def _wrap_executor(self, executor):
+        execute = executor.execute
+
+        def counted(command, params):
+            response = execute(command, params)
+            size = len(json.dumps(params, default=str)) + len(json.dumps(response, default=str))
+            self._count(command, size)
+            return response
+
+        executor.execute = counted
+
+    def _wrap_session(self, session):
+        send = session.send
+
+        def counted(method, url, fields=None):
+            status, headers, data = send(method, url, fields)
+            self._count("http" + method.capitalize(), len(url) + len(json.dumps(fields or [])) + len(data))
+            return status, headers, data
+
+        session.send = counted
+
+    def _count(self, command, size):
+        category = COMMAND_CATEGORIES.get(command, "other")
+        targets = [self.total]
+        if self._page is not None:
+            targets.append(self._page)
+        if self._stack:
+            targets.append(self.sections.setdefault(self._stack[-1], _metrics()))
+        for target in targets:
+            target["commands"] += 1
+            target["bytes"] += size
+            target["by_category"][category] += 1
+            target["by_command"][command] += 1
+
+    def _slept(self):
+        return self._survey.pacer.slept
+
+    def _wrap(self, name):
+        method = getattr(self._survey, name)
+
+        @functools.wraps(method)
+        def measured(*args, **kwargs):
+            section = self.sections.setdefault(name, _metrics())
+            self._stack.append(name)
+            start, slept = time.perf_counter(), self._slept()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                section["wall_s"] += time.perf_counter() - start
+                section["sleep_s"] += self._slept() - slept
+                section["calls"] += 1
+                self._stack.pop()
+
+        setattr(self._survey, name, measured)
+
+    def _wrap_page_hooks(self):
+        survey = self._survey
+        new_page = survey.new_page
+        get_snapshot = survey.get_snapshot
+        enter_ticket_number = survey.enter_ticket_number
+        get_survey_results = survey.get_survey_results
+
+        def page_started():
+            self.close_page()
+            self._page = dict(_metrics(), type=None, questions=0, errors=[],
+                              start=time.perf_counter(), slept=self._slept())
+            return new_page()
+
+        def snapshot(*args, **kwargs):
+            result = get_snapshot(*args, **kwargs)
+            if self._page is not None and self._page["type"] is None:
+                page = self._classify(result)
+                kinds = sorted(kind for kind, widgets in page.items() if widgets)
+                self._page["type"] = "+".join(kinds) or "sin_preguntas"
+                self._page["questions"] = count_questions(page)
+            return result
+
+        def ticket(*args, **kwargs):
+            if self._page is not None:
+                self._page["type"] = "ticket"
+            return enter_ticket_number(*args, **kwargs)
+
+        def results(*args, **kwargs):
+            if self._page is not None:
+                self._page["type"] = "final"
+            return get_survey_results(*args, **kwargs)
+
+        survey.new_page = page_started
+        survey.get_snapshot = snapshot
+        survey.enter_ticket_number = ticket
+        survey.get_survey_results = results
+
+    def error(self, context, exc):
+        """Registra una excepción capturada por el bot con su causa estructurada"""
+        frames = traceback.extract_tb(exc.__traceback__)
+        cause = {
+            "context": context,
+            "handler": self._stack[-1] if self._stack else None,
+            "type": type(exc).__name__,
+            "message": str(exc).splitlines()[0] if str(exc) else "",
+            "where": f"{frames[-1].filename}:{frames[-1].lineno}" if frames else None,
+            "page": len(self.pages) + (1 if self._page is not None else 0),
+        }
+        self.errors.append(cause)
+        if self._page is not None:
+            self._page["errors"].append(cause)
+
+    def close_page(self):
+        """Cierra la página en curso y escribe su registro"""
+        page, self._page = self._page, None
+        if page is None:
+            return
+        page["wall_s"] = time.perf_counter() - page.pop("start")
+        page["sleep_s"] = self._slept() - page.pop("slept")
+        page["type"] = page["type"] or "otra"
+        record = dict(_plain(page), record="page", page=len(self.pages) + 1)
+        self.pages.append(record)
+
+        bucket = self.page_types.setdefault(page["type"], _metrics())
+        for key in ("wall_s", "sleep_s", "commands", "bytes"):
+            bucket[key] += page[key]
+        bucket["calls"] += 1
+        bucket["by_category"].update(page["by_category"])
+        bucket["by_command"].update(page["by_command"])
+        self._write(record)
+
+    def summary(self):
+        if self._survey is not None:
+            self.total["wall_s"] = time.perf_counter() - self._started
+            self.total["sleep_s"] = self._slept()
+        return {
+            "record": "summary",
+            "pages": len(self.pages),
+            "total": _plain(self.total),
+            "per_handler": {name: _plain(s) for name, s in self.sections.items()},
+            "per_page_type": {name: _plain(p) for name, p in self.page_types.items()},
+            "errors": self.errors,
+            "timeout": self.timeout,
+        }
+
+    def close(self):
+        """Cierra la última página y escribe el resumen de la ejecución"""
+        self.close_page()
+        summary = self.summary()
+        self._write(summary)
+        if self._file:
+            self._file.close()
+            self._file = None
+        return summary
+
+    def _write(self, record):
+        if self._file:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
@@ -0,0 +1,170 @@
+"""Caché de estructuras de página entre ejecuciones, indexada por huella.
+
+La mayoría de las páginas de la encuesta se repiten igual en cada
+ejecución. En lugar de describir cada una con SNAPSHOT_SCRIPT (recorrer
+todas las tablas, filas, opciones y etiquetas), el bot pide primero su
+estructura con LAYOUT_SCRIPT, una llamada mucho más barata, y calcula su
+huella (fixture_store.structure_fingerprint). Si la huella ya está en la
+caché se reutiliza el snapshot guardado: qué manejador responde cada
+widget, con qué ids de elemento y de etiqueta. Las respuestas se siguen
+eligiendo en cada ejecución; solo se evita el descubrimiento.
+
+Solo se guardan páginas cuyas acciones tienen referencias estables entre
+cargas (#id o label[for]); las que dependen de data-mcdv no sirven en otra
+carga. Si al aplicar las respuestas un elemento no aparece o su etiqueta no
+coincide con la guardada, la entrada se descarta y la página se responde
+con un snapshot nuevo.
+
+    python layout_cache.py stats
+    python layout_cache.py clear
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+LAYOUT_CACHE_FILE = os.environ.get("MCDVOICE_LAYOUT_CACHE", "estructuras.json")  # "" = sin caché
+STABLE_REF_PREFIXES = ("#", "label[for=")
+COUNTERS = ["hits", "misses", "evictions", "uncacheable"]
+
+
+def action_refs(snapshot):
+    """Referencias que las acciones del plan pueden usar: opciones, etiquetas, selects, textareas y campos "Otro" """
+    refs = []
+    for table in snapshot["tables"]:
+        options = list(table["options"]) + [option for row in table["rows"] for option in row["options"]]
+        refs += [ref for option in options for ref in (option["ref"], option["label_ref"])]
+    for fieldset in snapshot["fieldsets"]:
+        options = list(fieldset["options"]) + list(fieldset["choices"])
+        refs += [ref for option in options for ref in (option["ref"], option["label_ref"])]
+        refs.append(fieldset["other_input"])
+    refs += [select["ref"] for select in snapshot["selects"]]
+    refs += [textarea["ref"] for textarea in snapshot["textareas"]]
+    return [ref for ref in refs if ref]
+
+
+def cacheable(snapshot):
+    """Una página se puede reutilizar en otra carga si todas sus acciones tienen referencias estables"""
+    return all(ref.startswith(STABLE_REF_PREFIXES) for ref in action_refs(snapshot))
+
+
+def widget_identity(widget):
+    """Identidad de un widget que no cambia entre cargas ni cuando el sitio inserta otra pregunta: los ids de
+    sus filas si es una tabla, si no el id de su contenedor o los ids (o nombres) de sus controles. El ref
+    data-mcdv solo vale dentro de una carga y se renumera, así que es el último recurso"""
+    if widget.get("rows"):
+        return "filas:" + ",".join(row["id"] for row in widget["rows"])
+    if widget.get("id"):
+        return "id:" + widget["id"]
+    controls = [option.get("id") or option.get("name", "")
+                for option in list(widget.get("options", [])) + list(widget.get("choices", []))]
+    if any(controls):
+        return "controles:" + ",".join(controls)
+    return widget["ref"]
+
+
+class LayoutCache:
+    """Archivo JSON huella -> snapshot, con contadores de aciertos y fallos de la ejecución y acumulados"""
+
+    def __init__(self, path=LAYOUT_CACHE_FILE):
+        self.path = path
+        data = self._load()
+        self.entries = data.get("entries", {})
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.totals.update(data.get("totals", {}))
+        self.stats = dict.fromkeys(COUNTERS, 0)
+        self._dirty = False
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            print(f"Caché de estructuras dañada, se empieza de cero: {self.path}")
+            return {}
+
+    def _count(self, counter):
+        self.stats[counter] += 1
+        self.totals[counter] += 1
+        self._dirty = True
+
+    def get(self, fingerprint):
+        """Snapshot guardado de una estructura, o None (y cuenta el acierto o el fallo)"""
+        entry = self.entries.get(fingerprint)
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        entry["hits"] += 1
+        entry["last_hit"] = datetime.now().astimezone().isoformat(timespec="seconds")
+        return entry["snapshot"]
+
+    def put(self, fingerprint, snapshot, page_type=None):
+        """Guarda el snapshot de una estructura si se puede reutilizar en otra carga; devuelve si se guardó"""
+        if not cacheable(snapshot):
+            self._count("uncacheable")
+            return False
+        self.entries[fingerprint] = {"type": page_type, "snapshot": snapshot, "hits": 0, "last_hit": None,
+                                     "stored": datetime.now().astimezone().isoformat(timespec="seconds")}
+        self._dirty = True
+        return True
+
+    def evict(self, fingerprint):
+        """Descarta una entrada que ya no coincide con la página real"""
+        if self.entries.pop(fingerprint, None) is not None:
+            self._count("evictions")
+
+    def save(self):
+        if not self._dirty:
+            return
+        # Se escribe aparte y se reemplaza: un corte a mitad de escritura no deja la caché dañada
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries, "totals": self.totals}, f, ensure_ascii=False)
+        os.replace(temporary, self.path)
+        self._dirty = False
+
+    def clear(self):
+        self.entries = {}
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self._dirty = True
+        self.save()
+
+
+def command_stats(args):
+    cache = LayoutCache(args.cache)
+    totals = cache.totals
+    lookups = totals["hits"] + totals["misses"]
+    print(f"Entradas: {len(cache.entries)}")
+    print(f"Consultas: {lookups}; aciertos {totals['hits']}"
+          + (f" ({totals['hits'] / lookups:.0%})" if lookups else "")
+          + f", fallos {totals['misses']}, descartadas {totals['evictions']}, no reutilizables {totals['uncacheable']}")
+    if cache.entries:
+        print(f"\n{'huella':<18}{'aciertos':>10}  {'guardada':<27}{'tipo'}")
+        for fingerprint, entry in sorted(cache.entries.items(), key=lambda item: item[1]["stored"]):
+            print(f"{fingerprint:<18}{entry['hits']:>10}  {entry['stored']:<27}{entry['type'] or '-'}")
+    return 0
+
+
+def command_clear(args):
+    LayoutCache(args.cache).clear()
+    print(f"Caché de estructuras vaciada: {args.cache}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caché de estructuras de página del bot de McDVoice")
+    parser.add_argument("--cache", default=LAYOUT_CACHE_FILE or "estructuras.json", help="Archivo de la caché")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Entradas, aciertos y fallos acumulados").set_defaults(func=command_stats)
+    commands.add_parser("clear", help="Vacía la caché y sus contadores").set_defaults(func=command_clear)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
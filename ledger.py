@@ -0,0 +1,152 @@
+"""Registro de ejecuciones: una línea JSONL por encuesta y un informe de latencias.
+
+Cada ejecución de mc2.py (y del demonio) agrega al registro su inicio y
+fin, el resultado (completed, error o timeout), el código de validación y
+la duración y el tipo de cada página. El informe resume los percentiles
+p50/p95/máx por tipo de página, las tasas de fallo y la evolución por día o
+por semana, para saber si un cambio en las esperas o en los manejadores
+acorta de verdad las ejecuciones reales:
+
+    python ledger.py report
+    python ledger.py report --since 2026-10-01 --by week
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from datetime import date
+
+LEDGER_FILE = os.environ.get("MCDVOICE_LEDGER", "ejecuciones.jsonl")  # "" = no registrar
+OUTCOMES = ["completed", "error", "timeout"]
+
+
+class RunLedger:
+    """Archivo JSONL con un registro por ejecución; solo se agrega al final"""
+
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+
+    def append(self, record):
+        # Una sola escritura por línea: varias ejecuciones pueden compartir el archivo
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def read(self, since=None):
+        """Registros de ejecución (desde una fecha ISO si se indica); ignora líneas dañadas"""
+        if not os.path.exists(self.path):
+            return []
+        runs = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("record") == "run" and (since is None or record["start"] >= since):
+                    runs.append(record)
+        return runs
+
+
+def percentile(values, p):
+    """Percentil por rango más cercano (p entre 0 y 100); None sin valores"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def latency(values):
+    return {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95),
+            "max": max(values) if values else None}
+
+
+def period(start, by):
+    """Día (AAAA-MM-DD) o semana ISO (AAAA-Wnn) de una marca de tiempo ISO"""
+    day = date.fromisoformat(start[:10])
+    if by == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.isoformat()
+
+
+def summarize(runs, by="day"):
+    """Resultados, duración de las ejecuciones, latencia por tipo de página y evolución por período"""
+    outcomes = {outcome: sum(1 for run in runs if run["outcome"] == outcome) for outcome in OUTCOMES}
+    page_types = {}
+    for run in runs:
+        for page in run["pages"]:
+            page_types.setdefault(page["type"], []).append(page["duration_s"])
+    periods = {}
+    for run in runs:
+        periods.setdefault(period(run["start"], by), []).append(run)
+    return {
+        "runs": len(runs),
+        "outcomes": outcomes,
+        "run_s": latency([run["duration_s"] for run in runs if run["outcome"] == "completed"]),
+        "page_types": {name: latency(values) for name, values in sorted(page_types.items())},
+        "trend": {
+            name: {
+                "runs": len(group),
+                "failure_rate": sum(1 for run in group if run["outcome"] != "completed") / len(group),
+                "run_s": latency([run["duration_s"] for run in group if run["outcome"] == "completed"]),
+            }
+            for name, group in sorted(periods.items())
+        },
+    }
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_report(summary):
+    runs = summary["runs"]
+    print(f"Ejecuciones: {runs}")
+    for outcome, count in summary["outcomes"].items():
+        print(f"  {outcome:<10}{count:>6}  ({count / runs:.0%})")
+    run_s = summary["run_s"]
+    print(f"Duración de las completas (s): p50 {_fmt(run_s['p50'])}, p95 {_fmt(run_s['p95'])}, "
+          f"máx. {_fmt(run_s['max'])}")
+
+    print(f"\n{'tipo de página':<48}{'páginas':>9}{'p50 (s)':>10}{'p95 (s)':>10}{'máx. (s)':>10}")
+    for name, stats in summary["page_types"].items():
+        print(f"{name:<48}{stats['count']:>9}{_fmt(stats['p50']):>10}{_fmt(stats['p95']):>10}"
+              f"{_fmt(stats['max']):>10}")
+
+    print(f"\n{'período':<14}{'ejecuciones':>13}{'fallos':>9}{'p50 (s)':>10}{'p95 (s)':>10}")
+    for name, stats in summary["trend"].items():
+        print(f"{name:<14}{stats['runs']:>13}{stats['failure_rate']:>9.0%}{_fmt(stats['run_s']['p50']):>10}"
+              f"{_fmt(stats['run_s']['p95']):>10}")
+
+
+def command_report(args):
+    runs = RunLedger(args.ledger).read(args.since)
+    if not runs:
+        print(f"No hay ejecuciones registradas en {args.ledger}")
+        return 1
+    summary = summarize(runs, args.by)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_report(summary)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro de ejecuciones del bot de McDVoice")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="Percentiles por tipo de página, fallos y evolución")
+    report.add_argument("--ledger", default=LEDGER_FILE, help="Archivo del registro")
+    report.add_argument("--since", help="Solo ejecuciones desde esta fecha (AAAA-MM-DD)")
+    report.add_argument("--by", default="day", choices=["day", "week"], help="Agrupación de la evolución")
+    report.add_argument("--json", action="store_true", help="Resumen en JSON en lugar de tablas")
+    report.set_defaults(func=command_report)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Servidor local que imita el flujo de McDVoice para ejecuciones sin red.
+
+Sirve las páginas grabadas en fixtures/ en orden de nombre de archivo: la
+página del ticket, las páginas de preguntas y la página final. Valida como
+el sitio real que las preguntas obligatorias (radios y selects) tengan
+respuesta y, si falta alguna, vuelve a mostrar la misma página marcándola y
+con las respuestas ya enviadas.
+
+Uso:
+    python local_server.py --port 8000
+    MCDVOICE_URL=http://127.0.0.1:8000 python mc2.py
+"""
+import argparse
+import html
+import os
+import re
+import threading
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+VALIDATION_CODE = "LOCAL-0000"
+
+LAYOUT = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>McDVoice (local)</title>
+</head>
+<body>
+<div id="surveyQuestions">
+<form id="surveyForm" method="post" action="/">
+<input type="hidden" name="page" value="$page">
+$errors
+$content
+<div id="NextButtonContainer"><input type="submit" id="NextButton" name="NextButton" value="$button"></div>
+</form>
+</div>
+</body>
+</html>
+"""
+
+FINISH_LAYOUT = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>McDVoice (local)</title>
+</head>
+<body>
+$content
+</body>
+</html>
+"""
+
+ERROR_BANNER = '<div id="ValidationError" class="error" role="alert">Please answer the questions marked below.</div>'
+
+
+class _RequiredFields(HTMLParser):
+    """Recoge los nombres de los campos obligatorios de una página"""
+
+    def __init__(self):
+        super().__init__()
+        self.names = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get("name")
+        required = (tag == "input" and attrs.get("type") == "radio") or tag == "select"
+        if tag == "input" and re.fullmatch(r"CN\d", name or ""):
+            required = True
+        if required and name and name not in self.names:
+            self.names.append(name)
+
+
+def load_pages(fixtures_dir=FIXTURES_DIR):
+    """Carga las páginas grabadas en orden: ticket, preguntas y página final"""
+    pages = []
+    for filename in sorted(os.listdir(fixtures_dir)):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(fixtures_dir, filename), encoding="utf-8") as f:
+            content = f.read()
+        parser = _RequiredFields()
+        parser.feed(content)
+        pages.append({"name": filename[:-5], "content": content, "required": parser.names})
+    return pages
+
+
+def flag_missing(content, missing):
+    """Marca como inválidos los contenedores (FNSR...) de las preguntas sin respuesta"""
+    for name in missing:
+        container = re.sub(r"^[A-Z]+", "FNSR", name)
+        content = content.replace(f'id="{container}"', f'id="{container}" aria-invalid="true"')
+    return content
+
+
+def _attrs(tag):
+    return dict(re.findall(r'([\w-]+)="([^"]*)"', tag))
+
+
+def fill_form(content, form):
+    """Vuelve a mostrar las respuestas enviadas, como hace el sitio al rechazar una página"""
+    def fill_input(match):
+        tag = match.group(0)
+        attrs = _attrs(tag)
+        values = form.get(html.unescape(attrs.get("name", "")), [])
+        if attrs.get("type") in ("radio", "checkbox"):
+            if html.unescape(attrs.get("value", "on")) in values and "checked" not in attrs:
+                return tag[:-1] + " checked>"
+        elif attrs.get("type", "text") == "text" and values and "value" not in attrs:
+            return tag[:-1] + f' value="{html.escape(values[0])}">'
+        return tag
+
+    def fill_select(match):
+        values = form.get(html.unescape(_attrs(match.group(1)).get("name", "")), [])
+        options = re.sub(r'<option value="([^"]*)"',
+                         lambda m: m.group(0) + (" selected" if html.unescape(m.group(1)) in values else ""),
+                         match.group(2))
+        return f"<select{match.group(1)}>{options}</select>"
+
+    def fill_textarea(match):
+        values = form.get(html.unescape(_attrs(match.group(1)).get("name", "")), [])
+        return f"<textarea{match.group(1)}>{html.escape(values[0]) if values else match.group(2)}</textarea>"
+
+    content = re.sub(r"<input\b[^>]*>", fill_input, content)
+    content = re.sub(r"<select\b([^>]*)>(.*?)</select>", fill_select, content, flags=re.S)
+    return re.sub(r"<textarea\b([^>]*)>(.*?)</textarea>", fill_textarea, content, flags=re.S)
+
+
+def render_page(pages, index, missing=(), form=None, validation_code=VALIDATION_CODE):
+    """HTML completo de una página tal como lo sirve el servidor (marcada y rellenada si fue rechazada)"""
+    page = pages[index]
+    if index == len(pages) - 1:
+        content = Template(page["content"]).safe_substitute(validation_code=html.escape(validation_code))
+        return Template(FINISH_LAYOUT).substitute(content=content)
+    return Template(LAYOUT).substitute(
+        page=index,
+        errors=ERROR_BANNER if missing else "",
+        content=flag_missing(fill_form(page["content"], form or {}), missing),
+        button="Start" if index == 0 else "Next",
+    )
+
+
+class SurveyRequestHandler(BaseHTTPRequestHandler):
+    server_version = "McDVoiceLocal/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/index.html"):
+            self.send_error(404)
+            return
+        self.render(0)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        try:
+            index = int(form.get("page", ["0"])[0])
+        except ValueError:
+            index = 0
+        pages = self.server.pages
+        index = min(max(index, 0), len(pages) - 1)
+
+        missing = [name for name in pages[index]["required"] if not "".join(form.get(name, [])).strip()]
+        self.server.record(pages[index]["name"], form, missing)
+        if missing:
+            self.render(index, missing, form)
+        else:
+            self.render(min(index + 1, len(pages) - 1))
+
+    def render(self, index, missing=(), form=None):
+        body = render_page(self.server.pages, index, missing, form, self.server.validation_code)
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class SurveyServer(ThreadingHTTPServer):
+    """Servidor de la encuesta local; se puede usar desde pruebas o desde la línea de comandos"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, fixtures_dir=FIXTURES_DIR,
+                 validation_code=VALIDATION_CODE, quiet=True):
+        super().__init__((host, port), SurveyRequestHandler)
+        self.pages = load_pages(fixtures_dir)
+        self.validation_code = validation_code
+        self.quiet = quiet
+        self.submissions = []  # (página, datos enviados, campos faltantes) de cada envío
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, page, form, missing):
+        with self._lock:
+            self.submissions.append((page, form, missing))
+
+    def start(self):
+        """Atiende peticiones en un hilo de fondo y devuelve la URL base"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de la encuesta McDVoice")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directorio con las páginas grabadas")
+    args = parser.parse_args()
+
+    server = SurveyServer(args.host, args.port, args.fixtures, quiet=False)
+    print(f"Encuesta local en {server.url} ({len(server.pages)} páginas)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
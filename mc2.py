@@ -1,65 +1,374 @@
+import argparse
+import copy
+import os
 import random
+import sys
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (NoSuchElementException, 
-                                      TimeoutException,
-                                      StaleElementReferenceException)
+from selenium.common.exceptions import (JavascriptException, NoAlertPresentException, NoSuchElementException,
+                                        StaleElementReferenceException, TimeoutException,
+                                        UnexpectedAlertPresentException, WebDriverException)
+from browser import (BROWSER_MODES, PAGE_LOAD_STRATEGIES, RESOURCE_PREFERENCES, TRACKING_HOSTS, firefox_options,
+                     set_command_timeout)
+from corpus import CommentCorpus
+from deadlines import Watchdog, kill_process_tree
+from fixture_store import RECORD_DIR, FixtureStore, structure_fingerprint
+from instrumentation import Instrumentation
+from layout_cache import LAYOUT_CACHE_FILE, LayoutCache, widget_identity
+from ledger import LEDGER_FILE, RunLedger
+from pacing import Pacer
+from policy import AnswerPolicy
+from page_scripts import (SNAPSHOT_SCRIPT, LAYOUT_SCRIPT, APPLY_PLAN_SCRIPT, WAIT_SCRIPT, FIND_SCRIPT,
+                          STATE_SCRIPT)
 
 # Configuración
-URL = "https://www.mcdvoice.com"
+URL = os.environ.get("MCDVOICE_URL", "https://www.mcdvoice.com")  # Ver local_server.py para pruebas sin red
 QUESTION_DURATION = 10  # 30 segundos por pregunta
-MAX_ATTEMPTS = 3  # Intentos máximos para encontrar elementos
+PACING_PROFILE = "actual"  # Perfil de ritmo (ver pacing.PACING_PROFILES)
+BROWSER_MODE = os.environ.get("MCDVOICE_BROWSER", "ventana")  # Arranque de Firefox (ver browser.BROWSER_MODES)
+PAGE_LOAD_STRATEGY = "normal"  # "eager": no esperar imágenes ni subrecursos (wait_for_page espera lo necesario)
+BLOCKED_HOSTS = []  # Hosts cuyos pedidos se descartan (p. ej. browser.TRACKING_HOSTS)
+BLOCKED_RESOURCES = []  # Tipos de recurso que no se cargan: "image", "font", "media"
+QUIET_CONSOLE = False  # True para no mostrar la cuenta atrás en la consola
+MAX_ATTEMPTS = 3  # Pasadas máximas para responder preguntas condicionales de una página
+REQUIRED_TIMEOUT_MS = 3000  # Espera máxima (ms) para elementos obligatorios
 TICKET_NUMBER = ["26108", "01130", "60525", "16266", "00380", "8"]  # Número de ticket completo
+TEXT_ENTRY_MODE = "js"  # Escritura de comentarios: "js", "bulk" o "chunked"
+TEXT_CHUNK_SIZE = 20  # Caracteres por envío en el modo "chunked"
+TEXT_FIELD_BUDGET = 0  # Segundos totales dedicados a escribir cada campo (0 = ninguno)
+COMMENT_FILES = {"general": "respuestas.txt"}  # Categorías de comentarios y su archivo
+COMMENT_CATEGORY = "general"  # Categoría usada en las preguntas abiertas
+POLICY_FILE = "politicas.json"  # Distribuciones de respuesta por tipo de pregunta y palabra clave
+SEED = os.environ.get("MCDVOICE_SEED")  # Semilla de las respuestas (None = una nueva en cada ejecución)
+TRACE_FILE = os.environ.get("MCDVOICE_TRACE")  # Archivo JSONL de instrumentación (None = desactivada)
+PAGE_TIMEOUT = 15  # Segundos máximos de espera por cada transición de página
+PAGE_LOAD_TIMEOUT = 30  # Segundos máximos de carga de una navegación (driver.get, refresh)
+SCRIPT_TIMEOUT = 15  # Segundos máximos por script ejecutado en la página
+COMMAND_TIMEOUT = 60  # Segundos máximos por comando a geckodriver (mayor que los dos anteriores)
+PAGE_DEADLINE = 900  # Plazo por página, pausas incluidas; al agotarse se aborta el navegador (0 = sin plazo)
+RUN_DEADLINE = 3600  # Plazo de la ejecución completa (0 = sin plazo)
+NAVIGATION_DELAY = 0  # Pausa deliberada adicional tras cada navegación (0 = ninguna)
+# Elementos que indican que una página nueva ya está lista (ticket, preguntas o final)
+PAGE_READY_SELECTOR = "#CN1, #NextButton, input[type='submit'], #finishIncentiveHolder"
+MAX_PAGES = 60  # Transiciones máximas antes de abandonar (evita ciclos infinitos)
+PAGE_RETRIES = 2  # Reenvíos de una página rechazada (respondiendo solo lo marcado) antes de recargarla
+PAGE_RELOADS = 1  # Recargas de una página que sigue fallando antes de abandonar la ejecución
+# Condiciones de WAIT_SCRIPT que reciben localizadores (las demás, un elemento o un valor)
+LOCATOR_CONDITIONS = ("visible", "shown", "present", "hidden")
+# Marcas con que el sitio señala las preguntas obligatorias sin respuesta
+FLAGGED_SELECTOR = "[aria-invalid='true'], .error"
+
+# Sondas de estado en orden de prioridad: el primer selector con un elemento visible decide
+STATE_PROBES = [
+    ("finished", "#finishIncentiveHolder"),
+    ("session_timeout", "div[class*='sessionTimeoutDialog']"),
+    ("validation_error", "#ValidationError, .error, [aria-invalid='true']"),
+    ("ticket", "#CN1"),
+    ("questions", "#NextButton, input[type='submit'][value*='Next']"),
+]
+
+# Método que atiende cada estado; devuelve False para terminar la ejecución
+STATE_HANDLERS = {
+    "ticket": "on_ticket",
+    "questions": "on_questions",
+    "validation_error": "on_validation_error",
+    "session_timeout": "on_session_timeout",
+    "unknown": "on_unknown",
+}
+
+# Métodos que hablan con el sitio (transporte). McDVoiceSurvey los implementa con
+# Selenium y http_backend.HttpSurvey con peticiones HTTP; los manejadores solo
+# leen el snapshot y encolan respuestas, así que funcionan igual con ambos. Una
+# subclase declarada con transport=True tiene que reemplazarlos todos.
+TRANSPORT_METHODS = [
+    "open_survey",
+    "fetch_snapshot",
+    "fetch_layout",
+    "execute_plan",
+    "type_text",
+    "click_next",
+    "reload_page",
+    "detect_state",
+    "wait_for_state",
+    "handle_session_timeout",
+    "read_results",
+    "page_source",
+    "close_transport",
+    "abort_transport",
+]
+
+# Orden en que se responden los tipos de widget de una página
+WIDGET_HANDLERS = [
+    ("open_text", "answer_open_text_questions"),                       # 1. Preguntas abiertas tipo textarea
+    ("dropdown", "answer_dropdown_questions"),                         # 2. Dropdowns/demográficos
+    ("radio", "answer_radio_questions"),                               # 3. Preguntas de radio estándar
+    ("table", "answer_table_questions"),                               # 4. Preguntas tipo tabla (Sí/No)
+    ("checkbox", "answer_checkbox_questions"),                         # 5. Selección múltiple
+    ("problem_experience", "answer_problem_experience_questions"),     # 6. Problemas experimentados
+    ("na_satisfaction", "answer_na_satisfaction_questions"),           # 7. Satisfacción con opción N/A
+    ("satisfaction_scale", "answer_satisfaction_scale_questions"),     # 8. Satisfacción de una sola pregunta sin N/A
+    ("scale", "answer_scale_questions"),                               # 9. Satisfacción por filas
+    ("overall_satisfaction", "answer_overall_satisfaction_highly_satisfied"), # 10. Satisfacción general
+    ("likelihood", "answer_likelihood_questions"),                     # 11. Probabilidad (recomendar/volver)
+]
+
+# Métodos cuyo tiempo y comandos WebDriver se miden cuando la instrumentación está activa
+INSTRUMENTED_METHODS = [handler for _, handler in WIDGET_HANDLERS] + [
+    "enter_ticket_number",
+    "lookup_layout",
+    "get_snapshot",
+    "apply_plan",
+    "handle_session_timeout",
+    "detect_state",
+    "submit_page",
+    "reload_page",
+    "wait_for_page",
+    "get_survey_results",
+]
+
+
+def page_key(snapshot):
+    """Identifica una página por sus preguntas, para saber si un reintento sigue en la misma"""
+    return tuple(widget["ref"] for group in ("tables", "fieldsets", "selects", "textareas")
+                 for widget in snapshot[group])
+
+
+def classify_page(snapshot):
+    """Asigna cada widget del snapshot a exactamente un tipo de manejador en una sola pasada"""
+    page = {kind: [] for kind, _ in WIDGET_HANDLERS}
+    page["unknown"] = []
+    
+    for table in snapshot["tables"]:
+        classes = table["classes"]
+        if "HighlyLikelyDESC" in classes:
+            page["likelihood"].append(table)
+        elif "HighlySatisfiedNeitherDESC" in classes:
+            if table["has_na"]:
+                page["na_satisfaction"].append(table)
+                continue
+            # Las filas de satisfacción general siempre van a su propio manejador
+            overall = [r for r in table["rows"] if "overall satisfaction" in r["text"].lower()]
+            others = [r for r in table["rows"] if r not in overall]
+            if overall:
+                page["overall_satisfaction"].append(dict(table, rows=overall))
+            if len(others) > 1:
+                page["scale"].append(dict(table, rows=others))
+            elif others:
+                row = others[0]
+                page["satisfaction_scale"].append(dict(table, rows=others, text=row["text"], options=row["options"]))
+            elif not overall:
+                page["satisfaction_scale"].append(table)
+        elif "Inputtyperbl" in classes:
+            page["table"].append(table)
+        else:
+            page["unknown"].append(table)
+    
+    for fieldset in snapshot["fieldsets"]:
+        classes = fieldset["classes"]
+        if "inputtypeopt" in classes:
+            if "problem you experienced" in fieldset["legend"].lower():
+                page["problem_experience"].append(fieldset)
+            else:
+                page["checkbox"].append(fieldset)
+        elif "inputtyperblv" in classes and not fieldset["in_table"]:
+            page["radio"].append(fieldset)
+    
+    page["dropdown"] = list(snapshot["selects"])
+    page["open_text"] = list(snapshot["textareas"])
+    return page
+
 
 class McDVoiceSurvey:
-    def __init__(self):
-        self.driver = self._init_browser()
-        self.wait = WebDriverWait(self.driver, 15)
+    def __init_subclass__(cls, transport=False, **kwargs):
+        """Un transporte nuevo (class X(McDVoiceSurvey, transport=True)) tiene que reemplazar todos los
+        TRANSPORT_METHODS: uno a medias mezclaría llamadas a Selenium con una sesión sin navegador"""
+        super().__init_subclass__(**kwargs)
+        if transport:
+            missing = [name for name in TRANSPORT_METHODS if getattr(cls, name) is getattr(McDVoiceSurvey, name)]
+            if missing:
+                raise TypeError(f"{cls.__name__} no implementa los métodos de transporte: {', '.join(missing)}")
+
+    def __init__(self, url=URL, pacing=PACING_PROFILE, quiet=QUIET_CONSOLE, text_mode=TEXT_ENTRY_MODE,
+                 trace=TRACE_FILE, browser=BROWSER_MODE, page_load=PAGE_LOAD_STRATEGY,
+                 blocked_hosts=BLOCKED_HOSTS, blocked_resources=BLOCKED_RESOURCES, driver=None, seed=SEED,
+                 page_deadline=PAGE_DEADLINE, run_deadline=RUN_DEADLINE, ledger=LEDGER_FILE, record=RECORD_DIR,
+                 layout_cache=LAYOUT_CACHE_FILE):
+        if text_mode not in ("js", "bulk", "chunked"):
+            raise ValueError(f"Modo de escritura desconocido: {text_mode}")
+        self.url = url
+        self.text_mode = text_mode
+        # Toda la aleatoriedad sale de un generador con semilla: misma semilla, mismas respuestas
+        self.seed = int(seed) if seed is not None else random.SystemRandom().randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.corpus = CommentCorpus(COMMENT_FILES, rng=self.rng)
+        self.policy = AnswerPolicy.load(POLICY_FILE)
+        self.pacer = Pacer(pacing, quiet=quiet)
+        self.page_load = page_load
+        self.page_deadline = page_deadline
+        self.run_deadline = run_deadline
+        self.watchdog = None
+        self.timed_out = None  # "page" o "run" si el vigilante abortó la ejecución
+        self.timeout_report = None
+        self.state = None
+        self.ledger = RunLedger(ledger) if ledger else None
+        self.started = None
+        self.page_log = []  # [{"type", "start"}] de cada página visitada, para el registro de ejecuciones
+        # Modo de grabación: páginas respondidas y respuestas aplicadas (ver fixture_store.py)
+        self.recorder = FixtureStore(record) if record else None
+        self._decisions = []
+        # Caché de estructuras entre ejecuciones (ver layout_cache.py)
+        self.layout_cache = LayoutCache(layout_cache) if layout_cache else None
+        self._layout = None  # Huella de la página actual, si se consultó la caché
+        self._cached = None  # Snapshot guardado que se está usando en lugar de uno nuevo
+        # Con driver (p. ej. el navegador caliente de daemon.py) la sesión no se cierra al terminar
+        self.owns_driver = driver is None
+        self.driver = driver or self._init_browser(browser, blocked_hosts, blocked_resources)
         self.validation_code = None
         self.survey_completion_text = None
+        self._snapshot = None
+        self.visited_urls = set()  # URLs de las páginas descritas (el demonio limpia cada origen al terminar)
+        self._plan = []
+        self._answered = set()
+        self._failed = []
+        self._ticket_entered = False
+        self.error_count = 0
+        # Reintentos de la página rechazada actual: {"key": page_key, "retries": n, "reloads": n}
+        self._recovery = None
+        self.instrumentation = None
+        if trace:
+            self.instrumentation = Instrumentation(trace).attach(self, INSTRUMENTED_METHODS, classify_page)
         
-    def _init_browser(self):
-        """Configura e inicia el navegador Firefox"""
-        options = Options()
-        options.add_argument("--start-maximized")
-        options.set_preference("dom.webnotifications.enabled", False)
-        options.set_preference("intl.accept_languages", "es-US")
-        options.set_preference("dom.webdriver.enabled", False)
-        options.set_preference("useAutomationExtension", False)
-        
-        # Headers para parecer más humano
-        options.set_preference("general.useragent.override", 
-                             "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0")
-        
+    def _init_browser(self, mode=BROWSER_MODE, blocked_hosts=(), blocked_resources=()):
+        """Configura e inicia el navegador Firefox en el modo de arranque indicado"""
+        options = firefox_options(mode, self.page_load, blocked_hosts, blocked_resources,
+                                  PAGE_LOAD_TIMEOUT, SCRIPT_TIMEOUT)
+        set_command_timeout(COMMAND_TIMEOUT)
         driver = webdriver.Firefox(options=options)
         return driver
     
     def timed_delay(self, seconds):
-        """Pausa exacta con temporizador visible"""
-        start_time = datetime.now()
-        end_time = start_time + timedelta(seconds=seconds)
-        
-        while datetime.now() < end_time:
-            remaining = (end_time - datetime.now()).seconds
-            print(f"\rTiempo restante en esta pregunta: {remaining} segundos", end="")
-            time.sleep(1)
-        print()  # Salto de línea al finalizar
-    
-    def find_element(self, by, value, attempts=MAX_ATTEMPTS):
-        """Busca un elemento con múltiples intentos"""
-        for _ in range(attempts):
+        """Pausa inmediata con reloj monotónico y temporizador visible"""
+        self.pacer.sleep(seconds)
+    
+    def find_optional(self, *locators):
+        """Comprueba una sola vez varios localizadores alternativos y devuelve el primer elemento visible"""
+        try:
+            return self.driver.execute_script(FIND_SCRIPT, [[by, value] for by, value in locators])
+        except WebDriverException:
+            return None
+    
+    def find_required(self, *locators, timeout_ms=REQUIRED_TIMEOUT_MS):
+        """Espera en la página a que alguno de varios localizadores alternativos aparezca, hasta timeout_ms"""
+        return self.wait_until(("visible", locators), timeout=timeout_ms / 1000) or None
+    
+    def wait_until(self, *conditions, timeout=PAGE_TIMEOUT):
+        """Espera dentro de la página a que se cumplan todas las condiciones (ver WAIT_SCRIPT); False si no llegan"""
+        deadline = time.monotonic() + timeout
+        conditions = [[kind, [[by, value] for by, value in target] if kind in LOCATOR_CONDITIONS else target]
+                      for kind, target in conditions]
+        while True:
+            # Cada llamada termina antes del plazo de scripts del navegador; si no alcanza, se encadena otra
+            started = time.monotonic()
+            window = deadline - started
+            if SCRIPT_TIMEOUT > 1:
+                window = min(window, SCRIPT_TIMEOUT - 1)
             try:
-                element = self.driver.find_element(by, value)
-                if element.is_displayed() and element.is_enabled():
-                    return element
-            except (NoSuchElementException, StaleElementReferenceException):
-                time.sleep(1)
-        return None
+                result = self.driver.execute_async_script(WAIT_SCRIPT, conditions, max(0, int(window * 1000)))
+                # Un false antes de agotar la ventana: la página ya no va a cambiar (p. ej. fake_driver.FakeDriver)
+                if result or time.monotonic() - started < window:
+                    return result
+            except (StaleElementReferenceException, NoSuchElementException):
+                # El elemento de una condición "detached" ya no existe: esa condición se cumplió
+                conditions = [condition for condition in conditions if condition[0] != "detached"]
+            except (JavascriptException, TimeoutException):
+                pass  # La navegación descargó el documento a mitad de la espera: se sigue en el nuevo
+            if time.monotonic() >= deadline:
+                return False
+    
+    def find_element(self, by, value, timeout_ms=REQUIRED_TIMEOUT_MS):
+        """Busca un elemento obligatorio esperando hasta timeout_ms"""
+        return self.find_required((by, value), timeout_ms=timeout_ms)
+    
+    def log_error(self, context, error):
+        """Muestra un error capturado y lo registra en la instrumentación si está activa"""
+        print(f"{context}: {str(error)}")
+        self.error_count += 1
+        if self.instrumentation:
+            self.instrumentation.error(context, error)
+    
+    def finish_instrumentation(self):
+        """Escribe el resumen de la instrumentación al terminar la ejecución"""
+        if self.instrumentation:
+            summary = self.instrumentation.close()
+            total = summary["total"]
+            print(f"Instrumentación: {summary['pages']} páginas, {total['commands']} comandos, "
+                  f"{total['active_s']:.1f} s activos, {total['sleep_s']:.1f} s de pausas")
+    
+    def close(self):
+        """Detiene el vigilante, cierra la instrumentación y, si la sesión es propia, el navegador"""
+        if self.watchdog:
+            self.watchdog.stop()
+        self.finish_instrumentation()
+        self.finish_layout_cache()
+        if self.owns_driver:
+            self.close_transport()
+    
+    def finish_layout_cache(self):
+        """Guarda la caché de estructuras y muestra sus aciertos y fallos de la ejecución"""
+        if not self.layout_cache:
+            return
+        try:
+            self.layout_cache.save()
+        except OSError as e:
+            self.log_error("Error guardando la caché de estructuras", e)
+        stats = self.layout_cache.stats
+        print(f"Caché de estructuras: {stats['hits']} aciertos, {stats['misses']} fallos, "
+              f"{stats['evictions']} descartadas, {len(self.layout_cache.entries)} entradas")
+    
+    def close_transport(self):
+        """Cierra el navegador propio"""
+        if self.timed_out:
+            return  # abort_transport ya terminó sus procesos
+        print("Finalizando sesión del navegador...")
+        self.pacer.pause(3)
+        self.driver.quit()
+    
+    def start_run(self):
+        """Marca el inicio de la ejecución y empieza a vigilar los plazos de página y de ejecución"""
+        self.started = (datetime.now().astimezone(), time.monotonic())
+        if self.page_deadline or self.run_deadline:
+            self.watchdog = Watchdog(self.page_deadline, self.run_deadline, self.on_deadline).start()
+    
+    def on_deadline(self, report):
+        """Plazo agotado (se llama desde el hilo del vigilante): diagnóstico y cierre forzoso del transporte"""
+        self.timed_out = report["reason"]
+        report.update(state=self.state, url=(self._snapshot or {}).get("url"))
+        self.timeout_report = report
+        scope = "de la página" if report["reason"] == "page" else "de la ejecución"
+        print(f"\nSe agotó el plazo {scope} ({report['deadline_s']} s) en el estado '{report['state']}'; "
+              f"se aborta la sesión")
+        # Las últimas llamadas del propio bot dicen más que el interior de Selenium o threading
+        here = os.path.dirname(os.path.abspath(__file__))
+        frames = [frame for frame in report["stack"] if here in frame] or report["stack"]
+        if frames:
+            print("Detenido en:\n" + "\n".join(frames[-2:]))
+        if self.instrumentation:
+            self.instrumentation.timeout = report
+        self.pacer.cancel()
+        self.abort_transport()
+    
+    def abort_transport(self):
+        """Mata el árbol de procesos del navegador (geckodriver y Firefox) para liberar al hilo principal"""
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        if process is not None:
+            kill_process_tree(process.pid)
+    
+    def open_survey(self):
+        """Carga la página inicial de la encuesta y espera a que esté lista"""
+        self.driver.get(self.url)
+        return self.wait_for_page()
     
     def safe_click(self, element):
         """Intenta hacer clic en un elemento de manera segura"""
@@ -69,769 +378,842 @@ class McDVoiceSurvey:
         except Exception:
             return False
     
+    def get_snapshot(self, refresh=False):
+        """Describe todas las preguntas visibles de la página con una sola llamada al navegador"""
+        if refresh or self._snapshot is None:
+            self._snapshot = self.fetch_snapshot()
+            self.visited_urls.add(self._snapshot.get("url"))
+        return self._snapshot
+    
+    def fetch_snapshot(self):
+        """Lee el snapshot de la página actual del navegador"""
+        return self.driver.execute_script(SNAPSHOT_SCRIPT, FLAGGED_SELECTOR)
+    
+    def fetch_layout(self):
+        """Lee solo la estructura de la página actual (ids y clases de sus widgets)"""
+        return self.driver.execute_script(LAYOUT_SCRIPT)
+    
+    def lookup_layout(self):
+        """Con la caché de estructuras, usa el snapshot guardado de una página ya conocida; None si no lo hay"""
+        self._layout = self._cached = None
+        # Solo en la primera pasada de una página: un reintento ya trabaja sobre lo que marcó el sitio
+        if not self.layout_cache or self._snapshot is not None or self._answered:
+            return None
+        try:
+            self._layout = structure_fingerprint(self.fetch_layout())
+        except WebDriverException as e:
+            self.log_error("Error leyendo la estructura de la página", e)
+            return None
+        self._cached = self.layout_cache.get(self._layout)
+        if self._cached is not None:
+            self._snapshot = copy.deepcopy(self._cached)
+        return self._cached
+    
+    def store_layout(self, snapshot):
+        """Guarda en la caché el snapshot de una página cuya estructura no estaba"""
+        if self._layout and self._cached is None and self._layout not in self.layout_cache.entries:
+            page_type = self.page_log[-1]["type"] if self.page_log else None
+            self.layout_cache.put(self._layout, copy.deepcopy(snapshot), page_type)
+    
+    def resume_cached(self):
+        """Tras aplicar el plan guardado: si la estructura no cambió no hace falta un snapshot nuevo"""
+        try:
+            fingerprint = structure_fingerprint(self.fetch_layout())
+        except WebDriverException:
+            fingerprint = None
+        if fingerprint == self._layout:
+            self._snapshot = copy.deepcopy(self._cached)
+            return
+        # Aparecieron preguntas condicionales: la siguiente pasada describe la página de nuevo. Lo ya
+        # respondido se reconoce por su identidad estable (no por su ref, que el snapshot nuevo renumera)
+        self._cached = None
+    
+    def evict_layout(self, refs):
+        """El plan guardado no coincidió con la página real: se descarta y se responde con un snapshot nuevo"""
+        print(f"  La estructura guardada {self._layout} ya no coincide con la página ({', '.join(refs[:3])}); "
+              f"se descarta")
+        self.layout_cache.evict(self._layout)
+        self._cached = None
+        self._answered = set()
+    
+    def wait_for_page(self, previous=None):
+        """Espera la transición real: elemento anterior obsoleto, documento listo y contenido nuevo visible"""
+        self.new_page()
+        # Con carga "eager" basta con que el DOM esté analizado, sin esperar imágenes ni otros subrecursos
+        conditions = [("ready", self.page_load == "eager"), ("present", [(By.CSS_SELECTOR, PAGE_READY_SELECTOR)])]
+        if previous is not None:
+            conditions.insert(0, ("detached", previous))
+        ready = bool(self.wait_until(*conditions))
+        if not ready:
+            print("La página no cambió dentro del tiempo de espera")
+        if NAVIGATION_DELAY > 0:
+            self.timed_delay(NAVIGATION_DELAY)
+        # El presupuesto de la página nueva empieza a contar cuando ya está lista
+        self.pacer.start_page()
+        return ready
+    
+    def new_page(self):
+        """Descarta el estado de la página anterior tras una navegación"""
+        self._snapshot = None
+        self._plan = []
+        self._answered = set()
+        self._failed = []
+        self._decisions = []
+        self.page_log.append({"type": None, "start": time.monotonic()})
+        if self.watchdog:
+            self.watchdog.start_page()
+    
+    def set_page_type(self, page_type):
+        """Anota el tipo de la página actual la primera vez que se conoce"""
+        if self.page_log and self.page_log[-1]["type"] is None:
+            self.page_log[-1]["type"] = page_type
+    
+    def pending(self, handler, widgets):
+        """Filtra los widgets que este manejador aún no ha respondido en la página actual"""
+        fresh = [w for w in widgets if (handler, widget_identity(w)) not in self._answered]
+        self._answered.update((handler, widget_identity(w)) for w in fresh)
+        return fresh
+    
+    def queue_answer(self, ref, action="click", value=None, message=None, show=None, expect=None):
+        """Agrega una acción (click, check, select, text o type) al plan de respuestas de la página"""
+        self._plan.append({"ref": ref, "action": action, "value": value,
+                           "message": message, "show": show, "expect": expect})
+    
+    def queue_option(self, option, message=None, show=None):
+        """Encola el clic en la etiqueta de una opción del snapshot (o en el input si no tiene etiqueta)"""
+        # El texto esperado de la etiqueta permite comprobar un snapshot de la caché contra la página real
+        self.queue_answer(option["label_ref"] or option["ref"], "click", message=message, show=show,
+                          expect=option["label"] if option["label_ref"] else None)
+    
+    def queue_check(self, option, message=None, show=None):
+        """Encola marcar una casilla del snapshot (no la desmarca si ya lo está)"""
+        # Igual que en queue_option: la etiqueta esperada detecta una casilla de la caché que cambió de texto
+        self.queue_answer(option["ref"], "check", message=message, show=show,
+                          expect=option["label"] if option["label_ref"] else None)
+    
+    def enter_text(self, ref, text, message=None):
+        """Escribe texto en un campo sin enviar un comando por cada carácter"""
+        if self.text_mode == "js":
+            # Se aplica junto con el resto del plan: valor y eventos input/keyup/change en la misma llamada
+            self.queue_answer(ref, "text", text, message)
+            self.pacer.dwell(TEXT_FIELD_BUDGET)
+            return
+        
+        # "type": se escribe con el teclado al aplicar el plan, después de la llamada al navegador
+        self.queue_answer(ref, "type", text, message)
+        if self.text_mode != "chunked":
+            self.pacer.dwell(TEXT_FIELD_BUDGET)
+    
+    def type_text(self, ref, text, chunked=False):
+        """Escribe en un campo con el teclado: un solo envío o por fragmentos de TEXT_CHUNK_SIZE"""
+        field = self.find_element(By.CSS_SELECTOR, ref)
+        if field is None:
+            return False
+        field.clear()
+        if not chunked:
+            field.send_keys(text)
+            return True
+        chunks = [text[i:i + TEXT_CHUNK_SIZE] for i in range(0, len(text), TEXT_CHUNK_SIZE)]
+        # El presupuesto del campo se reparte entre los envíos en lugar de dormir por carácter
+        pause = TEXT_FIELD_BUDGET / len(chunks) if chunks else 0
+        for chunk in chunks:
+            field.send_keys(chunk)
+            self.pacer.pause(pause, label=None)
+        return True
+    
+    def apply_plan(self):
+        """Aplica todas las respuestas pendientes de la página con una sola llamada al navegador"""
+        plan, self._plan = self._plan, []
+        if not plan:
+            return []
+        scripted = [item for item in plan if item["action"] != "type"]
+        try:
+            applied = iter(self.execute_plan([
+                {"ref": item["ref"], "action": item["action"], "value": item["value"]} for item in scripted
+            ]) if scripted else [])
+            results = []
+            for item in plan:
+                if item["action"] != "type":
+                    results.append(next(applied))
+                elif self.type_text(item["ref"], item["value"], self.text_mode == "chunked"):
+                    results.append({"ok": True, "error": "", "value": item["value"], "text": item["value"]})
+                else:
+                    results.append({"ok": False, "error": "campo no encontrado"})
+        except Exception as e:
+            self.log_error("Error aplicando respuestas", e)
+            return []
+        # Las respuestas pueden mostrar preguntas condicionales: el snapshot ya no es válido
+        self._snapshot = None
+        if self._cached is not None:
+            mismatched = [item["ref"] for item, result in zip(plan, results)
+                          if not result["ok"] or (item["expect"] and result.get("text") != item["expect"])]
+            if mismatched:
+                self.evict_layout(mismatched)
+        for item, result in zip(plan, results):
+            if not result["ok"]:
+                print(f"  No se pudo aplicar la respuesta en {item['ref']}: {result['error']}")
+            elif item["message"]:
+                detail = (result[item["show"]] or "Opción seleccionada") if item["show"] else ""
+                print(item["message"] + detail)
+        if self.recorder:
+            self._decisions.extend({"ref": item["ref"], "action": item["action"], "value": item["value"],
+                                    "ok": result["ok"], "text": result.get("text")}
+                                   for item, result in zip(plan, results))
+        return results
+    
+    def execute_plan(self, actions):
+        """Aplica una lista de acciones {ref, action, value} en el navegador con una sola llamada"""
+        return self.driver.execute_script(APPLY_PLAN_SCRIPT, actions)
+    
+    def choose_option(self, kind, text, options, key="weights"):
+        """Elige una opción con la distribución de la política; avisa si tuvo que ajustarla"""
+        weights, exact = self.policy.weights(kind, text, len(options), key)
+        if not exact:
+            print(f"  La política '{kind}' no tiene {len(options)} opciones; se ajusta la distribución")
+        return self.rng.choices(options, weights=weights, k=1)[0]
+    
+    def widgets(self, kind):
+        """Widgets de la página actual que el clasificador asigna a un tipo de manejador"""
+        return self.pending(kind, classify_page(self.get_snapshot())[kind])
+    
+    def plan_page(self, snapshot):
+        """Calcula todas las respuestas pendientes de una página a partir de su snapshot, sin tocar el sitio"""
+        page = classify_page(snapshot)
+        self.set_page_type("+".join(sorted(kind for kind, widgets in page.items() if widgets)) or "sin_preguntas")
+        for widget in self.pending("unknown", page["unknown"]):
+            print(f"\nWidget no reconocido, se omite: {widget['ref']}")
+        
+        self._failed = []
+        for kind, handler in WIDGET_HANDLERS:
+            widgets = self.pending(kind, page[kind])
+            if widgets:
+                queued, errors = len(self._plan), self.error_count
+                getattr(self, handler)(widgets)
+                if self.error_count > errors:
+                    # El manejador falló a medias: se descarta lo que encoló y sus widgets quedan pendientes
+                    del self._plan[queued:]
+                    self._answered.difference_update((kind, widget_identity(w)) for w in widgets)
+                    self._failed.append(handler)
+        return self._plan
+    
+    def answer_page(self):
+        """Planifica la página completa y la aplica; repite si aparecen preguntas condicionales o hubo fallos"""
+        cached = self.lookup_layout()
+        for attempt in range(MAX_ATTEMPTS):
+            snapshot = self.get_snapshot()
+            planned = self.plan_page(snapshot)
+            if not attempt and cached is None:
+                self.store_layout(snapshot)
+            if planned:
+                self.apply_plan()
+                if self._cached is not None:
+                    self.resume_cached()
+            elif self._failed:
+                # Solo hubo fallos: se vuelve a leer la página antes de reintentar esos manejadores
+                self._snapshot = None
+            else:
+                # Sin respuestas nuevas no hay preguntas condicionales pendientes
+                break
+        for handler in self._failed:
+            print(f"  {handler} no pudo responder la página; se envía igual y el sitio marcará lo que falte")
+    
+    def plan_flagged(self, snapshot):
+        """Planifica solo las preguntas que el sitio marcó y da el resto por respondido; devuelve cuántas son"""
+        tables = []
+        for table in snapshot["tables"]:
+            rows = [row for row in table["rows"] if row["flagged"]]
+            if rows:
+                # Solo se vuelven a responder las filas marcadas de la tabla
+                tables.append(dict(table, rows=rows))
+            elif table["flagged"]:
+                tables.append(table)
+        flagged = dict(snapshot, tables=tables, **{group: [w for w in snapshot[group] if w["flagged"]]
+                                                   for group in ("fieldsets", "selects", "textareas")})
+        count = sum(len(table["rows"]) or 1 for table in tables)
+        count += sum(len(flagged[group]) for group in ("fieldsets", "selects", "textareas"))
+        if not count:
+            return 0
+        self.plan_page(flagged)
+        # Las pasadas siguientes de answer_page solo atienden preguntas condicionales nuevas
+        # (y los manejadores que fallaron)
+        failed = {kind for kind, handler in WIDGET_HANDLERS if handler in self._failed}
+        for kind, widgets in classify_page(snapshot).items():
+            if kind not in failed:
+                self._answered.update((kind, widget_identity(w)) for w in widgets)
+        return count
+    
     def enter_ticket_number(self):
         """Ingresa el número de ticket en los campos correspondientes"""
         try:
             print("\nIngresando número de ticket...")
             for i, part in enumerate(TICKET_NUMBER, start=1):
-                field = self.find_element(By.ID, f"CN{i}")
-                if field:
-                    field.clear()
-                    field.send_keys(part)
+                if self.type_text(f"#CN{i}", part):
                     print(f"  Parte {i} del ticket ingresada: {part}")
-                    self.timed_delay(3)  # 3 segundos entre cada campo
+                    self.pacer.dwell(3)  # 3 segundos entre cada campo
             
-            next_btn = self.find_element(By.ID, "NextButton")
-            if next_btn and self.safe_click(next_btn):
-                print("Número de ticket completado, avanzando...")
-                self.timed_delay(5)  # Espera después de enviar el ticket
+            self.pacer.finish_page()
+            # Espera a que cargue la primera página de preguntas
+            if self.click_next("Número de ticket completado, avanzando..."):
                 return True
         except Exception as e:
-            print(f"Error ingresando ticket: {str(e)}")
+            self.log_error("Error ingresando ticket", e)
         return False
     
-    def answer_likelihood_questions(self):
+    def answer_likelihood_questions(self, widgets=None):
         """Responde preguntas de tipo 'likelihood' (probabilidad) con escala de 5 puntos"""
         try:
-            # Buscar todas las tablas de preguntas de probabilidad
-            tables = self.driver.find_elements(By.XPATH, "//table[contains(@class, 'HighlyLikelyDESC')]")
+            # Tablas de preguntas de probabilidad asignadas por el clasificador
+            tables = self.widgets("likelihood") if widgets is None else widgets
             
             for table in tables:
-                if table.is_displayed():
-                    # Obtener el título de la sección
-                    section_title = "Sección de probabilidad"
-                    try:
-                        caption = table.find_element(By.XPATH, ".//caption//h2")
-                        section_title = caption.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando sección: {section_title}")
+                # Obtener el título de la sección
+                section_title = table["caption"] or "Sección de probabilidad"
+                
+                print(f"\nProcesando sección: {section_title}")
+                
+                question_rows = table["rows"]
+                
+                for row in question_rows:
+                    # Obtener el texto de la pregunta
+                    question_text = row["text"] or "Desconocida"
                     
-                    # Obtener todas las filas de preguntas
-                    question_rows = table.find_elements(By.XPATH, ".//tbody//tr[contains(@id, 'FNSR')]")
+                    print(f"  Evaluando: {question_text}")
                     
-                    for row in question_rows:
-                        if row.is_displayed():
-                            # Obtener el texto de la pregunta
-                            question_text = "Desconocida"
-                            try:
-                                question_element = row.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                                question_text = question_element.text.strip()
-                            except:
-                                pass
-                            
-                            print(f"  Evaluando: {question_text}")
-                            
-                            # Determinar ponderación basada en el tipo de pregunta
-                            if "recommend" in question_text.lower():
-                                # Más probabilidad de respuestas positivas para recomendación
-                                weights = [0.70, 0.20, 0.07, 0.02, 0.01]
-                            elif "return" in question_text.lower():
-                                # Probabilidad media para retorno
-                                weights = [0.60, 0.25, 0.10, 0.04, 0.01]
-                            else:
-                                # Para otras preguntas de probabilidad
-                                weights = [0.50, 0.30, 0.15, 0.04, 0.01]
-                            
-                            # Buscar todas las opciones de radio en la fila
-                            options = row.find_elements(By.XPATH, ".//input[@type='radio']")
-                            visible_options = [o for o in options if o.is_displayed()]
-                            
-                            if visible_options and len(weights) == len(visible_options):
-                                selected_option = random.choices(visible_options, weights=weights, k=1)[0]
-                                
-                                # Hacer clic en la opción seleccionada
-                                label = row.find_element(By.XPATH, f".//label[@for='{selected_option.get_attribute('id')}']")
-                                
-                                if self.safe_click(label):
-                                    value = selected_option.get_attribute("value")
-                                    rating_map = {
-                                        "5": "Highly Likely",
-                                        "4": "Likely",
-                                        "3": "Somewhat Likely",
-                                        "2": "Not Very Likely",
-                                        "1": "Not At All Likely"
-                                    }
-                                    rating_text = rating_map.get(value, "Opción seleccionada")
-                                    print(f"    Seleccionado: {rating_text}")
-                                    self.timed_delay(2)  # Pequeña pausa entre preguntas
+                    # Opciones de radio visibles en la fila
+                    visible_options = row["options"]
                     
-                    # Espera el tiempo restante para completar los 30 segundos por grupo de preguntas
-                    remaining_time = max(0, QUESTION_DURATION - (2 * len(question_rows)))
-                    if remaining_time > 0:
-                        self.timed_delay(remaining_time)
+                    if visible_options:
+                        # Ponderación según la política (recomendación, retorno u otras)
+                        selected_option = self.choose_option("likelihood", question_text, visible_options)
+                        
+                        rating_map = {
+                            "5": "Highly Likely",
+                            "4": "Likely",
+                            "3": "Somewhat Likely",
+                            "2": "Not Very Likely",
+                            "1": "Not At All Likely"
+                        }
+                        rating_text = rating_map.get(selected_option["value"], "Opción seleccionada")
+                        # Encolar el clic en la etiqueta de la opción seleccionada
+                        self.queue_option(selected_option, f"    Seleccionado: {rating_text}")
+                        self.pacer.dwell(2)  # Pequeña pausa entre preguntas
+                
+                # Espera el tiempo restante para completar los 30 segundos por grupo de preguntas
+                remaining_time = max(0, QUESTION_DURATION - (2 * len(question_rows)))
+                if remaining_time > 0:
+                    self.pacer.dwell(remaining_time)
         except Exception as e:
-            print(f"Error respondiendo preguntas de probabilidad: {str(e)}")
+            self.log_error("Error respondiendo preguntas de probabilidad", e)
 
-    def answer_dropdown_questions(self):
+    def answer_dropdown_questions(self, widgets=None):
         """Responde preguntas de tipo dropdown (desplegables)"""
         try:
-            # Buscar todos los elementos select visibles
-            dropdowns = self.driver.find_elements(By.XPATH, "//select[not(contains(@class, 'hidden')) and not(@aria-hidden='true')]")
-            
-            for dropdown in dropdowns:
-                if dropdown.is_displayed():
-                    # Obtener la pregunta asociada al dropdown
-                    question_text = "Pregunta dropdown"
-                    try:
-                        label = self.driver.find_element(By.XPATH, f"//label[@for='{dropdown.get_attribute('id')}']")
-                        question_text = label.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta dropdown: {question_text}")
+            for dropdown in (self.widgets("dropdown") if widgets is None else widgets):
+                # Obtener la pregunta asociada al dropdown
+                question_text = dropdown["label"] or "Pregunta dropdown"
+                
+                print(f"\nProcesando pregunta dropdown: {question_text}")
+                
+                # Filtrar opciones válidas excluyendo placeholders y opciones de no respuesta
+                valid_options = [
+                    opt for opt in dropdown["options"]
+                    if opt["value"]
+                    and opt["text"] not in [" - Select One - ", "Prefer not to answer", "No deseo responder", "Prefiero no contestar"]
+                    and not opt["text"].startswith(" - ")
+                    and opt["text"] != ""
+                ]
+                
+                if valid_options:
+                    # Selección completamente aleatoria sin ponderaciones
+                    selected = self.rng.choice(valid_options)
                     
-                    # Crear objeto Select para manipular el dropdown
-                    select = Select(dropdown)
-                    options = select.options
+                    # Encolar la selección de la opción
+                    self.queue_answer(dropdown["ref"], "select", selected["value"],
+                                      "  Seleccionado aleatoriamente: ", show="text")
                     
-                    # Filtrar opciones válidas excluyendo placeholders y opciones de no respuesta
-                    valid_options = [
-                        opt for opt in options 
-                        if opt.get_attribute('value') 
-                        and opt.text.strip() not in [" - Select One - ", "Prefer not to answer", "No deseo responder", "Prefiero no contestar"]
-                        and not opt.text.strip().startswith(" - ")
-                        and opt.text.strip() != ""
-                    ]
+                    self.pacer.dwell(2)  # Pequeña pausa después de seleccionar
+                else:
+                    print("  No se encontraron opciones válidas para seleccionar")
                     
-                    if valid_options:
-                        # Selección completamente aleatoria sin ponderaciones
-                        selected = random.choice(valid_options)
-                        
-                        # Seleccionar la opción
-                        select.select_by_value(selected.get_attribute('value'))
-                        print(f"  Seleccionado aleatoriamente: {selected.text}")
-                        
-                        self.timed_delay(2)  # Pequeña pausa después de seleccionar
-                    else:
-                        print("  No se encontraron opciones válidas para seleccionar")
-                        
         except Exception as e:
-            print(f"Error respondiendo preguntas dropdown: {str(e)}")
+            self.log_error("Error respondiendo preguntas dropdown", e)
 
-    def answer_scale_questions(self):
+    def answer_scale_questions(self, widgets=None):
         """Responde preguntas con escala de satisfacción"""
         try:
-            tables = self.driver.find_elements(By.XPATH, "//table[contains(@class, 'HighlySatisfiedNeitherDESC')]")
+            tables = self.widgets("scale") if widgets is None else widgets
             
             for table in tables:
-                if table.is_displayed():
-                    section_title = "Sección de satisfacción"
-                    try:
-                        caption = table.find_element(By.XPATH, ".//caption//h2")
-                        section_title = caption.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando sección: {section_title}")
+                section_title = table["caption"] or "Sección de satisfacción"
+                
+                print(f"\nProcesando sección: {section_title}")
+                
+                question_rows = table["rows"]
+                
+                for row in question_rows:
+                    question_text = row["text"] or "Desconocida"
                     
-                    question_rows = table.find_elements(By.XPATH, ".//tbody//tr[contains(@id, 'FNSR')]")
+                    print(f"  Evaluando: {question_text}")
                     
-                    for row in question_rows:
-                        if row.is_displayed():
-                            question_text = "Desconocida"
-                            try:
-                                question_element = row.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                                question_text = question_element.text.strip()
-                            except:
-                                pass
-                            
-                            print(f"  Evaluando: {question_text}")
-                            
-                            if "shake" in question_text.lower():
-                                weights = [0.70, 0.20, 0.07, 0.02, 0.01]
-                            elif "mcflurry" in question_text.lower() or "cone" in question_text.lower():
-                                weights = [0.65, 0.25, 0.07, 0.02, 0.01]
-                            elif "breakfast" in question_text.lower() or "bagel" in question_text.lower() or "muffin" in question_text.lower():
-                                weights = [0.50, 0.30, 0.15, 0.04, 0.01]
-                            else:
-                                weights = [0.60, 0.25, 0.10, 0.04, 0.01]
-                            
-                            options = row.find_elements(By.XPATH, ".//input[@type='radio']")
-                            visible_options = [o for o in options if o.is_displayed()]
-                            
-                            if visible_options and len(weights) == len(visible_options):
-                                selected_option = random.choices(visible_options, weights=weights, k=1)[0]
-                                label = row.find_element(By.XPATH, f".//label[@for='{selected_option.get_attribute('id')}']")
-                                
-                                if self.safe_click(label):
-                                    value = selected_option.get_attribute("value")
-                                    rating_map = {
-                                        "5": "Highly Satisfied",
-                                        "4": "Satisfied",
-                                        "3": "Neutral",
-                                        "2": "Dissatisfied",
-                                        "1": "Highly Dissatisfied"
-                                    }
-                                    rating_text = rating_map.get(value, "Opción seleccionada")
-                                    print(f"    Seleccionado: {rating_text}")
-                                    self.timed_delay(2)
+                    visible_options = row["options"]
                     
-                    remaining_time = max(0, QUESTION_DURATION - (2 * len(question_rows)))
-                    if remaining_time > 0:
-                        self.timed_delay(remaining_time)
+                    if visible_options:
+                        selected_option = self.choose_option("scale", question_text, visible_options)
+                        
+                        rating_map = {
+                            "5": "Highly Satisfied",
+                            "4": "Satisfied",
+                            "3": "Neutral",
+                            "2": "Dissatisfied",
+                            "1": "Highly Dissatisfied"
+                        }
+                        rating_text = rating_map.get(selected_option["value"], "Opción seleccionada")
+                        self.queue_option(selected_option, f"    Seleccionado: {rating_text}")
+                        self.pacer.dwell(2)
+                
+                remaining_time = max(0, QUESTION_DURATION - (2 * len(question_rows)))
+                if remaining_time > 0:
+                    self.pacer.dwell(remaining_time)
         except Exception as e:
-            print(f"Error respondiendo preguntas de escala: {str(e)}")
+            self.log_error("Error respondiendo preguntas de escala", e)
     
-    def answer_problem_experience_questions(self):
+    def answer_problem_experience_questions(self, widgets=None):
         """Responde preguntas sobre problemas experimentados"""
         try:
-            fieldsets = self.driver.find_elements(By.XPATH, """
-                //fieldset[contains(@class, 'inputtypeopt') 
-                and .//legend[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'problem you experienced')]]""")
+            fieldsets = self.widgets("problem_experience") if widgets is None else widgets
             
             for fieldset in fieldsets:
-                if fieldset.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        legend = fieldset.find_element(By.XPATH, ".//legend")
-                        question_text = legend.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta sobre problemas: {question_text[:100]}...")
-                    
-                    options = fieldset.find_elements(By.XPATH, ".//div[contains(@class, 'cataOption')]")
-                    selected_options = []
+                question_text = fieldset["legend"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta sobre problemas: {question_text[:100]}...")
+                
+                options = fieldset["choices"]
+                selected_options = []
+                rule = self.policy.rule("problem_experience", question_text)
+                
+                serious_problem = self.rng.choices([True, False], weights=rule["serious_weights"], k=1)[0]
+                
+                if serious_problem:
+                    print("  Simulando un problema serio - seleccionando múltiples opciones")
+                    # Con menos de dos casillas se marcan las que haya (ninguna si no hay)
+                    most = min(rule["serious_max"], len(options))
+                    num_problems = self.rng.randint(min(2, most), most)
                     
-                    serious_problem = random.choices([True, False], weights=[0.2, 0.8], k=1)[0]
+                    # Primero los problemas más comunes según la política, luego al azar sin reemplazo
+                    chosen = self.policy.preferred(rule, "serious_prefer", options)[:num_problems]
+                    rest = [option for option in options if option not in chosen]
+                    chosen += self.rng.sample(rest, num_problems - len(chosen))
                     
-                    if serious_problem:
-                        print("  Simulando un problema serio - seleccionando múltiples opciones")
-                        common_problems = [
-                            "Accuracy of order",
-                            "Quality of food",
-                            "Speed of service",
-                            "cleanliness",
-                            "Product availability"
-                        ]
-                        
-                        num_problems = random.randint(2, min(4, len(options)))
-                        selected_indices = []
-                        
-                        for i, option in enumerate(options):
-                            label = option.find_element(By.XPATH, ".//label")
-                            label_text = label.text.lower()
-                            if any(problem.lower() in label_text for problem in common_problems):
-                                selected_indices.append(i)
-                                if len(selected_indices) >= num_problems:
-                                    break
-                        
-                        while len(selected_indices) < num_problems:
-                            idx = random.choice([i for i in range(len(options)) if i not in selected_indices])
-                            selected_indices.append(idx)
-                        
-                        for idx in selected_indices:
-                            option = options[idx]
-                            checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                            label = option.find_element(By.XPATH, ".//label")
-                            
-                            if self.safe_click(checkbox):
-                                option_text = label.text.strip()
-                                selected_options.append(option_text)
-                                print(f"  Reportando problema: {option_text}")
-                                self.timed_delay(2)
-                        
-                        other_option = fieldset.find_elements(By.XPATH, ".//label[contains(., 'Other')]")
-                        if other_option and other_option[0].is_displayed():
-                            other_text = random.choice([
-                                "Employee was rude",
-                                "Wrong order twice",
-                                "Food was cold",
-                                "Long waiting time",
-                                "Dirty tables"
-                            ])
-                            other_input = fieldset.find_element(By.XPATH, ".//input[@type='text']")
-                            if other_input.is_displayed() and other_input.is_enabled():
-                                other_input.send_keys(other_text)
-                                print(f"  Detalle adicional: {other_text}")
-                                self.timed_delay(3)
-                    else:
-                        print("  Simulando problema menor - seleccionando 1 opción")
-                        minor_problems = [
-                            "Friendliness of employees",
-                            "Speed of service",
-                            "cleanliness"
-                        ]
-                        
-                        selected = False
-                        for option in options:
-                            label = option.find_element(By.XPATH, ".//label")
-                            label_text = label.text.lower()
-                            if any(problem.lower() in label_text for problem in minor_problems):
-                                checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                                if self.safe_click(checkbox):
-                                    option_text = label.text.strip()
-                                    selected_options.append(option_text)
-                                    print(f"  Reportando problema menor: {option_text}")
-                                    selected = True
-                                    self.timed_delay(2)
-                                    break
-                        
-                        if not selected and options:
-                            option = random.choice(options)
-                            checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                            label = option.find_element(By.XPATH, ".//label")
-                            if self.safe_click(checkbox):
-                                option_text = label.text.strip()
-                                selected_options.append(option_text)
-                                print(f"  Reportando problema aleatorio: {option_text}")
-                                self.timed_delay(2)
+                    for option in chosen:
+                        selected_options.append(option["label"])
+                        self.queue_check(option, message="  Reportando problema: ", show="label")
+                        self.pacer.dwell(2)
                     
-                    print(f"  Problemas reportados: {', '.join(selected_options)}")
+                    if fieldset["other_visible"] and fieldset["other_input"]:
+                        other_text = self.rng.choice(rule["other_texts"])
+                        self.queue_answer(fieldset["other_input"], "text", other_text,
+                                          f"  Detalle adicional: {other_text}")
+                        self.pacer.dwell(3)
+                else:
+                    print("  Simulando problema menor - seleccionando 1 opción")
+                    minor = self.policy.preferred(rule, "minor_prefer", options)
                     
-                    remaining_time = max(0, QUESTION_DURATION - (2 * len(selected_options)))
-                    if remaining_time > 0:
-                        self.timed_delay(remaining_time)
+                    if minor:
+                        option = minor[0]
+                        selected_options.append(option["label"])
+                        self.queue_check(option, message="  Reportando problema menor: ", show="label")
+                        self.pacer.dwell(2)
+                    elif options:
+                        option = self.rng.choice(options)
+                        selected_options.append(option["label"])
+                        self.queue_check(option, message="  Reportando problema aleatorio: ", show="label")
+                        self.pacer.dwell(2)
+                
+                print(f"  Problemas reportados: {', '.join(selected_options)}")
+                
+                remaining_time = max(0, QUESTION_DURATION - (2 * len(selected_options)))
+                if remaining_time > 0:
+                    self.pacer.dwell(remaining_time)
         except Exception as e:
-            print(f"Error respondiendo preguntas sobre problemas: {str(e)}")
+            self.log_error("Error respondiendo preguntas sobre problemas", e)
     
-    def answer_na_satisfaction_questions(self):
+    def answer_na_satisfaction_questions(self, widgets=None):
         """Responde preguntas de satisfacción con opción N/A"""
         try:
-            tables = self.driver.find_elements(By.XPATH, """
-                //table[contains(@class, 'HighlySatisfiedNeitherDESC') 
-                and .//th[contains(@id, 'HighlySatisfiedNeitherDESC9')]]""")
+            tables = self.widgets("na_satisfaction") if widgets is None else widgets
             
             for table in tables:
-                if table.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        question_element = table.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                        question_text = question_element.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta con opción N/A: {question_text[:100]}...")
-                    
-                    reported_problem = random.choices([True, False], weights=[0.3, 0.7], k=1)[0]
-                    
-                    if reported_problem:
-                        print("  Suponiendo que el problema fue reportado - evaluando satisfacción")
-                        if "problem" in question_text.lower():
-                            weights = [0.20, 0.30, 0.20, 0.15, 0.15, 0.00]
-                        else:
-                            weights = [0.50, 0.30, 0.10, 0.05, 0.05, 0.00]
-                    else:
-                        print("  Suponiendo que el problema NO fue reportado - seleccionando N/A")
-                        weights = [0.00, 0.00, 0.00, 0.00, 0.00, 1.00]
-                    
-                    options = table.find_elements(By.XPATH, ".//input[@type='radio']")
-                    visible_options = [o for o in options if o.is_displayed()]
-                    
-                    if visible_options and len(weights) == len(visible_options):
-                        selected_option = random.choices(visible_options, weights=weights, k=1)[0]
-                        label = table.find_element(By.XPATH, f".//label[@for='{selected_option.get_attribute('id')}']")
-                        
-                        if self.safe_click(label):
-                            header_id = selected_option.get_attribute("aria-labelledby")
-                            if header_id:
-                                header = table.find_element(By.ID, header_id)
-                                option_text = header.text if header else "Opción seleccionada"
-                            else:
-                                option_text = "Opción seleccionada"
-                            
-                            print(f"  Seleccionado: {option_text}")
+                question_text = table["text"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta con opción N/A: {question_text[:100]}...")
+                
+                rule = self.policy.rule("na_satisfaction", question_text)
+                reported_problem = self.rng.choices([True, False], weights=rule["reported_weights"], k=1)[0]
+                
+                if reported_problem:
+                    print("  Suponiendo que el problema fue reportado - evaluando satisfacción")
+                    key = "weights"
+                else:
+                    print("  Suponiendo que el problema NO fue reportado - seleccionando N/A")
+                    key = "not_reported_weights"
+                
+                visible_options = table["options"]
+                
+                if visible_options:
+                    selected_option = self.choose_option("na_satisfaction", question_text, visible_options, key)
                     
-                    self.timed_delay(QUESTION_DURATION)
+                    self.queue_option(selected_option, "  Seleccionado: ", show="header")
+                
+                self.pacer.dwell(QUESTION_DURATION)
         except Exception as e:
-            print(f"Error respondiendo preguntas con N/A: {str(e)}")
+            self.log_error("Error respondiendo preguntas con N/A", e)
     
-    def answer_satisfaction_scale_questions(self):
+    def answer_satisfaction_scale_questions(self, widgets=None):
         """Responde preguntas de satisfacción con escala de 5 puntos (sin N/A)"""
         try:
-            tables = self.driver.find_elements(By.XPATH, """
-                //table[contains(@class, 'HighlySatisfiedNeitherDESC') 
-                and not(.//th[contains(@id, 'HighlySatisfiedNeitherDESC9')])]""")
+            tables = self.widgets("satisfaction_scale") if widgets is None else widgets
             
             for table in tables:
-                if table.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        question_element = table.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                        question_text = question_element.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta de satisfacción: {question_text[:100]}...")
-                    
-                    options = table.find_elements(By.XPATH, ".//input[@type='radio']")
-                    visible_options = [o for o in options if o.is_displayed()]
-                    
-                    if visible_options:
-                        weights = [0.60, 0.25, 0.10, 0.04, 0.01]
-                        selected_option = random.choices(visible_options, weights=weights, k=1)[0]
-                        label = table.find_element(By.XPATH, f".//label[@for='{selected_option.get_attribute('id')}']")
-                        
-                        if self.safe_click(label):
-                            header_id = selected_option.get_attribute("aria-labelledby")
-                            if header_id:
-                                header = table.find_element(By.ID, header_id)
-                                option_text = header.text if header else "Opción seleccionada"
-                            else:
-                                option_text = "Opción seleccionada"
-                            
-                            print(f"  Seleccionado: {option_text}")
+                question_text = table["text"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta de satisfacción: {question_text[:100]}...")
+                
+                visible_options = table["options"]
+                
+                if visible_options:
+                    selected_option = self.choose_option("satisfaction_scale", question_text, visible_options)
                     
-                    self.timed_delay(QUESTION_DURATION)
+                    self.queue_option(selected_option, "  Seleccionado: ", show="header")
+                
+                self.pacer.dwell(QUESTION_DURATION)
         except Exception as e:
-            print(f"Error respondiendo preguntas de satisfacción: {str(e)}")
+            self.log_error("Error respondiendo preguntas de satisfacción", e)
     
-    def answer_checkbox_questions(self):
+    def answer_checkbox_questions(self, widgets=None):
         """Responde preguntas con checkboxes (selección múltiple)"""
         try:
-            fieldsets = self.driver.find_elements(By.XPATH, "//fieldset[contains(@class, 'inputtypeopt')]")
+            fieldsets = self.widgets("checkbox") if widgets is None else widgets
             
             for fieldset in fieldsets:
-                if fieldset.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        legend = fieldset.find_element(By.XPATH, ".//legend")
-                        question_text = legend.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta de selección múltiple: {question_text}")
-                    
-                    options = fieldset.find_elements(By.XPATH, ".//div[contains(@class, 'cataOption')]")
-                    
-                    if "bakery & sweet treats" in question_text.lower():
-                        sweet_items = []
-                        for option in options:
-                            label = option.find_element(By.XPATH, ".//label")
-                            sweet_items.append((option, label.text.strip()))
-                        
-                        common_sweets = ["McFlurry", "Sundae", "Shake", "Cone"]
-                        selected = []
-                        
-                        matching_items = [item for item in sweet_items if any(sweet in item[1] for sweet in common_sweets)]
-                        num_to_select = min(2, max(1, len(matching_items)))
-                        
-                        if matching_items:
-                            selected_items = random.sample(matching_items, num_to_select)
-                            for item in selected_items:
-                                option, text = item
-                                checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                                if self.safe_click(checkbox):
-                                    selected.append(text)
-                                    print(f"  Seleccionado postre: {text}")
-                                    self.timed_delay(2)
-                        else:
-                            num_to_select = random.randint(1, min(2, len(sweet_items)))
-                            selected_indices = random.sample(range(len(sweet_items)), num_to_select)
-                            for idx in selected_indices:
-                                option, text = sweet_items[idx]
-                                checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                                if self.safe_click(checkbox):
-                                    selected.append(text)
-                                    print(f"  Seleccionado ítem: {text}")
-                                    self.timed_delay(2)
-                        
-                        print(f"  Postres seleccionados: {', '.join(selected)}")
-                    elif "breakfast items" in question_text.lower():
-                        breakfast_items = []
-                        for option in options:
-                            label = option.find_element(By.XPATH, ".//label")
-                            breakfast_items.append((option, label.text.strip()))
-                        
-                        common_items = ["Hotcakes", "Hashbrown", "Burrito", "McGriddle", "Biscuit"]
-                        selected = []
-                        
-                        matching_items = [item for item in breakfast_items if any(common in item[1] for common in common_items)]
-                        num_to_select = min(3, max(1, len(matching_items)))
-                        
-                        if matching_items:
-                            selected_items = random.sample(matching_items, num_to_select)
-                            for item in selected_items:
-                                option, text = item
-                                checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                                if self.safe_click(checkbox):
-                                    selected.append(text)
-                                    print(f"  Seleccionado ítem de desayuno: {text}")
-                                    self.timed_delay(2)
-                        else:
-                            num_to_select = random.randint(1, min(3, len(breakfast_items)))
-                            selected_indices = random.sample(range(len(breakfast_items)), num_to_select)
-                            for idx in selected_indices:
-                                option, text = breakfast_items[idx]
-                                checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                                if self.safe_click(checkbox):
-                                    selected.append(text)
-                                    print(f"  Seleccionado ítem: {text}")
-                                    self.timed_delay(2)
-                        
-                        print(f"  Ítems de desayuno seleccionados: {', '.join(selected)}")
-                    else:
-                        selected_options = []
-                        num_to_select = random.randint(1, min(3, len(options)))
-                        selected_indices = random.sample(range(len(options)), num_to_select)
-                        
-                        for idx in selected_indices:
-                            option = options[idx]
-                            checkbox = option.find_element(By.XPATH, ".//input[@type='checkbox']")
-                            label = option.find_element(By.XPATH, ".//label")
-                            
-                            if self.safe_click(checkbox):
-                                option_text = label.text.strip()
-                                selected_options.append(option_text)
-                                print(f"  Seleccionada opción: {option_text}")
-                                self.timed_delay(2)
-                        
-                        print(f"  Opciones seleccionadas: {', '.join(selected_options)}")
-                    
-                    remaining_time = max(0, QUESTION_DURATION - (2 * len(selected)))
-                    if remaining_time > 0:
-                        self.timed_delay(remaining_time)
+                question_text = fieldset["legend"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta de selección múltiple: {question_text}")
+                
+                options = fieldset["choices"]
+                selected = []
+                
+                # Regla de la política: ítems preferidos (postres, desayuno...) y cuántos marcar
+                rule = self.policy.rule("checkbox", question_text)
+                matching_items = self.policy.preferred(rule, "prefer", options)
+                
+                if matching_items:
+                    chosen = self.rng.sample(matching_items, min(rule["max"], len(matching_items)))
+                    message = rule["message"]
+                else:
+                    most = min(rule["max"], len(options))
+                    chosen = self.rng.sample(options, self.rng.randint(1, most)) if most else []
+                    message = rule["fallback_message"] if rule.get("prefer") else rule["message"]
+                
+                for option in chosen:
+                    selected.append(option["label"])
+                    self.queue_check(option, message=message, show="label")
+                    self.pacer.dwell(2)
+                
+                print(f"{rule['summary']}: {', '.join(selected)}")
+                
+                remaining_time = max(0, QUESTION_DURATION - (2 * len(selected)))
+                if remaining_time > 0:
+                    self.pacer.dwell(remaining_time)
         except Exception as e:
-            print(f"Error respondiendo preguntas de checkbox: {str(e)}")
+            self.log_error("Error respondiendo preguntas de checkbox", e)
     
-    def answer_table_questions(self):
+    def answer_table_questions(self, widgets=None):
         """Responde preguntas en formato de tabla simple (como Sí/No)"""
         try:
-            tables = self.driver.find_elements(By.XPATH, """
-                //table[contains(@class, 'Inputtyperbl') 
-                and not(contains(@class, 'HighlySatisfiedNeitherDESC'))]""")
+            tables = self.widgets("table") if widgets is None else widgets
             
             for table in tables:
-                if table.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        question_element = table.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                        question_text = question_element.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta en tabla: {question_text}")
+                question_text = table["text"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta en tabla: {question_text}")
+                
+                visible_options = table["options"]
+                
+                if visible_options:
+                    option = self.rng.choice(visible_options)
                     
-                    options = table.find_elements(By.XPATH, ".//input[@type='radio']")
-                    visible_options = [o for o in options if o.is_displayed()]
+                    self.queue_option(option, "  Seleccionada opción: ", show="header")
                     
-                    if visible_options:
-                        option = random.choice(visible_options)
-                        label = table.find_element(By.XPATH, f".//label[@for='{option.get_attribute('id')}']")
-                        
-                        if self.safe_click(label):
-                            header_id = option.get_attribute("aria-labelledby")
-                            if header_id:
-                                header = table.find_element(By.ID, header_id)
-                                option_text = header.text if header else "Opción seleccionada"
-                            else:
-                                option_text = "Opción seleccionada"
-                            
-                            print(f"  Seleccionada opción: {option_text}")
-                            
-                            self.timed_delay(QUESTION_DURATION)
+                    self.pacer.dwell(QUESTION_DURATION)
         except Exception as e:
-            print(f"Error respondiendo preguntas en tabla: {str(e)}")
+            self.log_error("Error respondiendo preguntas en tabla", e)
     
-    def answer_radio_questions(self):
+    def answer_radio_questions(self, widgets=None):
         """Responde preguntas de radio button estándar"""
         try:
-            fieldsets = self.driver.find_elements(By.XPATH, """
-                //fieldset[contains(@class, 'inputtyperblv') 
-                and not(ancestor::table) 
-                and not(contains(@class, 'inputtypeopt'))]""")
+            fieldsets = self.widgets("radio") if widgets is None else widgets
             
             for i, fieldset in enumerate(fieldsets, 1):
-                if fieldset.is_displayed():
-                    question_text = "Desconocida"
-                    try:
-                        legend = fieldset.find_element(By.XPATH, ".//legend")
-                        question_text = legend.text.strip()
-                    except:
-                        pass
-                    
-                    print(f"\nProcesando pregunta {i}: {question_text}")
+                question_text = fieldset["legend"] or "Desconocida"
+                
+                print(f"\nProcesando pregunta {i}: {question_text}")
+                
+                visible_options = fieldset["options"]
+                
+                if visible_options:
+                    option = self.rng.choice(visible_options)
                     
-                    options = fieldset.find_elements(By.XPATH, ".//input[@type='radio' and @name]")
-                    visible_options = [o for o in options if o.is_displayed()]
+                    self.queue_option(option, "  Seleccionada opción: ", show="label")
                     
-                    if visible_options:
-                        option = random.choice(visible_options)
-                        label = self.driver.find_element(By.XPATH, f"//label[@for='{option.get_attribute('id')}']")
-                        
-                        if self.safe_click(label):
-                            option_text = label.text.strip()
-                            print(f"  Seleccionada opción: {option_text}")
-                            
-                            self.timed_delay(QUESTION_DURATION)
+                    self.pacer.dwell(QUESTION_DURATION)
         except Exception as e:
-            print(f"Error respondiendo preguntas estándar: {str(e)}")
+            self.log_error("Error respondiendo preguntas estándar", e)
     
 
     
     def get_survey_results(self):
         """Captura el código de validación y texto de finalización"""
         try:
-            self.wait.until(EC.presence_of_element_located((By.ID, "finishIncentiveHolder")))
-            
-            val_code_element = self.find_element(By.XPATH, "//p[contains(@class, 'ValCode')]")
-            if val_code_element:
-                self.validation_code = val_code_element.text.replace("Validation Code: ", "").strip()
-            
-            thank_you_element = self.find_element(By.XPATH, "//p[@class='FinishHeader']")
-            if thank_you_element:
-                self.survey_completion_text = thank_you_element.text.strip()
-            
-            if not self.survey_completion_text:
-                thank_you_alt = self.find_element(By.XPATH, "//h2//p[contains(text(), 'Thank you')]")
-                if thank_you_alt:
-                    self.survey_completion_text = thank_you_alt.text.strip()
-            
+            code, text = self.read_results()
+            if code:
+                self.validation_code = code.replace("Validation Code: ", "").strip()
+            if text:
+                self.survey_completion_text = text.strip()
             return True
         except Exception as e:
-            print(f"Error obteniendo resultados: {str(e)}")
+            self.log_error("Error obteniendo resultados", e)
             return False
     
+    def page_source(self):
+        """HTML actual de la página"""
+        return self.driver.page_source
+    
+    def read_results(self):
+        """Lee de la página final el texto del código de validación y el de agradecimiento"""
+        if not self.wait_until(("present", [(By.ID, "finishIncentiveHolder")])):
+            raise TimeoutException("No apareció la página final")
+        val_code_element = self.find_optional((By.XPATH, "//p[contains(@class, 'ValCode')]"))
+        # Encabezado de agradecimiento o, en su defecto, el texto alternativo
+        thank_you_element = self.find_optional((By.XPATH, "//p[@class='FinishHeader']"),
+                                               (By.XPATH, "//h2//p[contains(text(), 'Thank you')]"))
+        return (val_code_element.text if val_code_element else None,
+                thank_you_element.text if thank_you_element else None)
+    
     def submit_page(self):
-        """Envía la página actual y maneja posibles errores"""
+        """Envía la página actual; False si no se pudo enviar"""
         try:
-            next_btn = self.find_element(By.XPATH, "//input[@type='submit' and contains(@value, 'Next')]") or \
-                      self.find_element(By.ID, "NextButton")
+            # Aplicar las respuestas pendientes y cubrir el presupuesto de la página antes de avanzar
+            self.apply_plan()
+            self.pacer.finish_page()
             
-            if next_btn and self.safe_click(next_btn):
-                print("\nAvanzando a la siguiente página...")
-                self.timed_delay(5)
+            if self.click_next("\nAvanzando a la siguiente página..."):
                 return True
             
-            if self.check_survey_completion():
-                self.get_survey_results()
-                return False
-            
             print("No se encontró botón siguiente válido")
             return False
         except Exception as e:
-            print(f"Error enviando página: {str(e)}")
+            self.log_error("Error enviando página", e)
             return False
     
-    def check_survey_completion(self):
-        """Verifica si la encuesta ha sido completada"""
-        try:
-            completion_elements = self.driver.find_elements(By.XPATH, 
-                "//*[contains(text(), 'Thank you') or contains(text(), 'Gracias') or contains(@id, 'finishIncentiveHolder')]")
-            return len(completion_elements) > 0
-        except Exception:
+    def click_next(self, message=None):
+        """Pulsa el botón Siguiente y espera la página nueva; False si no hay botón"""
+        # La página ya está lista (wait_for_page): basta una sola comprobación
+        next_btn = self.find_optional((By.XPATH, "//input[@type='submit' and contains(@value, 'Next')]"),
+                                      (By.ID, "NextButton"))
+        if not next_btn or not self.safe_click(next_btn):
             return False
+        if message:
+            print(message)
+        self.wait_for_page(next_btn)
+        return True
     
-    def check_for_errors(self):
-        """Verifica si hay mensajes de error en la página"""
+    def reload_page(self):
+        """Vuelve a cargar la página actual (como el botón Recargar del navegador) y espera a que esté lista"""
+        previous = self.find_optional((By.TAG_NAME, "html"))
         try:
-            errors = self.driver.find_elements(By.XPATH, "//*[contains(text(), 'error') or contains(@class, 'error')]")
-            if errors:
-                print("Se detectaron errores en la página")
-                return True
-        except Exception:
+            self.driver.refresh()
+        except UnexpectedAlertPresentException:
+            pass
+        try:
+            # Si la página vino de un formulario, Firefox pide confirmar el reenvío
+            self.driver.switch_to.alert.accept()
+        except NoAlertPresentException:
             pass
+        return self.wait_for_page(previous)
+    
+    def detect_state(self, probes=STATE_PROBES):
+        """Identifica el estado de la encuesta con una sola sonda dirigida"""
+        try:
+            return self.driver.execute_script(STATE_SCRIPT, probes)
+        except WebDriverException:
+            return "unknown"
+    
+    def on_ticket(self):
+        """Estado ticket: ingresa el número una sola vez; si la página vuelve, el ticket fue rechazado"""
+        if self._ticket_entered:
+            print("El número de ticket fue rechazado")
+            return False
+        self._ticket_entered = True
+        self.set_page_type("ticket")
+        if not self.enter_ticket_number():
+            print("Fallo al ingresar número de ticket")
+            return False
+        return True
+    
+    def on_questions(self):
+        """Estado de preguntas: responde la página y espera la transición tras enviarla"""
+        self.answer_page()
+        self.record_page()
+        if self.submit_page():
+            return True
+        return self.recover_page()
+    
+    def on_validation_error(self):
+        """Estado de error de validación: vuelve a responder lo marcado y reenvía; recarga si no alcanza"""
+        if self.detect_state([probe for probe in STATE_PROBES if probe[0] == "ticket"]) == "ticket":
+            return self.on_ticket()
+        self.set_page_type("rechazada")
+        recovery = self.recovery()
+        recovery["retries"] += 1
+        if recovery["retries"] > PAGE_RETRIES:
+            return self.recover_page()
+        flagged = self.plan_flagged(self.get_snapshot())
+        if flagged:
+            print(f"\nEl sitio marcó {flagged} preguntas sin responder; reintento {recovery['retries']}/{PAGE_RETRIES}")
+        else:
+            print(f"\nSe detectaron errores en la página; se responde de nuevo (reintento "
+                  f"{recovery['retries']}/{PAGE_RETRIES})")
+        return self.on_questions()
+    
+    def record_page(self):
+        """Modo de grabación: guarda la página actual y las respuestas aplicadas; avisa si la estructura es nueva"""
+        if not self.recorder:
+            return
+        try:
+            snapshot = self.get_snapshot()
+            page_type = (self.page_log[-1]["type"] if self.page_log else None) or "otra"
+            context = {"run": self.started[0].isoformat(timespec="seconds") if self.started else None,
+                       "seed": self.seed, "page": len(self.page_log), "failed": list(self._failed),
+                       "unknown_widgets": len(classify_page(snapshot)["unknown"])}
+            fingerprint, new = self.recorder.record(snapshot, self.page_source(), page_type, self._decisions, context)
+            if new:
+                print(f"\nNueva estructura de página grabada: {fingerprint} ({page_type})")
+        except Exception as e:
+            self.log_error("Error grabando la página", e)
+    
+    def recovery(self):
+        """Contadores de reintento de la página actual; empiezan de cero en cada página nueva"""
+        key = page_key(self.get_snapshot())
+        if self._recovery is None or self._recovery["key"] != key:
+            self._recovery = {"key": key, "retries": 0, "reloads": 0}
+        return self._recovery
+    
+    def recover_page(self):
+        """Recarga la página que no se pudo enviar; False cuando se agotan las recargas"""
+        recovery = self.recovery()
+        if recovery["reloads"] >= PAGE_RELOADS:
+            print("Se agotaron los reintentos de la página; se abandona la ejecución")
+            return False
+        recovery["reloads"] += 1
+        recovery["retries"] = 0
+        print(f"\nRecargando la página ({recovery['reloads']}/{PAGE_RELOADS})...")
+        return self.reload_page()
+    
+    def on_session_timeout(self):
+        """Estado de sesión por expirar: extiende la sesión y espera a que se cierre el diálogo"""
+        if self.handle_session_timeout():
+            return True
+        # Sin extenderla (p. ej. el transporte HTTP) se sigue solo si el aviso ya no tapa la página
+        return self.detect_state() != "session_timeout"
+    
+    def on_unknown(self):
+        """Estado desconocido: espera a que la página muestre algún estado reconocible"""
+        if self.wait_for_state():
+            return True
+        print("No se reconoce la página actual")
+        self.record_page()
+        return False
+    
+    def wait_for_state(self, probes=STATE_PROBES):
+        """Espera hasta PAGE_TIMEOUT, dentro de la página, a que se vea alguna de las sondas de estado"""
+        return bool(self.wait_until(("shown", [(By.CSS_SELECTOR, selector) for _, selector in probes])))
+    
+    def run_states(self):
+        """Recorre la encuesta como máquina de estados hasta la página final"""
+        state = self.detect_state()
+        for _ in range(MAX_PAGES):
+            self.state = state
+            if self.timed_out:
+                return False
+            if state == "finished":
+                self.set_page_type("final")
+                return self.get_survey_results()
+            if not getattr(self, STATE_HANDLERS[state])():
+                return False
+            state = self.detect_state()
+        print("Se alcanzó el máximo de páginas sin terminar la encuesta")
         return False
     
     def handle_session_timeout(self):
         """Maneja el diálogo de timeout de sesión si aparece"""
         try:
-            timeout_dialog = self.find_element(By.XPATH, "//div[contains(@class, 'sessionTimeoutDialog')]")
-            if timeout_dialog and timeout_dialog.is_displayed():
+            dialog = (By.XPATH, "//div[contains(@class, 'sessionTimeoutDialog')]")
+            timeout_dialog = self.find_optional(dialog)
+            if timeout_dialog:
                 extend_btn = self.find_element(By.XPATH, "//button[contains(text(), 'Extend Session')]")
                 if extend_btn:
                     self.safe_click(extend_btn)
+                    self._snapshot = None
                     print("Sesión extendida")
-                    self.timed_delay(5)
-                    return True
+                    return bool(self.wait_until(("hidden", [dialog])))
         except Exception:
             pass
         return False
     
-    def answer_open_text_questions(self):
-        """Responde preguntas abiertas en campos textarea escribiendo letra por letra, simulando escritura humana."""
+    def answer_open_text_questions(self, widgets=None):
+        """Responde preguntas abiertas en campos textarea con el modo de escritura configurado."""
         try:
-            textareas = self.driver.find_elements(By.XPATH, "//textarea[not(@disabled) and not(contains(@class, 'hidden'))]")
-            # Leer respuestas desde un archivo de texto
-            with open("respuestas.txt", "r", encoding="utf-8") as f:
-                respuestas = [line.strip() for line in f if line.strip()]
-            for textarea in textareas:
-                if textarea.is_displayed() and textarea.is_enabled():
-                    comentario = random.choice(respuestas)
-                    textarea.clear()
-                    for letra in comentario:
-                        textarea.send_keys(letra)
-                        time.sleep(random.uniform(0.05, 0.15))  # Pausa aleatoria entre letras
-                    print(f"  Comentario abierto ingresado: {comentario}")
-                    self.timed_delay(5)
+            textareas = self.widgets("open_text") if widgets is None else widgets
+            for item in textareas:
+                # El archivo solo se lee la primera vez (o si cambia) y los comentarios no se repiten
+                comentario = self.corpus.sample(COMMENT_CATEGORY)
+                self.enter_text(item["ref"], comentario, f"  Comentario abierto ingresado: {comentario}")
+                self.pacer.dwell(5)
         except Exception as e:
-            print(f"Error respondiendo pregunta abierta: {str(e)}")
+            self.log_error("Error respondiendo pregunta abierta", e)
 
-    def answer_overall_satisfaction_highly_satisfied(self):
+    def answer_overall_satisfaction_highly_satisfied(self, widgets=None):
         """
         Responde la pregunta 'Please rate your overall satisfaction...' seleccionando siempre 'Highly Satisfied'.
         """
         try:
-            # Busca la tabla con la clase HighlySatisfiedNeitherDESC
-            tables = self.driver.find_elements(By.XPATH, "//table[contains(@class, 'HighlySatisfiedNeitherDESC')]")
+            # Tablas de satisfacción con la fila de satisfacción general
+            tables = self.widgets("overall_satisfaction") if widgets is None else widgets
             for table in tables:
-                if table.is_displayed():
-                    # Busca la fila con la pregunta específica
-                    rows = table.find_elements(By.XPATH, ".//tr[contains(@id, 'FNSR')]")
-                    for row in rows:
-                        if row.is_displayed():
-                            question_element = row.find_element(By.XPATH, ".//th[@class='LeftColumn']")
-                            question_text = question_element.text.strip().lower()
-                            if "overall satisfaction" in question_text:
-                                # Selecciona el radio con value='5' (Highly Satisfied)
-                                option = row.find_element(By.XPATH, ".//input[@type='radio' and @value='5']")
-                                label = row.find_element(By.XPATH, f".//label[@for='{option.get_attribute('id')}']")
-                                if self.safe_click(label):
-                                    print("  Seleccionado: Highly Satisfied")
-                                    self.timed_delay(2)
-                                return  # Solo responde esta pregunta
+                # El clasificador solo deja las filas de satisfacción general
+                for row in table["rows"]:
+                    # Selecciona el radio con value='5' (Highly Satisfied)
+                    option = next(o for o in row["options"] if o["value"] == "5")
+                    self.queue_option(option, "  Seleccionado: Highly Satisfied")
+                    self.pacer.dwell(2)
         except Exception as e:
-            print(f"Error respondiendo pregunta de satisfacción general: {str(e)}")
+            self.log_error("Error respondiendo pregunta de satisfacción general", e)
 
     def run_survey(self):
         """Ejecuta el proceso completo de la encuesta"""
         try:
             print("="*50)
             print("INICIANDO ENCUESTA MCDVOICE")
-            print(f"Configuración: {QUESTION_DURATION} segundos por pregunta")
+            print(f"Configuración: {QUESTION_DURATION} segundos por pregunta, ritmo '{self.pacer.profile}', "
+                  f"semilla {self.seed}")
             print("="*50 + "\n")
             
             print("Cargando página inicial...")
-            self.driver.get(URL)
-            self.timed_delay(5)
+            self.start_run()
+            self.open_survey()
             
-            self.wait.until(EC.presence_of_element_located((By.ID, "CN1")))
+            self.run_states()
             
-            if not self.enter_ticket_number():
-                print("Fallo al ingresar número de ticket")
-                return
-            
-            while True:
-                self.handle_session_timeout()
-                
-                # Manejar preguntas de probabilidad específicamente
-                likelihood_tables = self.driver.find_elements(By.XPATH, "//table[contains(@class, 'HighlyLikelyDESC')]")
-                if likelihood_tables:
-                    self.answer_likelihood_questions()
-                    if not self.submit_page():
-                        break
-                    continue
-
-                
-                self.answer_open_text_questions()        # 1. Responde preguntas abiertas tipo textarea
-                self.answer_dropdown_questions()         # 2. Responde dropdowns/demográficos (suelen estar al inicio)
-                self.answer_radio_questions()            # 3. Preguntas de radio estándar (simples, suelen aparecer antes)
-                self.answer_table_questions()            # 4. Preguntas tipo tabla (Sí/No, suelen ser directas)
-                self.answer_checkbox_questions()         # 5. Selección múltiple (checkboxes, suelen estar después)
-                self.answer_problem_experience_questions() # 6. Problemas experimentados (aparecen tras preguntas generales)
-                self.answer_na_satisfaction_questions()  # 7. Satisfacción con opción N/A (depende de problemas reportados)
-                self.answer_satisfaction_scale_questions() # 8. Satisfacción escala sin N/A
-                self.answer_scale_questions()            # 9. Satisfacción escala (general)
-                self.answer_overall_satisfaction_highly_satisfied() # 10. Satisfacción general (si aplica)
-
-                if self.check_for_errors():
-                    break
-
-                if not self.submit_page():
-                    break
-
             if self.validation_code or self.survey_completion_text:
                 print("\n" + "="*50)
                 print("ENCUESTA COMPLETADA CON ÉXITO")
@@ -845,11 +1227,49 @@ class McDVoiceSurvey:
         except TimeoutException:
             print("Tiempo de espera agotado - La página no cargó correctamente")
         except Exception as e:
-            print(f"Error inesperado: {str(e)}")
+            # Con el navegador abortado por el vigilante, el comando en curso falla: no es otro error
+            if not self.timed_out:
+                self.log_error("Error inesperado", e)
         finally:
-            print("Finalizando sesión del navegador...")
-            self.timed_delay(3)
-            self.driver.quit()
+            self.close()
+            self.report_timeout()
+            self.record_run()
+    
+    def report_timeout(self):
+        """Resultado claro de una ejecución abortada por plazo"""
+        if not self.timed_out:
+            return
+        report = self.timeout_report
+        print("\n" + "="*50)
+        print("ENCUESTA ABORTADA: PLAZO " + ("DE LA PÁGINA" if self.timed_out == "page" else "DE LA EJECUCIÓN")
+              + " AGOTADO")
+        print(f"Plazo: {report['deadline_s']} s; ejecución: {report['run_s']} s; página actual: {report['page_s']} s")
+        print("="*50 + "\n")
+
+    def record_run(self):
+        """Agrega la ejecución al registro: resultado, código y duración y tipo de cada página"""
+        if not self.ledger or not self.started:
+            return
+        started, start = self.started
+        end = time.monotonic()
+        ends = [page["start"] for page in self.page_log[1:]] + [end]
+        outcome = "timeout" if self.timed_out else "completed" if self.validation_code else "error"
+        self.ledger.append({
+            "record": "run",
+            "start": started.isoformat(timespec="seconds"),
+            "end": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "duration_s": round(end - start, 3),
+            "outcome": outcome,
+            "validation_code": self.validation_code,
+            "url": self.url,
+            "transport": type(self).__name__,
+            "pacing": self.pacer.profile,
+            "seed": self.seed,
+            "errors": self.error_count,
+            "layout_cache": dict(self.layout_cache.stats) if self.layout_cache else None,
+            "pages": [{"type": page["type"] or "otra", "duration_s": round(page_end - page["start"], 3)}
+                      for page, page_end in zip(self.page_log, ends)],
+        })
 
     def run_survey_general_satisfaction(self):
         """Ejecuta solo la pregunta de satisfacción general"""
@@ -859,10 +1279,11 @@ class McDVoiceSurvey:
             print("="*50 + "\n")
             
             print("Cargando página inicial...")
-            self.driver.get(URL)
-            self.timed_delay(5)
+            self.start_run()
+            self.open_survey()
             
-            self.wait.until(EC.presence_of_element_located((By.ID, "CN1")))
+            if self.detect_state() != "ticket":
+                raise TimeoutException("No apareció la página del ticket")
             
             if not self.enter_ticket_number():
                 print("Fallo al ingresar número de ticket")
@@ -874,14 +1295,60 @@ class McDVoiceSurvey:
         except TimeoutException:
             print("Tiempo de espera agotado - La página no cargó correctamente")
         except Exception as e:
-            print(f"Error inesperado: {str(e)}")
+            if not self.timed_out:
+                self.log_error("Error inesperado", e)
         finally:
-            print("Finalizando sesión del navegador...")
-            self.timed_delay(3)
-            self.driver.quit()
+            self.close()
+            self.report_timeout()
+            self.record_run()
 
 if __name__ == "__main__":
-    survey = McDVoiceSurvey()
+    parser = argparse.ArgumentParser(description="Automatiza la encuesta de McDVoice")
+    parser.add_argument("--url", default=URL, help="Sitio de la encuesta (p. ej. el servidor de local_server.py)")
+    parser.add_argument("--pacing", default=PACING_PROFILE, help="Perfil de ritmo (ver pacing.PACING_PROFILES)")
+    parser.add_argument("--quiet", action="store_true", default=QUIET_CONSOLE, help="No mostrar la cuenta atrás")
+    parser.add_argument("--text-mode", default=TEXT_ENTRY_MODE, choices=["js", "bulk", "chunked"],
+                        help="Cómo se escriben los comentarios abiertos")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Archivo JSONL donde registrar la instrumentación")
+    parser.add_argument("--seed", type=int, default=SEED, help="Semilla para repetir exactamente las respuestas")
+    parser.add_argument("--backend", default="selenium", choices=["selenium", "http"],
+                        help="Transporte: navegador (selenium) o formularios HTTP sin navegador (http)")
+    parser.add_argument("--browser", default=BROWSER_MODE, choices=list(BROWSER_MODES),
+                        help="Modo de arranque de Firefox (ventana, headless o perfil ligero)")
+    parser.add_argument("--page-load", default=PAGE_LOAD_STRATEGY, choices=PAGE_LOAD_STRATEGIES,
+                        help="Estrategia de carga de páginas")
+    parser.add_argument("--block-tracking", action="store_true", help="Bloquear analítica y gestores de etiquetas")
+    parser.add_argument("--block-host", action="append", default=list(BLOCKED_HOSTS), metavar="HOST",
+                        help="Host adicional a bloquear (se puede repetir)")
+    parser.add_argument("--block-resource", action="append", default=list(BLOCKED_RESOURCES),
+                        choices=list(RESOURCE_PREFERENCES), help="Tipo de recurso a no cargar (se puede repetir)")
+    parser.add_argument("--page-deadline", type=float, default=PAGE_DEADLINE,
+                        help="Segundos máximos por página antes de abortar (0 = sin plazo)")
+    parser.add_argument("--run-deadline", type=float, default=RUN_DEADLINE,
+                        help="Segundos máximos de la ejecución completa (0 = sin plazo)")
+    parser.add_argument("--record", default=RECORD_DIR, metavar="DIR",
+                        help="Grabar cada página respondida en este almacén (ver fixture_store.py)")
+    parser.add_argument("--ledger", default=LEDGER_FILE,
+                        help="Registro JSONL de ejecuciones (\"\" = no registrar; ver ledger.py report)")
+    parser.add_argument("--layout-cache", default=LAYOUT_CACHE_FILE,
+                        help="Caché de estructuras de página entre ejecuciones (\"\" = sin caché; ver layout_cache.py)")
+    args = parser.parse_args()
+    
+    if args.backend == "http":
+        from http_backend import HttpSurvey
+        survey = HttpSurvey(url=args.url, pacing=args.pacing, quiet=args.quiet, text_mode=args.text_mode,
+                            trace=args.trace, seed=args.seed, page_deadline=args.page_deadline,
+                            run_deadline=args.run_deadline, ledger=args.ledger, record=args.record,
+                            layout_cache=args.layout_cache)
+    else:
+        survey = McDVoiceSurvey(url=args.url, pacing=args.pacing, quiet=args.quiet, text_mode=args.text_mode,
+                                trace=args.trace, browser=args.browser, page_load=args.page_load,
+                                blocked_hosts=args.block_host + (TRACKING_HOSTS if args.block_tracking else []),
+                                blocked_resources=args.block_resource, seed=args.seed,
+                                page_deadline=args.page_deadline, run_deadline=args.run_deadline,
+                                ledger=args.ledger, record=args.record, layout_cache=args.layout_cache)
     survey.run_survey()
+    # Código de salida distinto para una ejecución abortada por plazo
+    sys.exit(2 if survey.timed_out else 0)
 
 
@@ -0,0 +1,82 @@
+"""Control del ritmo de la encuesta con presupuestos de tiempo por página.
+
+En lugar de dormir después de cada pregunta, los manejadores solo anotan
+cuánto tiempo "merece" cada pregunta. Antes de enviar la página se duerme
+una sola vez lo que falte para cubrir ese presupuesto, descontando el
+tiempo que ya se gastó respondiendo.
+"""
+import math
+import threading
+import time
+
+# Perfiles de ritmo disponibles:
+#   question_scale: factor aplicado al tiempo que pide cada pregunta
+#   min_page: permanencia mínima por página en segundos
+#   pause_scale: factor aplicado a las pausas fijas (campos del ticket, cierre)
+PACING_PROFILES = {
+    # Mismos tiempos que el bot ha usado siempre
+    "actual": {"question_scale": 1.0, "min_page": 0, "pause_scale": 1.0},
+    # Solo la permanencia mínima por página, sin tiempo extra por pregunta
+    "minimo_seguro": {"question_scale": 0.0, "min_page": 5, "pause_scale": 0.0},
+    # Sin pausas deliberadas (pruebas y mediciones)
+    "sin_pausas": {"question_scale": 0.0, "min_page": 0, "pause_scale": 0.0},
+}
+
+
+class Pacer:
+    def __init__(self, profile="actual", quiet=False, min_page=None):
+        if profile not in PACING_PROFILES:
+            raise ValueError(f"Perfil de ritmo desconocido: {profile}")
+        settings = PACING_PROFILES[profile]
+        self.profile = profile
+        self.quiet = quiet
+        self.question_scale = settings["question_scale"]
+        self.pause_scale = settings["pause_scale"]
+        self.min_page = settings["min_page"] if min_page is None else min_page
+        self.slept = 0.0  # Segundos dormidos deliberadamente en toda la ejecución
+        self._cancel = threading.Event()
+        self.start_page()
+
+    def start_page(self):
+        """Reinicia el presupuesto al llegar a una página nueva"""
+        self.page_start = time.monotonic()
+        self.budget = 0.0
+
+    def dwell(self, seconds):
+        """Anota el tiempo que merece una pregunta sin dormir todavía"""
+        self.budget += seconds * self.question_scale
+
+    def remaining(self):
+        """Segundos que faltan para cubrir el presupuesto de la página actual"""
+        target = max(self.min_page, self.budget)
+        return max(0.0, target - (time.monotonic() - self.page_start))
+
+    def finish_page(self):
+        """Duerme una sola vez lo que falte del presupuesto antes de enviar la página"""
+        self.sleep(self.remaining(), "Tiempo restante en esta página")
+        self.start_page()
+
+    def pause(self, seconds, label="Pausa"):
+        """Pausa fija inmediata, escalada según el perfil"""
+        self.sleep(seconds * self.pause_scale, label)
+
+    def cancel(self):
+        """Corta la pausa en curso y anula las siguientes (ejecución abortada); se puede llamar desde otro hilo"""
+        self._cancel.set()
+
+    def sleep(self, seconds, label="Tiempo restante"):
+        """Duerme con reloj monotónico; muestra la cuenta atrás salvo en modo silencioso o sin etiqueta"""
+        if seconds <= 0 or self._cancel.is_set():
+            return
+        end = time.monotonic() + seconds
+        if self.quiet or label is None:
+            self._cancel.wait(seconds)
+        else:
+            while not self._cancel.is_set():
+                left = end - time.monotonic()
+                if left <= 0:
+                    break
+                print(f"\r{label}: {math.ceil(left)} segundos ", end="")
+                self._cancel.wait(min(1.0, left))
+            print()  # Salto de línea al finalizar
+        self.slept += seconds - max(0.0, end - time.monotonic())
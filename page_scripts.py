@@ -0,0 +1,447 @@
+"""Scripts JavaScript que se ejecutan dentro de la página de la encuesta.
+
+Cada script se envía con una sola llamada a execute_script (las esperas,
+con execute_async_script), de modo que el bot obtiene o modifica toda la
+página en un único viaje al geckodriver en lugar de recorrer el DOM
+elemento por elemento.
+"""
+
+# Devuelve una descripción JSON de todas las preguntas visibles de la página.
+# Cada elemento accionable lleva un "ref": un selector CSS que lo localiza de
+# nuevo (#id cuando existe, label[for] para una etiqueta única de un control,
+# o un atributo data-mcdv asignado aquí). Los dos primeros valen también en
+# otra carga de la misma página (ver layout_cache.py). Recibe el
+# selector de las marcas de error del sitio: cada pregunta lleva "flagged" si
+# está dentro de una marca o contiene alguna.
+SNAPSHOT_SCRIPT = r"""
+var seq = window.__mcdvSeq || 0;
+var flaggedSelector = arguments[0] || null;
+
+function ref(el) {
+    if (!el) return null;
+    if (el.id) return '#' + CSS.escape(el.id);
+    if (el.tagName === 'LABEL' && el.htmlFor) {
+        var byFor = 'label[for="' + CSS.escape(el.htmlFor) + '"]';
+        if (document.querySelectorAll(byFor).length === 1) return byFor;
+    }
+    var r = el.getAttribute('data-mcdv');
+    if (!r) {
+        r = 'r' + (++seq);
+        el.setAttribute('data-mcdv', r);
+    }
+    return '[data-mcdv="' + r + '"]';
+}
+
+function visible(el) {
+    if (!el) return false;
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return false;
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+
+function text(el) {
+    return el ? (el.innerText || el.textContent || '').trim() : '';
+}
+
+function flagged(el) {
+    if (!el || !flaggedSelector) return false;
+    return !!(el.closest(flaggedSelector) || el.querySelector(flaggedSelector));
+}
+
+function labelFor(id, scope) {
+    if (!id) return null;
+    return (scope || document).querySelector('label[for="' + CSS.escape(id) + '"]');
+}
+
+function header(input) {
+    var ids = (input.getAttribute('aria-labelledby') || '').trim();
+    if (!ids) return '';
+    return text(document.getElementById(ids.split(/\s+/)[0]));
+}
+
+function option(input, scope) {
+    var label = labelFor(input.id, scope);
+    return {
+        ref: ref(input),
+        id: input.id || '',
+        name: input.name || '',
+        value: input.value,
+        type: input.type,
+        checked: input.checked,
+        label_ref: ref(label),
+        label: text(label),
+        header: header(input)
+    };
+}
+
+function radios(scope, labelScope, selector) {
+    return Array.prototype.filter.call(
+        scope.querySelectorAll(selector || 'input[type="radio"]'), visible
+    ).map(function (input) { return option(input, labelScope); });
+}
+
+var tables = [];
+Array.prototype.forEach.call(document.querySelectorAll('table'), function (table) {
+    if (!visible(table) || !table.querySelector('input[type="radio"]')) return;
+    var rows = [];
+    Array.prototype.forEach.call(table.querySelectorAll('tbody tr[id*="FNSR"]'), function (row) {
+        if (!visible(row)) return;
+        rows.push({
+            ref: ref(row),
+            id: row.id,
+            text: text(row.querySelector('th[class="LeftColumn"]')),
+            options: radios(row, row),
+            flagged: flagged(row)
+        });
+    });
+    tables.push({
+        ref: ref(table),
+        id: table.id || '',
+        classes: table.className || '',
+        caption: text(table.querySelector('caption h2')),
+        text: text(table.querySelector('th[class="LeftColumn"]')),
+        has_na: !!table.querySelector('th[id*="HighlySatisfiedNeitherDESC9"]'),
+        rows: rows,
+        options: radios(table, table),
+        flagged: flagged(table)
+    });
+});
+
+var fieldsets = [];
+Array.prototype.forEach.call(document.querySelectorAll('fieldset'), function (fieldset) {
+    if (!visible(fieldset)) return;
+    var choices = Array.prototype.map.call(
+        fieldset.querySelectorAll('div[class*="cataOption"]'), function (div) {
+            var checkbox = div.querySelector('input[type="checkbox"]');
+            var label = div.querySelector('label');
+            return {
+                ref: ref(checkbox),
+                id: checkbox ? checkbox.id : '',
+                name: checkbox ? checkbox.name : '',
+                value: checkbox ? checkbox.value : '',
+                type: 'checkbox',
+                checked: checkbox ? checkbox.checked : false,
+                label_ref: ref(label),
+                label: text(label),
+                header: ''
+            };
+        });
+    var otherLabel = Array.prototype.filter.call(fieldset.querySelectorAll('label'), function (label) {
+        return (label.textContent || '').indexOf('Other') !== -1;
+    })[0];
+    var otherInput = fieldset.querySelector('input[type="text"]');
+    fieldsets.push({
+        ref: ref(fieldset),
+        id: fieldset.id || '',
+        classes: fieldset.className || '',
+        legend: text(fieldset.querySelector('legend')),
+        in_table: !!fieldset.closest('table'),
+        options: radios(fieldset, document, 'input[type="radio"][name]'),
+        choices: choices,
+        other_visible: visible(otherLabel),
+        other_input: (visible(otherInput) && !otherInput.disabled) ? ref(otherInput) : null,
+        flagged: flagged(fieldset)
+    });
+});
+
+var selects = [];
+Array.prototype.forEach.call(document.querySelectorAll('select'), function (select) {
+    if ((select.className || '').indexOf('hidden') !== -1) return;
+    if (select.getAttribute('aria-hidden') === 'true' || !visible(select)) return;
+    selects.push({
+        ref: ref(select),
+        id: select.id || '',
+        label: text(labelFor(select.id)),
+        options: Array.prototype.map.call(select.options, function (opt) {
+            return {value: opt.getAttribute('value') || '', text: (opt.text || '').trim()};
+        }),
+        flagged: flagged(select)
+    });
+});
+
+var textareas = [];
+Array.prototype.forEach.call(document.querySelectorAll('textarea'), function (textarea) {
+    if (textarea.disabled || (textarea.className || '').indexOf('hidden') !== -1) return;
+    if (!visible(textarea)) return;
+    textareas.push({ref: ref(textarea), id: textarea.id || '', flagged: flagged(textarea)});
+});
+
+window.__mcdvSeq = seq;
+return {
+    url: window.location.href,
+    tables: tables,
+    fieldsets: fieldsets,
+    selects: selects,
+    textareas: textareas
+};
+"""
+
+# Estructura de la página con una llamada barata: los mismos widgets visibles
+# que SNAPSHOT_SCRIPT, pero solo sus ids, clases, si tienen N/A y cuántas
+# opciones tienen (ver fixture_store.layout_structure).
+LAYOUT_SCRIPT = r"""
+function visible(el) {
+    if (!el) return false;
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return false;
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+
+function countVisible(scope, selector) {
+    return Array.prototype.filter.call(scope.querySelectorAll(selector), visible).length;
+}
+
+var layout = {rows: [], tables: [], fieldsets: [], selects: [], textareas: [], other_inputs: 0};
+Array.prototype.forEach.call(document.querySelectorAll('table'), function (table) {
+    if (!visible(table) || !table.querySelector('input[type="radio"]')) return;
+    var hasNa = !!table.querySelector('th[id*="HighlySatisfiedNeitherDESC9"]');
+    layout.tables.push([table.className || '', hasNa ? 'na' : '', countVisible(table, 'input[type="radio"]')].join('|'));
+    Array.prototype.forEach.call(table.querySelectorAll('tbody tr[id*="FNSR"]'), function (row) {
+        if (visible(row)) layout.rows.push(row.id);
+    });
+});
+Array.prototype.forEach.call(document.querySelectorAll('fieldset'), function (fieldset) {
+    if (!visible(fieldset)) return;
+    var options = countVisible(fieldset, 'input[type="radio"][name]')
+        + fieldset.querySelectorAll('div[class*="cataOption"]').length;
+    layout.fieldsets.push([fieldset.className || '', fieldset.id || '', options].join('|'));
+    var other = fieldset.querySelector('input[type="text"]');
+    if (visible(other) && !other.disabled) layout.other_inputs++;
+});
+Array.prototype.forEach.call(document.querySelectorAll('select'), function (select) {
+    if ((select.className || '').indexOf('hidden') !== -1) return;
+    if (select.getAttribute('aria-hidden') === 'true' || !visible(select)) return;
+    layout.selects.push(select.id || '');
+});
+Array.prototype.forEach.call(document.querySelectorAll('textarea'), function (textarea) {
+    if (textarea.disabled || (textarea.className || '').indexOf('hidden') !== -1) return;
+    if (visible(textarea)) layout.textareas.push(textarea.id || '');
+});
+return layout;
+"""
+
+# Aplica de una vez todas las respuestas de la página. Recibe una lista de
+# acciones {ref, action, value} y devuelve, para cada una, si se aplicó y el
+# texto que muestra la página para la opción elegida.
+APPLY_PLAN_SCRIPT = r"""
+function fire(el, type) {
+    el.dispatchEvent(new Event(type, {bubbles: true}));
+}
+
+function text(el) {
+    return el ? (el.innerText || el.textContent || '').trim() : '';
+}
+
+function describe(el, input) {
+    var ids = input ? (input.getAttribute('aria-labelledby') || '').trim() : '';
+    var label = el.tagName === 'LABEL' ? el : (input && input.labels && input.labels[0]);
+    return {
+        ok: true,
+        error: '',
+        value: input ? input.value : '',
+        label: text(label),
+        header: ids ? text(document.getElementById(ids.split(/\s+/)[0])) : '',
+        text: text(label)
+    };
+}
+
+return arguments[0].map(function (item) {
+    var el = document.querySelector(item.ref);
+    if (!el) return {ok: false, error: 'elemento no encontrado'};
+    try {
+        if (item.action === 'select') {
+            el.value = item.value;
+            if (el.value !== item.value) return {ok: false, error: 'valor no disponible'};
+            fire(el, 'input');
+            fire(el, 'change');
+            var result = describe(el, null);
+            result.value = el.value;
+            result.text = el.selectedIndex >= 0 ? (el.options[el.selectedIndex].text || '').trim() : '';
+            return result;
+        }
+        if (item.action === 'text') {
+            el.focus();
+            el.value = item.value;
+            fire(el, 'input');
+            fire(el, 'keyup');
+            fire(el, 'change');
+            el.blur();
+            var typed = describe(el, el);
+            typed.text = el.value;
+            return typed;
+        }
+        var input = el.tagName === 'LABEL' ? (el.control || document.getElementById(el.htmlFor)) : el;
+        // 'check' solo marca la casilla si aún no lo está; 'click' siempre hace clic
+        if (item.action !== 'check' || !input || !input.checked) el.click();
+        return describe(el, input);
+    } catch (e) {
+        return {ok: false, error: String(e)};
+    }
+});
+"""
+
+# Espera dentro de la página (con execute_async_script) a que se cumplan
+# todas las condiciones de arguments[0], o hasta arguments[1] milisegundos.
+# Un MutationObserver vuelve a comprobarlas en cuanto cambia el DOM, así que
+# la espera termina en milisegundos y cuesta un solo comando. Condiciones:
+#   ["visible", localizadores]  algún elemento visible y habilitado
+#   ["shown", localizadores]    algún elemento visible, aunque esté deshabilitado (como STATE_SCRIPT)
+#   ["present", localizadores]  algún elemento en el documento
+#   ["hidden", localizadores]   ningún elemento visible
+#   ["detached", elemento]      el elemento ya no está en el documento
+#   ["ready", eager]            documento cargado (analizado si eager)
+# Los localizadores son [estrategia, valor] como en FIND_SCRIPT. Devuelve el
+# elemento de la primera condición "visible", "shown" o "present" (true si no hay
+# ninguna), o false si se agota el tiempo.
+WAIT_SCRIPT = r"""
+var conditions = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+
+function visible(el) {
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden') return false;
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+
+function candidates(by, value) {
+    if (by === 'id') {
+        var el = document.getElementById(value);
+        return el ? [el] : [];
+    }
+    if (by === 'css selector') return Array.prototype.slice.call(document.querySelectorAll(value));
+    if (by === 'xpath') {
+        var found = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < found.snapshotLength; i++) nodes.push(found.snapshotItem(i));
+        return nodes;
+    }
+    throw new Error('Estrategia de búsqueda no soportada: ' + by);
+}
+
+function usable(el) {
+    return visible(el) && !el.disabled;
+}
+
+function find(locators, accept) {
+    for (var i = 0; i < locators.length; i++) {
+        var nodes = candidates(locators[i][0], locators[i][1]);
+        for (var j = 0; j < nodes.length; j++) {
+            if (!accept || accept(nodes[j])) return nodes[j];
+        }
+    }
+    return null;
+}
+
+function holds(condition) {
+    var kind = condition[0], target = condition[1];
+    if (kind === 'ready') {
+        var state = document.readyState;
+        return state === 'complete' || (!!target && state === 'interactive');
+    }
+    if (kind === 'detached') return !target || !target.isConnected;
+    if (kind === 'present') return find(target, null);
+    if (kind === 'visible') return find(target, usable);
+    if (kind === 'shown') return find(target, visible);
+    if (kind === 'hidden') {
+        for (var i = 0; i < target.length; i++) {
+            var nodes = candidates(target[i][0], target[i][1]);
+            for (var j = 0; j < nodes.length; j++) {
+                if (visible(nodes[j])) return false;
+            }
+        }
+        return true;
+    }
+    throw new Error('Condición de espera desconocida: ' + kind);
+}
+
+function check() {
+    var found = null;
+    for (var i = 0; i < conditions.length; i++) {
+        var result = holds(conditions[i]);
+        if (!result) return null;
+        if (found === null && result !== true) found = result;
+    }
+    return found || true;
+}
+
+var initial = check();
+if (initial) {
+    done(initial);
+    return;
+}
+
+var finished = false, observer, backstop, timer;
+function finish(value) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearInterval(backstop);
+    clearTimeout(timer);
+    document.removeEventListener('readystatechange', changed);
+    done(value);
+}
+function changed() {
+    var result = check();
+    if (result) finish(result);
+}
+
+observer = new MutationObserver(changed);
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+document.addEventListener('readystatechange', changed);
+// Cambios de visibilidad que no tocan el DOM (hojas de estilo, transiciones)
+backstop = setInterval(changed, 250);
+timer = setTimeout(function () { finish(check() || false); }, timeout);
+"""
+
+# Prueba varios localizadores alternativos ([estrategia, valor]) en una sola
+# llamada y devuelve el primer elemento visible y habilitado, o null.
+FIND_SCRIPT = r"""
+function visible(el) {
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden') return false;
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+
+function candidates(by, value) {
+    if (by === 'id') {
+        var el = document.getElementById(value);
+        return el ? [el] : [];
+    }
+    if (by === 'css selector') return Array.prototype.slice.call(document.querySelectorAll(value));
+    if (by === 'xpath') {
+        var found = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < found.snapshotLength; i++) nodes.push(found.snapshotItem(i));
+        return nodes;
+    }
+    throw new Error('Estrategia de búsqueda no soportada: ' + by);
+}
+
+var locators = arguments[0];
+for (var i = 0; i < locators.length; i++) {
+    var nodes = candidates(locators[i][0], locators[i][1]);
+    for (var j = 0; j < nodes.length; j++) {
+        if (visible(nodes[j]) && !nodes[j].disabled) return nodes[j];
+    }
+}
+return null;
+"""
+
+# Identifica el estado de la encuesta con una sola sonda: recibe una lista
+# ordenada de [estado, selector CSS] y devuelve el primer estado cuyo
+# selector coincide con un elemento visible, o 'unknown'.
+STATE_SCRIPT = r"""
+function visible(el) {
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden') return false;
+    return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+}
+
+var probes = arguments[0];
+for (var i = 0; i < probes.length; i++) {
+    var nodes = document.querySelectorAll(probes[i][1]);
+    for (var j = 0; j < nodes.length; j++) {
+        if (visible(nodes[j])) return probes[i][0];
+    }
+}
+return 'unknown';
+"""
@@ -0,0 +1,108 @@
+"""Política de respuestas: reglas palabra clave -> distribución, compiladas una vez.
+
+El archivo de políticas (politicas.json) tiene, por tipo de pregunta, una
+lista ordenada de reglas y unos valores por defecto:
+
+    "scale": {
+      "rules": [{"keywords": ["shake"], "weights": [0.70, 0.20, 0.07, 0.02, 0.01]}, ...],
+      "default": {"weights": [0.60, 0.25, 0.10, 0.04, 0.01]}
+    }
+
+Todas las reglas de un tipo se compilan una vez en una sola expresión
+regular sin distinguir mayúsculas: una alternativa por regla, en orden del
+archivo, cada una un lookahead que busca sus palabras en todo el texto.
+Una búsqueda (un solo match) devuelve así la primera regla del archivo con
+alguna palabra presente, combinada con los valores por defecto, aunque sus
+palabras se solapen con las de otra regla ("fast" dentro de "breakfast")
+o aparezcan después en el texto. Las listas "prefer" (opciones preferidas
+por etiqueta) se compilan en una alternación simple.
+"""
+import json
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _keyword_regex(words):
+    """Una expresión que encuentra cualquiera de las palabras (None si no hay ninguna)"""
+    if not words:
+        return None
+    return re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def _rules_regex(groups):
+    """Una expresión con una alternativa por lista de palabras: ^(?:(?=.*?(?P<k0>a|b))|(?=.*?(?P<k1>c))...).
+    Las alternativas se prueban en orden y cada lookahead mira todo el texto, así que el grupo que coincide
+    es el de la primera lista con alguna palabra presente"""
+    alternatives = [f"(?=.*?(?P<k{i}>{'|'.join(re.escape(word) for word in words)}))"
+                    for i, words in enumerate(groups) if words]
+    if not alternatives:
+        return None
+    return re.compile(f"(?:{'|'.join(alternatives)})", re.IGNORECASE | re.DOTALL)
+
+
+def fit_weights(weights, count):
+    """Ajusta una distribución a count opciones: recorta o rellena con el peso mínimo; uniforme si queda en cero"""
+    if len(weights) > count:
+        fitted = list(weights[:count])
+    else:
+        fitted = list(weights) + [min(weights, default=0)] * (count - len(weights))
+    if not any(fitted):
+        fitted = [1] * count
+    return fitted
+
+
+class AnswerPolicy:
+    def __init__(self, policies):
+        # policies: {tipo: {"rules": [...], "default": {...}}}
+        self._kinds = {}
+        for kind, policy in policies.items():
+            default = dict(policy.get("default", {}))
+            rules = [dict(default, **{k: v for k, v in rule.items() if k != "keywords"})
+                     for rule in policy.get("rules", [])]
+            self._kinds[kind] = {
+                "matcher": _rules_regex([rule.get("keywords", []) for rule in policy.get("rules", [])]),
+                "rules": rules,
+                "default": default,
+            }
+        # Listas de opciones preferidas ("prefer", "serious_prefer"...) compiladas de antemano
+        self._prefer = {}
+        for compiled in self._kinds.values():
+            for rule in compiled["rules"] + [compiled["default"]]:
+                for key, words in rule.items():
+                    if key.endswith("prefer") and tuple(words) not in self._prefer:
+                        self._prefer[tuple(words)] = _keyword_regex(words)
+
+    @classmethod
+    def load(cls, path):
+        """Lee un archivo de políticas (las rutas relativas se resuelven junto a este módulo)"""
+        with open(os.path.join(BASE_DIR, path), "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def rule(self, kind, text=""):
+        """Regla que corresponde a un texto de pregunta (o los valores por defecto del tipo)"""
+        if kind not in self._kinds:
+            raise KeyError(f"Tipo de pregunta sin política: {kind}")
+        compiled = self._kinds[kind]
+        if compiled["matcher"] and text:
+            # Un solo match al principio del texto: la primera alternativa que se cumple es la regla
+            match = compiled["matcher"].match(text)
+            if match:
+                return compiled["rules"][int(match.lastgroup[1:])]
+        return compiled["default"]
+
+    def weights(self, kind, text, count, key="weights"):
+        """Distribución para count opciones y si coincide exactamente con la de la política"""
+        weights = self.rule(kind, text)[key]
+        return fit_weights(weights, count), len(weights) == count
+
+    def preferred(self, rule, key, options):
+        """Opciones cuya etiqueta contiene alguna de las palabras de rule[key]"""
+        words = tuple(rule.get(key) or ())
+        if words not in self._prefer:
+            self._prefer[words] = _keyword_regex(words)
+        matcher = self._prefer[words]
+        if matcher is None:
+            return []
+        return [option for option in options if matcher.search(option["label"])]
@@ -0,0 +1,82 @@
+import contextlib
+import io
+
+import pytest
+
+from fake_driver import FakeDriver
+from html_page import HtmlPage
+from http_backend import HttpSurvey
+from local_server import VALIDATION_CODE, SurveyServer
+from mc2 import TRANSPORT_METHODS, McDVoiceSurvey
+
+OPTIONS = dict(pacing="sin_pausas", quiet=True, trace=None, seed=7, ledger=None, record=None, layout_cache=None)
+
+
+def run_local(factory):
+    """Recorre la encuesta local con el transporte que crea factory(url); devuelve (encuesta, envíos)"""
+    server = SurveyServer()
+    url = server.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            survey = factory(url)
+            survey.run_survey()
+    finally:
+        server.stop()
+    return survey, server.submissions
+
+
+def test_http_and_selenium_backends_submit_the_same_answers():
+    http_survey, http_submissions = run_local(lambda url: HttpSurvey(url=url, **OPTIONS))
+    fake_survey, fake_submissions = run_local(lambda url: McDVoiceSurvey(url=url, driver=FakeDriver(), **OPTIONS))
+
+    assert http_survey.validation_code == VALIDATION_CODE
+    assert fake_survey.validation_code == VALIDATION_CODE
+    assert [missing for _, _, missing in http_submissions if missing] == []
+    assert http_submissions == fake_submissions
+
+
+def test_http_backend_implements_every_transport_method():
+    for name in TRANSPORT_METHODS:
+        assert getattr(HttpSurvey, name) is not getattr(McDVoiceSurvey, name), name
+
+
+def test_partial_transport_is_rejected():
+    with pytest.raises(TypeError, match="fetch_snapshot"):
+        class PartialSurvey(McDVoiceSurvey, transport=True):
+            def open_survey(self):
+                pass
+
+
+class RecordingSession:
+    """Sesión HTTP que anota las peticiones en lugar de enviarlas"""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, fields=None):
+        self.requests.append((method, url))
+        return 200, url, ""
+
+
+def http_survey_on(dialog):
+    session = RecordingSession()
+    survey = HttpSurvey(session=session, **OPTIONS)
+    survey.page = HtmlPage(f'<div class="sessionTimeoutDialog">{dialog}</div><input type="submit" id="NextButton">',
+                           "http://127.0.0.1:1/Survey.aspx")
+    return survey, session
+
+
+def test_http_session_dialog_without_a_request_is_not_reported_as_extended(capsys):
+    survey, session = http_survey_on('<button onclick="this.parentNode.style.display=\'none\'">Extend Session</button>')
+    assert survey.handle_session_timeout() is False
+    assert "Sesión extendida" not in capsys.readouterr().out
+    assert session.requests == []
+    # El aviso ya no tapa la página: la ejecución sigue con las preguntas
+    assert survey.on_session_timeout()
+    assert survey.detect_state() == "questions"
+
+
+def test_http_session_dialog_link_is_requested():
+    survey, session = http_survey_on('<a href="/ExtendSession.aspx">Extend Session</a>')
+    assert survey.handle_session_timeout() is True
+    assert session.requests == [("GET", "http://127.0.0.1:1/ExtendSession.aspx")]
@@ -0,0 +1,79 @@
+import json
+import threading
+from urllib.request import Request, urlopen
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from daemon import CLEAR_PATH, SurveyDaemon, WarmBrowser, url_origin
+
+
+class BrokenBrowser(WarmBrowser):
+    """Firefox que no arranca (geckodriver ausente, perfil dañado...)"""
+
+    def start(self):
+        self.starts += 1
+        raise WebDriverException("geckodriver no encontrado")
+
+
+class RecordingDriver:
+    """Driver mínimo que anota en qué origen se borraron las cookies"""
+
+    def __init__(self, url):
+        self.current_url = url
+        self.visited = []
+        self.cleared = []
+
+    def get(self, url):
+        self.visited.append(url)
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        return None
+
+    def delete_all_cookies(self):
+        self.cleared.append(url_origin(self.current_url))
+
+
+@pytest.fixture
+def daemon():
+    server = SurveyDaemon(BrokenBrowser(), port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def post(server, path, payload):
+    host, port = server.server_address[:2]
+    request = Request(f"http://{host}:{port}{path}", data=json.dumps(payload).encode("utf-8"),
+                      headers={"Content-Type": "application/json"})
+    with urlopen(request) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def test_browser_start_failure_is_a_structured_error(daemon):
+    result = post(daemon, "/run", {"url": "http://127.0.0.1:9"})
+    assert result["completed"] is False
+    assert "geckodriver no encontrado" in result["error"]
+    # El demonio sigue atendiendo y vuelve a intentar el arranque en la siguiente ejecución
+    assert post(daemon, "/run", {})["completed"] is False
+    assert daemon.browser.starts == 2
+    assert daemon.runs == 0
+
+
+def test_reset_clears_every_visited_origin():
+    browser = WarmBrowser()
+    driver = browser.driver = RecordingDriver("https://survey.example/Finish.aspx")
+    browser.reset(["https://www.mcdvoice.com/", "https://www.mcdvoice.com/Survey.aspx?c=1",
+                   "https://survey.example/Survey.aspx", None, "about:blank"])
+    assert driver.cleared == ["https://survey.example", "https://www.mcdvoice.com"]
+    assert driver.visited == ["https://www.mcdvoice.com" + CLEAR_PATH, "about:blank"]
+
+
+def test_url_origin():
+    assert url_origin("https://www.mcdvoice.com:8443/a?b=c") == "https://www.mcdvoice.com:8443"
+    assert url_origin("about:blank") is None
+    assert url_origin(None) is None
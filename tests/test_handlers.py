@@ -0,0 +1,122 @@
+import contextlib
+import io
+import random
+import re
+
+import pytest
+
+from fake_driver import answer_fixture, page_problems
+from html_page import HtmlPage
+from local_server import FIXTURES_DIR, load_pages, render_page
+from mc2 import WIDGET_HANDLERS, McDVoiceSurvey, classify_page
+
+# Comandos WebDriver por página: lectura, aplicación, relectura, estado, espera y envío
+MAX_PAGE_COMMANDS = 6
+SEEDS = random.Random(0).sample(range(2**32), 25)
+
+PAGES = {page["name"]: page for page in load_pages(FIXTURES_DIR)}
+NAMES = list(PAGES)
+
+
+def fixture_html(name):
+    return render_page([PAGES[name] for name in NAMES], NAMES.index(name))
+
+
+def single_row_satisfaction():
+    """La tabla de satisfacción de 02 con una sola fila: la única forma de satisfaction_scale"""
+    page = dict(PAGES["02_satisfaction"])
+    page["content"] = re.sub(r'<tr id="FNSR00020[2-5]".*?</tr>', "", page["content"], flags=re.S)
+    page["required"] = ["R000201"]
+    return render_page([page, PAGES[NAMES[-1]]], 0), page["required"]
+
+
+def sparse_checkboxes():
+    """03_experience con una sola casilla de problemas y un grupo de selección múltiple sin opciones"""
+    page = dict(PAGES["03_experience"])
+    choice = r'\s*<div class="cataOption">\s*<input type="checkbox" id="{}".*?</div>'
+    content = re.sub(choice.format(r"R000302\.\d+"), "", page["content"], flags=re.S)
+    page["content"] = re.sub(choice.format(r'R000303\.(?!1")\d+'), "", content, flags=re.S)
+    return render_page([page, PAGES[NAMES[-1]]], 0), page["required"] + ["R000303"]
+
+
+# Página que ejercita cada manejador: (html, respuestas obligatorias)
+HANDLER_PAGES = {
+    "open_text": "06_comments",
+    "dropdown": "06_comments",
+    "radio": "01_overall",
+    "table": "03_experience",
+    "checkbox": "03_experience",
+    "problem_experience": "03_experience",
+    "na_satisfaction": "04_resolution",
+    "satisfaction_scale": single_row_satisfaction,
+    "scale": "02_satisfaction",
+    "overall_satisfaction": "01_overall",
+    "likelihood": "05_likelihood",
+}
+
+
+def handler_page(kind):
+    source = HANDLER_PAGES[kind]
+    if callable(source):
+        return source()
+    return fixture_html(source), PAGES[source]["required"]
+
+
+def answer(html, seed, handler=None):
+    """Responde una página sobre FakeDriver; devuelve (encuesta, driver, veces que se llamó al manejador)"""
+    calls = []
+    if handler is not None:
+        original = getattr(McDVoiceSurvey, handler)
+
+        def spy(self, widgets):
+            calls.append(len(widgets))
+            return original(self, widgets)
+
+        patch = pytest.MonkeyPatch()
+        patch.setattr(McDVoiceSurvey, handler, spy)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            survey, driver = answer_fixture(html, seed)
+    finally:
+        if handler is not None:
+            patch.undo()
+    return survey, driver, calls
+
+
+def test_every_handler_has_a_page():
+    assert set(HANDLER_PAGES) == {kind for kind, _ in WIDGET_HANDLERS}
+
+
+@pytest.mark.parametrize("kind,handler", WIDGET_HANDLERS)
+def test_handler_answers_its_page(kind, handler):
+    html, required = handler_page(kind)
+    assert classify_page(HtmlPage(html).snapshot())[kind], f"la página no tiene widgets {kind}"
+    for seed in SEEDS:
+        survey, driver, calls = answer(html, seed, handler)
+        assert calls, f"{handler} no se llamó (semilla {seed})"
+        assert page_problems(survey, driver, required, MAX_PAGE_COMMANDS) == [], f"semilla {seed}"
+
+
+@pytest.mark.parametrize("name", NAMES[1:-1])
+def test_fixture_page_commands(name):
+    """Toda la página se lee, responde y envía con scripts: ni búsquedas ni clics elemento a elemento"""
+    survey, driver, _ = answer(fixture_html(name), SEEDS[0])
+    assert sum(driver.commands.values()) <= MAX_PAGE_COMMANDS
+    assert set(driver.commands) <= {"w3cExecuteScript", "w3cExecuteScriptAsync"}, dict(driver.commands)
+    assert len(driver.submissions) == 1
+
+
+def test_checkbox_groups_with_fewer_options_than_the_policy_asks_for():
+    html, required = sparse_checkboxes()
+    snapshot = HtmlPage(html).snapshot()
+    assert [len(fieldset["choices"]) for fieldset in snapshot["fieldsets"]] == [0, 1]
+    for seed in SEEDS:
+        survey, driver, _ = answer(html, seed)
+        assert page_problems(survey, driver, required, MAX_PAGE_COMMANDS) == [], f"semilla {seed}"
+
+
+def test_same_seed_same_submission():
+    html = fixture_html("03_experience")
+    first = answer(html, SEEDS[0])[1].submissions
+    second = answer(html, SEEDS[0])[1].submissions
+    assert first == second
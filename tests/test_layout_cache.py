@@ -0,0 +1,105 @@
+import contextlib
+import io
+import re
+
+from fake_driver import FakeDriver, missing_answers
+from fixture_store import layout_fingerprint, structure_fingerprint
+from html_page import HtmlPage
+from layout_cache import LayoutCache, widget_identity
+from local_server import FIXTURES_DIR, load_pages, render_page
+from mc2 import McDVoiceSurvey
+
+PAGES = {page["name"]: page for page in load_pages(FIXTURES_DIR)}
+
+# Pregunta condicional que el sitio muestra después de responder, delante de las demás y sin id en su fieldset
+CONDITIONAL = """
+<fieldset class="inputtyperblv" style="display:none">
+  <legend>Did you order at the drive-thru?</legend>
+  <input type="radio" id="R000304.1" name="R000304" value="1"><label for="R000304.1">Yes</label>
+  <input type="radio" id="R000304.2" name="R000304" value="2"><label for="R000304.2">No</label>
+</fieldset>
+"""
+
+
+def conditional_page():
+    """03_experience con fieldsets sin id (sus refs son data-mcdv) y una pregunta condicional oculta delante"""
+    page = dict(PAGES["03_experience"])
+    content = re.sub(r'(<fieldset class="inputtypeopt") id="[^"]*"', r"\1", page["content"])
+    page["content"] = content.replace("<fieldset", CONDITIONAL + "<fieldset", 1)
+    return render_page([page, PAGES["99_finish"]], 0), page["required"] + ["R000304"]
+
+
+def run(html, cache, seed, reveal=False):
+    """Responde y envía la página con la caché; con reveal, la pregunta condicional aparece tras el primer plan"""
+    driver = FakeDriver.from_html(html)
+    survey = McDVoiceSurvey(pacing="sin_pausas", quiet=True, trace=None, driver=driver, seed=seed, ledger=None,
+                            record=None, layout_cache=cache, page_deadline=0, run_deadline=0)
+    plans = []
+    execute_plan = survey.execute_plan
+
+    def spy(actions):
+        plans.append([action["ref"] for action in actions])
+        results = execute_plan(actions)
+        if reveal and len(plans) == 1:
+            del driver.page.select_one("fieldset.inputtyperblv").attrs["style"]
+        return results
+
+    survey.execute_plan = spy
+    with contextlib.redirect_stdout(io.StringIO()):
+        survey.new_page()
+        survey.answer_page()
+        survey.submit_page()
+        survey.layout_cache.save()
+    return survey, driver, plans
+
+
+def test_conditional_question_after_a_cache_hit_is_answered_once(tmp_path):
+    cache = str(tmp_path / "estructuras.json")
+    html, required = conditional_page()
+    run(html, cache, seed=1)
+    assert len(LayoutCache(cache).entries) == 1
+
+    survey, driver, plans = run(html, cache, seed=2, reveal=True)
+    assert survey.layout_cache.stats["hits"] == 1
+    assert survey.layout_cache.stats["evictions"] == 0
+    assert missing_answers(required, driver.submissions[-1]) == []
+    # La segunda pasada responde solo la pregunta nueva: los grupos de casillas no se vuelven a marcar
+    assert len(plans) == 2
+    assert all(ref.startswith(('label[for="R000304', "#R000304")) for ref in plans[1])
+
+
+def test_widget_identity_ignores_renumbered_refs():
+    html, _ = conditional_page()
+    hidden = HtmlPage(html).snapshot()
+    shown = HtmlPage(html.replace(' style="display:none"', "")).snapshot()
+    assert [widget_identity(f) for f in hidden["fieldsets"]] == [widget_identity(f) for f in shown["fieldsets"][1:]]
+    assert hidden["fieldsets"][0]["ref"] == shown["fieldsets"][0]["ref"]
+
+
+def test_fingerprint_includes_na_and_option_count():
+    html = render_page([PAGES["04_resolution"], PAGES["99_finish"]], 0)
+    without_na = html.replace('<th id="HighlySatisfiedNeitherDESC9"', '<th id="HighlySatisfiedNeitherDESCX"')
+    fewer_options = re.sub(r"<td[^>]*>\s*<input[^>]*value=\"9\".*?</td>", "", html, flags=re.S)
+    fingerprints = {layout_fingerprint(HtmlPage(page).snapshot()) for page in (html, without_na, fewer_options)}
+    assert len(fingerprints) == 3
+
+
+def test_layout_matches_snapshot_structure():
+    html, _ = conditional_page()
+    page = HtmlPage(html)
+    assert structure_fingerprint(page.layout()) == layout_fingerprint(page.snapshot())
+
+
+def test_changed_checkbox_label_evicts_the_entry(tmp_path):
+    cache = str(tmp_path / "estructuras.json")
+    html = render_page([PAGES["03_experience"], PAGES["99_finish"]], 0)
+    run(html, cache, seed=1)
+    assert len(LayoutCache(cache).entries) == 1
+
+    # Mismos ids de casilla (misma huella), otras etiquetas: el snapshot guardado ya no describe la página
+    relabeled = re.sub(r'(<label for="R00030[23]\.\d+">)', r"\1Nuevo ", html)
+    survey, driver, _ = run(relabeled, cache, seed=2)
+    assert survey.layout_cache.stats["hits"] == 1
+    assert survey.layout_cache.stats["evictions"] == 1
+    assert LayoutCache(cache).entries == {}
+    assert missing_answers(PAGES["03_experience"]["required"], driver.submissions[-1]) == []
@@ -0,0 +1,53 @@
+from policy import AnswerPolicy
+
+POLICIES = {
+    "scale": {
+        "rules": [
+            {"keywords": ["fast"], "weights": [1, 0, 0]},
+            {"keywords": ["breakfast"], "weights": [0, 1, 0]},
+            {"keywords": ["shake", "milkshake"], "weights": [0, 0, 1]},
+        ],
+        "default": {"weights": [1, 1, 1]},
+    },
+}
+
+
+def test_first_rule_in_file_order_wins_over_overlapping_keyword():
+    policy = AnswerPolicy(POLICIES)
+    assert policy.rule("scale", "How was your breakfast?")["weights"] == [1, 0, 0]
+
+
+def test_first_rule_wins_even_if_a_later_rule_appears_earlier_in_the_text():
+    policy = AnswerPolicy(POLICIES)
+    assert policy.rule("scale", "Your milkshake with a fast order")["weights"] == [1, 0, 0]
+
+
+def test_substring_keyword_matches_without_case():
+    policy = AnswerPolicy(POLICIES)
+    assert policy.rule("scale", "Rate your MILKSHAKE")["weights"] == [0, 0, 1]
+
+
+def test_default_when_no_keyword_matches():
+    policy = AnswerPolicy(POLICIES)
+    assert policy.rule("scale", "Rate the cleanliness")["weights"] == [1, 1, 1]
+    assert policy.rule("scale", "")["weights"] == [1, 1, 1]
+
+
+def test_weights_fallback_when_lengths_differ():
+    policy = AnswerPolicy(POLICIES)
+    assert policy.weights("scale", "breakfast", 3) == ([1, 0, 0], True)
+    assert policy.weights("scale", "breakfast", 5) == ([1, 0, 0, 0, 0], False)
+
+
+def test_shipped_policy_file_loads():
+    policy = AnswerPolicy.load("politicas.json")
+    assert len(policy.rule("scale", "How was your shake?")["weights"]) == 5
+
+
+def test_rules_without_keywords_keep_file_order_and_text_spans_lines():
+    policy = AnswerPolicy({"scale": {"rules": [{"keywords": [], "weights": [9]},
+                                               {"keywords": ["cone"], "weights": [1]},
+                                               {"keywords": ["shake"], "weights": [2]}],
+                                     "default": {"weights": [0]}}})
+    assert policy.rule("scale", "Rate your shake\nand your CONE")["weights"] == [1]
+    assert policy.rule("scale", "Rate your\nshake")["weights"] == [2]
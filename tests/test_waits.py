@@ -0,0 +1,25 @@
+from fake_driver import FakeDriver
+from mc2 import McDVoiceSurvey
+
+QUESTIONS = '<form><input type="submit" id="NextButton" value="Next" disabled></form>'
+BLANK = "<p>Cargando...</p>"
+
+
+def survey_on(html):
+    driver = FakeDriver.from_html(html)
+    survey = McDVoiceSurvey(pacing="sin_pausas", quiet=True, trace=None, driver=driver, ledger=None, record=None,
+                            layout_cache=None, page_deadline=0, run_deadline=0)
+    return survey, driver
+
+
+def test_wait_for_state_is_one_in_page_wait():
+    survey, driver = survey_on(QUESTIONS)
+    # Un botón deshabilitado ya es un estado reconocible, como en STATE_SCRIPT
+    assert survey.wait_for_state()
+    assert dict(driver.commands) == {"w3cExecuteScriptAsync": 1}
+
+
+def test_wait_for_state_without_a_known_state():
+    survey, driver = survey_on(BLANK)
+    assert not survey.wait_for_state()
+    assert dict(driver.commands) == {"w3cExecuteScriptAsync": 1}